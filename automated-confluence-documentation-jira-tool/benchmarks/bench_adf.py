@@ -0,0 +1,121 @@
+"""
+Benchmark of the ADF-to-text extraction on large documents.
+
+Compares the former paragraph-only extractor with `adf_to_text`, reporting the time per document
+and how much of the document's text each of them recovers. By default a large synthetic document
+mixing headings, nested lists, tables, code blocks, panels and mentions is used; pass exported
+descriptions or comment bodies with --file to measure real ones.
+
+Run from the tool root:
+
+    python -m benchmarks.bench_adf --sections 400
+    python -m benchmarks.bench_adf --file description.json --max-chars 4000
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.adf import adf_stats, adf_to_text  # noqa: E402
+
+
+def paragraph_only_text(doc_field) -> str:
+    """The former extractor, which only read text nodes of top-level paragraphs."""
+    if isinstance(doc_field, dict) and doc_field.get('type') == 'doc':
+        text_parts = []
+        for block in doc_field.get('content', []):
+            if block.get('type') == 'paragraph':
+                for inner_content in block.get('content', []):
+                    if inner_content.get('type') == 'text':
+                        text_parts.append(inner_content.get('text', ''))
+        return ' '.join(text_parts).strip()
+    return str(doc_field)
+
+
+def text(value: str, **marks):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = [{"type": mark} for mark in marks]
+    return node
+
+
+def paragraph(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def synthetic_document(sections: int):
+    content = []
+    for i in range(sections):
+        content.extend([
+            {"type": "heading", "attrs": {"level": 2}, "content": [text(f"Section {i}")]},
+            paragraph(text("The rollout of "), text(f"feature {i}", strong=True), text(" is owned by "),
+                      {"type": "mention", "attrs": {"id": "1", "text": "@Jane Doe"}}, text(".")),
+            {"type": "bulletList", "content": [
+                {"type": "listItem", "content": [
+                    paragraph(text(f"Milestone {i}.{j}")),
+                    {"type": "orderedList", "attrs": {"order": 1}, "content": [
+                        {"type": "listItem", "content": [paragraph(text(f"Step {k} of milestone {i}.{j}"))]} for k in range(3)
+                    ]},
+                ]} for j in range(3)
+            ]},
+            {"type": "table", "content": [
+                {"type": "tableRow", "content": [
+                    {"type": "tableCell", "content": [paragraph(text(f"Row {r} col {c}"))]} for c in range(4)
+                ]} for r in range(4)
+            ]},
+            {"type": "codeBlock", "attrs": {"language": "python"}, "content": [text(f"def handler_{i}():\n    return {i}\n" * 20)]},
+            {"type": "panel", "attrs": {"panelType": "info"}, "content": [paragraph(text(f"Note about section {i}."))]},
+        ])
+    return {"type": "doc", "version": 1, "content": content}
+
+
+def full_text_length(document) -> int:
+    """Total length of all text nodes, as a reference for how much text an extractor recovers."""
+    total, stack = 0, [document]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            total += len(node.get("text", ""))
+            stack.extend(node.get("content") or [])
+    return total
+
+
+def measure(extract, document, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = extract(document)
+        timings.append(time.perf_counter() - started)
+    return min(timings), output
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=400, help="size of the synthetic document")
+    parser.add_argument("--file", type=Path, nargs="*", default=[], help="ADF documents exported as JSON")
+    parser.add_argument("--max-chars", type=int, default=None, help="length cap passed to adf_to_text")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = [(path.name, json.loads(path.read_text())) for path in args.file] or [
+        (f"synthetic-{args.sections}", synthetic_document(args.sections))
+    ]
+
+    print(f"{'document':>20} {'nodes':>7} {'depth':>5} {'extractor':>15} {'ms':>8} {'chars':>8} {'recovered':>9}")
+    for name, document in documents:
+        nodes, depth = adf_stats(document)
+        reference = full_text_length(document) or 1
+        extractors = [
+            ("paragraph-only", paragraph_only_text),
+            ("adf_to_text", lambda doc: adf_to_text(doc, max_chars=args.max_chars, code_block_max_chars=None)),
+        ]
+        for label, extract in extractors:
+            seconds, output = measure(extract, document, args.repeat)
+            print(f"{name:>20} {nodes:>7} {depth:>5} {label:>15} {seconds * 1000:>8.2f} {len(output):>8} {len(output) / reference:>8.0%}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,343 @@
+"""
+Offline benchmark suite: the Jira and Confluence clients, the /submit pipeline and the backend's Jira endpoints.
+
+Everything runs against benchmarks.fakes.FakeAtlassianServer on 127.0.0.1 and a FakeChatModel, so
+the suite needs no network access nor credentials. Each scenario reports the p50 and p95 latency of
+its operations, their throughput and the peak of the memory allocated while it ran (tracemalloc),
+along with how many requests the fake site served and throttled.
+
+Scenarios:
+    import             importing src/main.py, the cold start of the app
+    jira.harvest       AsyncJiraRequestor.acooked_records_epic_with_stories, one epic after the other
+    confluence.upsert  AsyncConfluenceRequestor.aupsert_confluence_page, creating, updating then skipping pages
+    submit             POST /submit (submit_epic) in-process, at each --concurrency level
+    backend.issues     GET /jira/issues of backend/main.py, walking every page of every project
+    backend.projects   GET /jira/projects of backend/main.py, served mostly from its response cache
+    backend.create     POST /jira/issues of backend/main.py
+    backend.bulk       POST /jira/issues/bulk of backend/main.py with --bulk-issues issues as NDJSON
+
+Save a run as the baseline and compare later runs against it; the comparison exits with status 1
+when a scenario got slower or bigger than the tolerance allows.
+
+Run from the tool root:
+
+    python -m benchmarks.bench_offline --save baseline.json
+    python -m benchmarks.bench_offline --compare baseline.json --tolerance 0.25
+    python -m benchmarks.bench_offline --stories 300 --comments 30 --throttle-rate 0.05 --scenarios jira.harvest submit
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import logging
+import argparse
+import importlib
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+TOOL_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_ROOT = TOOL_ROOT.parent / "backend"
+os.chdir(TOOL_ROOT)  # the app resolves its templates relative to the working directory
+sys.path.insert(0, str(TOOL_ROOT))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+# The fake site is local; never route it through a proxy configured for the real ones
+os.environ["NO_PROXY"] = ",".join(filter(None, [os.environ.get("NO_PROXY"), "127.0.0.1", "localhost"]))
+
+import httpx  # noqa: E402
+
+from benchmarks.fakes import FakeAtlassianConfig, FakeAtlassianServer, FakeChatModel  # noqa: E402
+
+SCENARIOS = ("jira.harvest", "confluence.upsert", "submit", "backend.issues", "backend.projects", "backend.create", "backend.bulk")
+# Metrics compared against the baseline, and whether a higher value is a regression
+COMPARED_METRICS = {"p50_ms": True, "p95_ms": True, "throughput_per_s": False, "peak_mib": True}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of `values`, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(name: str, latencies: List[float], wall_seconds: float, peak_bytes: int, requests: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "scenario": name,
+        "ops": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        "peak_mib": round(peak_bytes / 2**20, 2),
+        "upstream_requests": sum(count for name, count in requests.items() if name != "throttled"),
+        "throttled": requests.get("throttled", 0),
+    }
+
+
+class Recorder:
+    def __init__(self, server: FakeAtlassianServer):
+        """Times the operations of one scenario and traces its peak memory."""
+        self.server = server
+        self.latencies: List[float] = []
+
+    def __enter__(self) -> "Recorder":
+        self.server.reset_counts()
+        tracemalloc.start()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall_seconds = time.perf_counter() - self.started
+        _, self.peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.requests = self.server.reset_counts()
+
+    def time(self, operation: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = operation()
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    async def atime(self, operation: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        result = await operation()
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def result(self, name: str) -> Dict[str, Any]:
+        return summarize(name, self.latencies, self.wall_seconds, self.peak_bytes, self.requests)
+
+
+async def bench_jira_harvest(main, server: FakeAtlassianServer, epics: List[str]) -> Dict[str, Any]:
+    jira = main.AsyncJiraRequestor(server.base_url, "bench", "bench")
+    with Recorder(server) as recorder:
+        for epic_id in epics:
+            records = await recorder.atime(lambda: jira.acooked_records_epic_with_stories(epic_id, main.FIELDS_OF_INTEREST))
+            assert len(records) == server.config.stories_per_epic + 1, f"harvested {len(records)} records of {epic_id}"
+    return recorder.result("jira.harvest")
+
+
+async def bench_confluence_upsert(main, server: FakeAtlassianServer, pages: int) -> Dict[str, Any]:
+    confluence = main.AsyncConfluenceRequestor(server.base_url, "bench", "bench")
+    content = FakeChatModel()._answer("confluence benchmark")[0]
+    with Recorder(server) as recorder:
+        # Creates the pages, updates them with new content, then finds them unchanged
+        for expected, body in (("created", f"{content}<p>draft</p>"), ("updated", content), ("unchanged", content)):
+            for page in range(pages):
+                _, action = await recorder.atime(lambda: confluence.aupsert_confluence_page(f"Benchmark page {page}", body))
+                assert action == expected, f"page {page} was {action}, expected {expected}"
+    return recorder.result("confluence.upsert")
+
+
+async def bench_submit(main, server: FakeAtlassianServer, epics: List[str], concurrency: int, requests_per_client: int) -> Dict[str, Any]:
+    transport = httpx.ASGITransport(app=main.app)
+    with Recorder(server) as recorder:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def worker(worker_id: int):
+                for index in range(requests_per_client):
+                    epic_id = epics[(worker_id * requests_per_client + index) % len(epics)]
+                    response = await recorder.atime(lambda: client.post(
+                        "/submit", data={"epic_id": epic_id, "page_title": f"Benchmark {epic_id}"}
+                    ))
+                    response.raise_for_status()
+
+            await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    return {**recorder.result(f"submit@{concurrency}"), "concurrency": concurrency}
+
+
+def import_backend(server: FakeAtlassianServer):
+    """Imports backend/main.py pointed at the fake site; its modules read their configuration on import."""
+    os.environ["JIRA_BASE_URL"] = server.base_url
+    os.environ.setdefault("JIRA_EMAIL", "bench")
+    os.environ.setdefault("JIRA_API_TOKEN", "bench")
+    sys.path.insert(0, str(BACKEND_ROOT))
+    backend = importlib.import_module("main")
+    backend.jira_service.JIRA_BASE_URL = server.base_url
+    return backend
+
+
+async def bench_backend(
+    backend,
+    server: FakeAtlassianServer,
+    scenarios: List[str],
+    concurrency: int,
+    bulk_issues: int
+) -> List[Dict[str, Any]]:
+    transport = httpx.ASGITransport(app=backend.app)
+    projects = [f"PRJ{index}" for index in range(1, server.config.projects + 1)]
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        if "backend.issues" in scenarios:
+            # Each page is a distinct cache key, so every request reaches the fake site
+            backend.jira_cache.invalidate()
+            with Recorder(server) as recorder:
+                async def walk(project_key: str):
+                    cursor = None
+                    while True:
+                        params = {"project_key": project_key, **({"cursor": cursor} if cursor else {})}
+                        response = await recorder.atime(lambda: client.get("/jira/issues", params=params))
+                        response.raise_for_status()
+                        cursor = response.json().get("next_cursor")
+                        if not cursor:
+                            return
+
+                await asyncio.gather(*(walk(project_key) for project_key in projects))
+            results.append(recorder.result("backend.issues"))
+
+        if "backend.projects" in scenarios:
+            backend.jira_cache.invalidate()
+            with Recorder(server) as recorder:
+                async def list_projects():
+                    for _ in range(10):
+                        response = await recorder.atime(lambda: client.get("/jira/projects", params={"max_results": 1}))
+                        response.raise_for_status()
+
+                await asyncio.gather(*(list_projects() for _ in range(concurrency)))
+            results.append(recorder.result("backend.projects"))
+
+        if "backend.create" in scenarios:
+            with Recorder(server) as recorder:
+                async def create_issues(worker_id: int):
+                    for index in range(10):
+                        response = await recorder.atime(lambda: client.post("/jira/issues", params={
+                            "project_key": projects[0], "summary": f"Benchmark issue {worker_id}-{index}",
+                        }))
+                        response.raise_for_status()
+
+                await asyncio.gather(*(create_issues(worker_id) for worker_id in range(concurrency)))
+            results.append(recorder.result("backend.create"))
+
+        if "backend.bulk" in scenarios:
+            body = "\n".join(
+                json.dumps({"project_key": projects[0], "summary": f"Imported issue {index}", "description": "Imported by the benchmark."})
+                for index in range(bulk_issues)
+            )
+            with Recorder(server) as recorder:
+                response = await recorder.atime(lambda: client.post(
+                    "/jira/issues/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+                ))
+                response.raise_for_status()
+                assert response.json()["created"] == bulk_issues, response.json()["failed"]
+            # Issues per second, comparable with the throughput of backend.create
+            results.append({**recorder.result("backend.bulk"), "throughput_per_s": round(bulk_issues / recorder.wall_seconds, 2)})
+    return results
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = [f"{'scenario':>18} {'ops':>5} {'p50 ms':>9} {'p95 ms':>9} {'ops/s':>8} {'peak MiB':>9} {'requests':>9} {'429s':>5}"]
+    for result in results:
+        lines.append(
+            f"{result['scenario']:>18} {result['ops']:>5} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+            f"{result['throughput_per_s']:>8.2f} {result['peak_mib']:>9.2f} {result['upstream_requests']:>9} {result['throttled']:>5}"
+        )
+    return "\n".join(lines)
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Returns one line per metric that regressed by more than `tolerance` against the baseline."""
+    baseline_by_scenario = {result["scenario"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_by_scenario.get(result["scenario"])
+        if reference is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            before, after = reference.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append(f"{result['scenario']}: {metric} {before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--epics", type=int, default=10)
+    parser.add_argument("--stories", type=int, default=100, help="stories per epic")
+    parser.add_argument("--comments", type=int, default=8, help="comments per issue")
+    parser.add_argument("--embedded-comments", type=int, default=5, help="comments Jira embeds in search results")
+    parser.add_argument("--pages", type=int, default=10, help="Confluence pages to upsert")
+    parser.add_argument("--atlassian-latency", type=float, default=0.02)
+    parser.add_argument("--throttle-rate", type=float, default=0.02, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache, so repeated epics skip the model")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests-per-client", type=int, default=3)
+    parser.add_argument("--bulk-issues", type=int, default=1000, help="issues imported by backend.bulk")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a previous run to detect regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative change tolerated before a metric counts as regressed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = FakeAtlassianConfig(
+        epics=args.epics,
+        stories_per_epic=args.stories,
+        comments_per_issue=args.comments,
+        embedded_comments=args.embedded_comments,
+        latency=args.atlassian_latency,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+    )
+
+    # Cold start: the app module is imported once per process
+    tracemalloc.start()
+    import_started = time.perf_counter()
+    from src import main
+    import_seconds = time.perf_counter() - import_started
+    _, import_peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    from src.llm_cache import LLMResponseCache
+    from src.transport import get_async_transport
+    main.logger.setLevel(logging.WARNING)
+
+    results: List[Dict[str, Any]] = [summarize("import", [import_seconds], import_seconds, import_peak_bytes, {})]
+    with FakeAtlassianServer(config) as server:
+        main.ATLASSIAN_BASE_URL = server.base_url
+        main.build_chat_model = lambda: FakeChatModel(args.llm_latency)
+        if not args.llm_cache:
+            # Every request goes to the model; an entry is evicted as soon as it is stored
+            main.llm_cache = LLMResponseCache(":memory:", max_entries=0)
+        epics = server.site.epic_keys()
+
+        backend_scenarios = [name for name in args.scenarios if name.startswith("backend.")]
+        backend = import_backend(server) if backend_scenarios else None
+
+        async def run_async() -> List[Dict[str, Any]]:
+            # One event loop for every scenario, since the pooled clients are bound to the loop that opened them
+            async_results = []
+            try:
+                if "jira.harvest" in args.scenarios:
+                    async_results.append(await bench_jira_harvest(main, server, epics))
+                if "confluence.upsert" in args.scenarios:
+                    async_results.append(await bench_confluence_upsert(main, server, args.pages))
+                if "submit" in args.scenarios:
+                    for concurrency in args.concurrency:
+                        async_results.append(await bench_submit(main, server, epics, concurrency, args.requests_per_client))
+                if backend is not None:
+                    async_results.extend(await bench_backend(backend, server, backend_scenarios, max(args.concurrency), args.bulk_issues))
+            finally:
+                await get_async_transport().aclose()
+            return async_results
+
+        results.extend(asyncio.run(run_async()))
+
+    print(format_results(results))
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}.")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,113 @@
+"""
+Micro-benchmark of the issue pre-processing and LLM formatting paths on a synthetic epic.
+
+Compares the former DataFrame path, which built one comments DataFrame per issue, walked it with
+`iterrows`, concatenated the issue frames and walked them again with `iterrows`, against the
+IssueRecord path, which builds slotted records and formats them in one pass.
+
+Run from the tool root:
+
+    python -m benchmarks.bench_records --issues 1000 --comments 8
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.records import CommentRecord, IssueRecord, format_records_for_llm, join_llm_blocks  # noqa: E402
+from benchmarks.fakes import FakeAtlassianConfig, SyntheticSite  # noqa: E402
+
+FIELDS_OF_INTEREST = ["summary", "description", "status", "assignee"]
+
+
+def synthetic_epic(issues: int, comments: int):
+    """Returns the raw epic, its raw stories and the comment thread of each issue, from the fake site of the offline benchmarks."""
+    site = SyntheticSite(FakeAtlassianConfig(epics=1, stories_per_epic=issues, comments_per_issue=comments))
+    epic_key = site.epic_key(1)
+    story_keys = site.story_keys(epic_key)
+    comment_threads = {key: site.comments(key) for key in story_keys}
+    comment_threads[epic_key] = []
+    return site.issue(epic_key, embed_comments=False), [site.issue(key, embed_comments=False) for key in story_keys], comment_threads
+
+
+def dataframe_path(epic_raw, stories_raw, comment_threads) -> str:
+    """The pre-processing and formatting as they were done with one DataFrame per issue."""
+    def pre_process(issue, issue_type):
+        record = IssueRecord.from_raw(issue, FIELDS_OF_INTEREST)
+        row = record.to_row()
+        comments = []
+        for comment_raw in comment_threads[issue["key"]]:
+            comment = CommentRecord.from_raw(comment_raw)
+            comments.append({"author": comment.author, "content": comment.content, "key": issue["key"]})
+        df_comments = pd.DataFrame(comments)
+        row["comments_string"] = "\n".join(
+            f"{idx}. {comment_row['author']}: {comment_row['content']};" for idx, comment_row in df_comments.iterrows()
+        )
+        row["issue_type"] = issue_type
+        return row
+
+    df_epic = pd.DataFrame([pre_process(epic_raw, "epic")])
+    df_stories = pd.DataFrame([pre_process(story, "story") for story in stories_raw])
+    df = pd.concat([df_epic, df_stories], ignore_index=True)
+
+    formatted_output = []
+    for _, epic_row in df[df["issue_type"] == "epic"].iterrows():
+        formatted_output.extend([
+            "Epic:", f"title: {epic_row['summary']}", f"description: {epic_row['description']}",
+            f"status: {epic_row['status']}", f"comments_string: {epic_row['comments_string']}", "",
+        ])
+    formatted_output.append("stories:")
+    for _, story_row in df[df["issue_type"] == "story"].iterrows():
+        formatted_output.extend([
+            f"  title: {story_row['summary']}", f"  description: {story_row['description']}",
+            f"  status: {story_row['status']}", f"  comments_string: {story_row['comments_string']}", "",
+        ])
+    return "\n".join(formatted_output).strip()
+
+
+def records_path(epic_raw, stories_raw, comment_threads) -> str:
+    records = [IssueRecord.from_raw(epic_raw, FIELDS_OF_INTEREST, comment_threads[epic_raw["key"]], "epic")]
+    records.extend(
+        IssueRecord.from_raw(story, FIELDS_OF_INTEREST, comment_threads[story["key"]], "story") for story in stories_raw
+    )
+    return join_llm_blocks(*format_records_for_llm(records))
+
+
+def measure(path, data, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = path(*data)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    path(*data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, output
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issues", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = synthetic_epic(args.issues, args.comments)
+    df_time, df_peak, df_output = measure(dataframe_path, data, args.repeat)
+    rec_time, rec_peak, rec_output = measure(records_path, data, args.repeat)
+    assert df_output == rec_output, "both paths must produce the same LLM input"
+
+    print(f"{'path':>10} {'best (ms)':>10} {'peak (MiB)':>11}")
+    print(f"{'dataframe':>10} {df_time * 1000:>10.1f} {df_peak / 2**20:>11.2f}")
+    print(f"{'records':>10} {rec_time * 1000:>10.1f} {rec_peak / 2**20:>11.2f}")
+    print(f"speed-up: {df_time / rec_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
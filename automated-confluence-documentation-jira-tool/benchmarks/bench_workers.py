@@ -0,0 +1,212 @@
+"""
+Multi-worker scaling benchmark of the backend: its cached Jira endpoints served by
+`uvicorn main:app --workers N` for each N, against benchmarks.fakes.FakeAtlassianServer.
+
+Each run starts the backend with per-worker caches ("local") or with one cache shared through
+SHARED_STATE_DIR ("shared"), drives it from --client-processes processes of --client-threads
+keep-alive clients each for --duration seconds, spread over --keys distinct pages of GET
+/jira/issues and GET /jira/projects, and reports the throughput, the p50 and p95 latency and how
+many requests reached the fake site. With per-worker caches, the upstream requests grow with the
+number of workers; with the shared cache, they stay flat.
+
+The load generator runs in its own processes, so make sure the machine has cores left for it.
+Needs uvicorn, like the deployment. Run from the tool root:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --duration 10
+    python -m benchmarks.bench_workers --workers 1 4 --cache shared --cache-ttl 2 --save workers.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+TOOL_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_ROOT = TOOL_ROOT.parent / "backend"
+sys.path.insert(0, str(TOOL_ROOT))
+# The fake site and the workers are local; never route them through a proxy configured for the real ones
+os.environ["NO_PROXY"] = ",".join(filter(None, [os.environ.get("NO_PROXY"), "127.0.0.1", "localhost"]))
+
+import httpx  # noqa: E402
+
+from benchmarks.fakes import FakeAtlassianConfig, FakeAtlassianServer  # noqa: E402
+from benchmarks.bench_offline import percentile  # noqa: E402
+
+CACHE_MODES = ("local", "shared")
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def request_mix(keys: int, projects: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """The distinct requests the clients pick from, each its own entry of the backend's cache."""
+    mix = []
+    for index in range(keys):
+        if index % 4 == 3:
+            mix.append(("/jira/projects", {"max_results": 1 + index // 4 % 100}))
+        else:
+            mix.append(("/jira/issues", {"project_key": f"PRJ{1 + index % projects}", "max_results": 1 + index // projects % 100}))
+    return mix
+
+
+def drive(base_url: str, mix: List[Tuple[str, Dict[str, Any]]], threads: int, deadline: float, seed: int) -> Tuple[List[float], int]:
+    """Sends random requests of `mix` from `threads` clients until `deadline`. Returns the latencies and the error count."""
+    def client_loop(client_seed: int) -> Tuple[List[float], int]:
+        picker = random.Random(client_seed)
+        latencies, errors = [], 0
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while time.time() < deadline:
+                path, params = picker.choice(mix)
+                started = time.perf_counter()
+                try:
+                    client.get(path, params=params).raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(client_loop, [seed * 1000 + index for index in range(threads)]))
+    return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results)
+
+
+def start_backend(server: FakeAtlassianServer, workers: int, cache: str, state_dir: str, cache_ttl: float) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "JIRA_BASE_URL": server.base_url,
+        "JIRA_EMAIL": "bench",
+        "JIRA_API_TOKEN": "bench",
+        "JIRA_CACHE_TTL_SECONDS": str(cache_ttl),
+        "SYNC_DB_PATH": os.path.join(state_dir, "sync_state.db"),
+        "WEB_CONCURRENCY": str(workers),
+    }
+    env.pop("JIRA_CACHE_PATH", None)
+    env.pop("SHARED_STATE_DIR", None)
+    if cache == "shared":
+        env["SHARED_STATE_DIR"] = state_dir
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_ROOT,
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The backend exited with status {process.returncode} while starting.")
+        try:
+            httpx.get(f"{base_url}/hello", timeout=1).raise_for_status()
+            break
+        except httpx.HTTPError:
+            if time.time() > deadline:
+                process.kill()
+                raise RuntimeError("The backend did not start within 60s.")
+            time.sleep(0.2)
+    # The first worker answers before the others are up
+    time.sleep(1 + 0.25 * workers)
+    return process, base_url
+
+
+def stop_backend(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def bench_workers(server: FakeAtlassianServer, workers: int, cache: str, args) -> Dict[str, Any]:
+    mix = request_mix(args.keys, server.config.projects)
+    with tempfile.TemporaryDirectory(prefix="bench-workers-") as state_dir:
+        process, base_url = start_backend(server, workers, cache, state_dir, args.cache_ttl)
+        try:
+            server.reset_counts()
+            started = time.time()
+            deadline = started + args.duration
+            with ProcessPoolExecutor(args.client_processes) as pool:
+                runs = list(pool.map(
+                    drive,
+                    [base_url] * args.client_processes,
+                    [mix] * args.client_processes,
+                    [args.client_threads] * args.client_processes,
+                    [deadline] * args.client_processes,
+                    range(args.client_processes)
+                ))
+            wall_seconds = time.time() - started
+            requests = server.reset_counts()
+        finally:
+            stop_backend(process)
+
+    latencies = [latency for run_latencies, _ in runs for latency in run_latencies]
+    return {
+        "cache": cache,
+        "workers": workers,
+        "ops": len(latencies),
+        "errors": sum(errors for _, errors in runs),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "upstream_requests": sum(count for name, count in requests.items() if name != "throttled"),
+    }
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Renders the runs as a table, with the speedup of each over the run with the fewest workers of the same cache mode."""
+    baseline = {}
+    for result in sorted(results, key=lambda result: result["workers"]):
+        baseline.setdefault(result["cache"], result["throughput_per_s"])
+    lines = [f"{'cache':>7} {'workers':>7} {'ops':>7} {'errors':>6} {'ops/s':>9} {'speedup':>7} {'p50 ms':>8} {'p95 ms':>8} {'upstream':>8}"]
+    for result in results:
+        speedup = result["throughput_per_s"] / baseline[result["cache"]] if baseline[result["cache"]] else 0.0
+        lines.append(
+            f"{result['cache']:>7} {result['workers']:>7} {result['ops']:>7} {result['errors']:>6} {result['throughput_per_s']:>9.1f} "
+            f"{speedup:>6.2f}x {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['upstream_requests']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cache", choices=(*CACHE_MODES, "both"), default="both")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per run")
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--client-threads", type=int, default=16, help="keep-alive clients per client process")
+    parser.add_argument("--keys", type=int, default=200, help="distinct pages requested")
+    parser.add_argument("--cache-ttl", type=float, default=5, help="JIRA_CACHE_TTL_SECONDS of the backend")
+    parser.add_argument("--projects", type=int, default=5)
+    parser.add_argument("--atlassian-latency", type=float, default=0.05)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    modes = CACHE_MODES if args.cache == "both" else (args.cache,)
+    config = FakeAtlassianConfig(projects=args.projects, latency=args.atlassian_latency)
+    results = []
+    with FakeAtlassianServer(config) as server:
+        for cache in modes:
+            for workers in args.workers:
+                results.append(bench_workers(server, workers, cache, args))
+                print(f"{cache} cache, {workers} workers: {results[-1]['throughput_per_s']} ops/s", file=sys.stderr)
+
+    print(format_results(results))
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
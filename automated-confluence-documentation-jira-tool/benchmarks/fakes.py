@@ -0,0 +1,420 @@
+"""
+Local stand-ins for Jira, Confluence and the chat model, for benchmarks that must run without network access.
+
+FakeAtlassianServer serves the subset of the Jira and Confluence REST APIs used by the tool and the
+backend over real HTTP on 127.0.0.1, so the pooled transports, retries and JSON decoding are
+measured as in production. Its epics are synthetic but deterministic: every issue has an ADF
+description with headings, lists, code blocks and mentions, and a configurable number of comments,
+of which Jira only embeds the first page in search results. Each request can be delayed and a share
+of them answered with 429 and a Retry-After header.
+
+FakeChatModel answers deterministically from the prompt after a configurable latency, streams its
+answer in chunks and reports token usage like the LangChain chat models.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = (
+    "api gateway latency cache rollout migration schema customer dashboard billing invoice export "
+    "retry queue worker deploy staging release metrics alert tenant onboarding search index backfill "
+    "permission audit webhook timeout regression flaky pipeline review sign-off blocker dependency"
+).split()
+PEOPLE = ("Jane Doe", "John Doe", "Amir Haddad", "Mei Chen", "Lukas Berger", "Priya Nair")
+STATUSES = ("To Do", "In Progress", "In Review", "Done")
+STATUS_CATEGORIES = {"To Do": "new", "In Progress": "indeterminate", "In Review": "indeterminate", "Done": "done"}
+BOTS = ("Automation for Jira", "Jenkins")
+
+
+@dataclass
+class FakeAtlassianConfig:
+    epics: int = 20
+    stories_per_epic: int = 50
+    comments_per_issue: int = 5
+    # Comments embedded in search results; the rest has to be fetched from /issue/{key}/comment
+    embedded_comments: int = 20
+    description_paragraphs: int = 4
+    # Delay of every response, with up to `jitter` of it added at random
+    latency: float = 0.02
+    jitter: float = 0.5
+    # Share of the requests answered with 429 Too Many Requests
+    throttle_rate: float = 0.0
+    retry_after: float = 0.05
+    projects: int = 3
+    seed: int = 7
+
+
+class SyntheticSite:
+    def __init__(self, config: FakeAtlassianConfig):
+        """The issues, projects and pages of the fake site; issues are generated on demand from their key."""
+        self.config = config
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.created_issues: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def epic_key(epic: int) -> str:
+        return f"BENCH-{epic}"
+
+    def epic_keys(self) -> List[str]:
+        return [self.epic_key(epic) for epic in range(1, self.config.epics + 1)]
+
+    def story_keys(self, epic_key: str) -> List[str]:
+        epic = int(epic_key.rsplit("-", 1)[1])
+        return [f"STORY-{epic * 100_000 + story}" for story in range(1, self.config.stories_per_epic + 1)]
+
+    def _random(self, key: str) -> random.Random:
+        return random.Random(f"{self.config.seed}:{key}")
+
+    def _sentence(self, rng: random.Random, words: int = 12) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def adf_document(self, key: str, paragraphs: int) -> Dict[str, Any]:
+        rng = self._random(f"{key}:description")
+        content: List[Dict[str, Any]] = [
+            {"type": "heading", "attrs": {"level": 2}, "content": [{"type": "text", "text": f"Context of {key}"}]},
+        ]
+        for _ in range(paragraphs):
+            content.append({"type": "paragraph", "content": [
+                {"type": "text", "text": self._sentence(rng, rng.randint(15, 40)) + " "},
+                {"type": "text", "text": rng.choice(WORDS), "marks": [{"type": "strong"}]},
+                {"type": "text", "text": " owned by "},
+                {"type": "mention", "attrs": {"id": "0", "text": f"@{rng.choice(PEOPLE)}"}},
+                {"type": "text", "text": ", see "},
+                {"type": "text", "text": "the runbook", "marks": [{"type": "link", "attrs": {"href": "https://example.com/runbook"}}]},
+                {"type": "text", "text": "."},
+            ]})
+        content.append({"type": "bulletList", "content": [
+            {"type": "listItem", "content": [{"type": "paragraph", "content": [{"type": "text", "text": self._sentence(rng, 8)}]}]}
+            for _ in range(rng.randint(2, 5))
+        ]})
+        content.append({"type": "codeBlock", "attrs": {"language": "python"}, "content": [
+            {"type": "text", "text": f"def handle_{rng.choice(WORDS).replace('-', '_')}(event):\n    return retry(event, attempts=3)"},
+        ]})
+        content.append({"type": "paragraph", "content": [
+            {"type": "status", "attrs": {"text": rng.choice(STATUSES).upper(), "color": "blue"}},
+            {"type": "hardBreak"},
+            {"type": "text", "text": self._sentence(rng)},
+        ]})
+        return {"type": "doc", "version": 1, "content": content}
+
+    def comments(self, key: str) -> List[Dict[str, Any]]:
+        rng = self._random(f"{key}:comments")
+        comments = []
+        for index in range(self.config.comments_per_issue):
+            bot = rng.random() < 0.2
+            author = rng.choice(BOTS) if bot else rng.choice(PEOPLE)
+            text = f"Build #{rng.randint(100, 999)} passed on staging." if bot else self._sentence(rng, rng.randint(8, 30))
+            comments.append({
+                "id": str(index + 1),
+                "author": {"displayName": author, "accountType": "app" if bot else "atlassian"},
+                "body": {"type": "doc", "version": 1, "content": [{"type": "paragraph", "content": [{"type": "text", "text": text}]}]},
+                "created": f"2024-05-{1 + index % 28:02d}T10:00:00.000+0000",
+            })
+        return comments
+
+    def issue(self, key: str, embed_comments: bool = True) -> Dict[str, Any]:
+        rng = self._random(key)
+        is_epic = key.startswith("BENCH-")
+        fields: Dict[str, Any] = {
+            "summary": f"{'Epic' if is_epic else 'Story'} {key}: {self._sentence(rng, 5)[:-1]}",
+            "description": self.adf_document(key, self.config.description_paragraphs),
+            "status": {"name": rng.choice(STATUSES)},
+            "assignee": {"displayName": rng.choice(PEOPLE)},
+            "issuetype": {"name": "Epic" if is_epic else "Story"},
+            "updated": "2024-05-30T10:00:00.000+0000",
+        }
+        # Spread over April and May, from the key so that the other fields keep their values
+        number = int(key.rsplit("-", 1)[1])
+        category = STATUS_CATEGORIES[fields["status"]["name"]]
+        fields["status"]["statusCategory"] = {"key": category}
+        fields["created"] = f"2024-04-{1 + number % 28:02d}T09:00:00.000+0000"
+        fields["statuscategorychangedate"] = f"2024-05-{1 + number * 7 % 28:02d}T16:00:00.000+0000"
+        fields["resolutiondate"] = fields["statuscategorychangedate"] if category == "done" else None
+        if not is_epic:
+            epic = int(key.rsplit("-", 1)[1]) // 100_000
+            fields["parent"] = {"key": self.epic_key(epic)}
+        if embed_comments:
+            comments = self.comments(key)
+            fields["comment"] = {
+                "comments": comments[:self.config.embedded_comments],
+                "total": len(comments),
+                "startAt": 0,
+                "maxResults": self.config.embedded_comments,
+            }
+        return {"id": key.rsplit("-", 1)[1], "key": key, "self": f"/rest/api/3/issue/{key}", "fields": fields}
+
+    def create_issue(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            number = len(self.created_issues) + 1
+            created = {"id": str(900_000 + number), "key": f"{(fields.get('project') or {}).get('key', 'BENCH')}-{900_000 + number}"}
+            self.created_issues.append({**created, "fields": fields})
+        return created
+
+    def save_page(self, body: Dict[str, Any], page_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            page_id = page_id or str(len(self.pages) + 1)
+            previous = self.pages.get(page_id)
+            page = {
+                "id": page_id,
+                "type": "page",
+                "title": body.get("title", ""),
+                "space": body.get("space", {}),
+                "body": body.get("body", {}),
+                "version": {
+                    "number": (previous["version"]["number"] + 1) if previous else 1,
+                    "message": (body.get("version") or {}).get("message", ""),
+                },
+                "_links": {"webui": f"/spaces/{(body.get('space') or {}).get('key', '')}/pages/{page_id}"},
+            }
+            self.pages[page_id] = page
+        return page
+
+    def find_pages(self, title: str, space_key: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                page for page in self.pages.values()
+                if page["title"] == title and (page["space"] or {}).get("key") == space_key
+            ]
+
+
+_EPIC_LINK = re.compile(r'(?:"Epic Link"|parent)\s*(?:=|in)\s*\(?"?([A-Z]+-\d+)"?')
+_PROJECT = re.compile(r'project\s*=\s*"?([A-Z0-9]+)"?')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeAtlassianServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json_body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def _handle(self, method: str):
+        parts = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        body = self._json_body() if method in ("POST", "PUT") else None
+        config = self.server.config
+
+        delay = config.latency * (1 + random.random() * config.jitter)
+        if delay:
+            time.sleep(delay)
+        if config.throttle_rate and random.random() < config.throttle_rate:
+            self.server.count("throttled")
+            self._send(429, {"errorMessages": ["Rate limit exceeded."]}, {"Retry-After": str(config.retry_after)})
+            return
+        self.server.count(f"{method} {self.server.route_name(parts.path)}")
+
+        status, payload = self.server.route(method, parts.path, query, body)
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+
+class FakeAtlassianServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: FakeAtlassianConfig = FakeAtlassianConfig()):
+        """
+        Serves a SyntheticSite on a free port of 127.0.0.1; use as a context manager to run it in a background thread.
+
+        Args:
+            config (FakeAtlassianConfig): The size of the site and the latency and throttling to inject.
+        """
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.config = config
+        self.site = SyntheticSite(config)
+        self.requests: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str):
+        with self._stats_lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def reset_counts(self) -> Dict[str, int]:
+        with self._stats_lock:
+            counts, self.requests = self.requests, {}
+        return counts
+
+    @staticmethod
+    def route_name(path: str) -> str:
+        """The path with its ids blanked out, to count requests per endpoint."""
+        return re.sub(r"/(issue|content)/[^/]+", r"/\1/{id}", path)
+
+    def route(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        site = self.site
+        if path.startswith("/wiki/rest/api/content"):
+            return self._route_confluence(method, path, query, body)
+
+        if method == "GET" and path == "/rest/api/3/search":
+            keys = self._search(query.get("jql", ""))
+            start_at = int(query.get("startAt", 0))
+            max_results = min(int(query.get("maxResults", 50)), 100)
+            page = keys[start_at:start_at + max_results]
+            return 200, {
+                "startAt": start_at, "maxResults": max_results, "total": len(keys),
+                "issues": [site.issue(key, "comment" in query.get("fields", "")) for key in page],
+            }
+        if method == "GET" and path == "/rest/api/3/search/jql":
+            keys = self._search(query.get("jql", ""))
+            start_at = int(query.get("nextPageToken") or 0)
+            max_results = min(int(query.get("maxResults", 50)), 100)
+            end = start_at + max_results
+            return 200, {
+                "issues": [site.issue(key, "comment" in query.get("fields", "")) for key in keys[start_at:end]],
+                "nextPageToken": str(end) if end < len(keys) else None,
+            }
+        if method == "GET" and path == "/rest/api/3/project/search":
+            projects = [{"id": str(index), "key": f"PRJ{index}", "name": f"Project {index}"} for index in range(1, self.config.projects + 1)]
+            start_at = int(query.get("startAt", 0))
+            max_results = int(query.get("maxResults", 50))
+            page = projects[start_at:start_at + max_results]
+            return 200, {"values": page, "startAt": start_at, "total": len(projects), "isLast": start_at + len(page) >= len(projects)}
+        if method == "POST" and path == "/rest/api/3/issue":
+            return 201, site.create_issue((body or {}).get("fields", {}))
+        if method == "POST" and path == "/rest/api/3/issue/bulk":
+            # Like Jira, issues without a summary fail on their own and the rest is created
+            issues, errors = [], []
+            for index, update in enumerate((body or {}).get("issueUpdates", [])[:50]):
+                fields = update.get("fields", {})
+                if not fields.get("summary"):
+                    errors.append({"status": 400, "failedElementNumber": index, "elementErrors": {"errors": {"summary": "You must specify a summary of the issue."}}})
+                else:
+                    issues.append(site.create_issue(fields))
+            return (400 if errors else 201), {"issues": issues, "errors": errors}
+
+        match = re.fullmatch(r"/rest/api/3/issue/([A-Z]+-\d+)(/comment)?", path)
+        if method == "GET" and match:
+            key, comment_path = match.groups()
+            if comment_path:
+                comments = site.comments(key)
+                start_at = int(query.get("startAt", 0))
+                max_results = int(query.get("maxResults", 50))
+                return 200, {
+                    "comments": comments[start_at:start_at + max_results],
+                    "startAt": start_at, "maxResults": max_results, "total": len(comments),
+                }
+            return 200, site.issue(key, "comment" in query.get("fields", ""))
+        return 404, {"errorMessages": [f"No fake for {method} {path}"]}
+
+    def _search(self, jql: str) -> List[str]:
+        site = self.site
+        if "issuetype = Epic" in jql:
+            return site.epic_keys()
+        match = _EPIC_LINK.search(jql)
+        if match:
+            keys = site.story_keys(match.group(1))
+            # The delta query of the snapshot store also asks for the epic itself
+            return [match.group(1), *keys] if f'key = "{match.group(1)}"' in jql else keys
+        if _PROJECT.search(jql):
+            return [key for epic in site.epic_keys() for key in [epic, *site.story_keys(epic)]]
+        return []
+
+    def _route_confluence(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        site = self.site
+        page_id = path[len("/wiki/rest/api/content"):].strip("/")
+        if method == "GET" and not page_id:
+            results = site.find_pages(query.get("title", ""), query.get("spaceKey", ""))
+            limit = int(query.get("limit", 25))
+            return 200, {"results": results[:limit], "size": min(len(results), limit)}
+        if method == "POST" and not page_id:
+            return 200, site.save_page(body or {})
+        if page_id not in site.pages:
+            return 404, {"message": f"No content with id {page_id}"}
+        if method == "GET":
+            return 200, site.pages[page_id]
+        if method == "PUT":
+            return 200, site.save_page(body or {}, page_id)
+        return 405, {"message": f"{method} not supported"}
+
+    def __enter__(self) -> "FakeAtlassianServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-atlassian", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeMessage:
+    def __init__(self, content: str, usage_metadata: Optional[Dict[str, int]] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+@dataclass
+class FakeChatModel:
+    """A deterministic chat model: the same prompt always gets the same answer after the same latency."""
+    latency: float = 0.2
+    # Delay between streamed chunks, on top of `latency`
+    chunk_latency: float = 0.0
+    chunks: int = 8
+    model_name: str = "fake-chat"
+
+    def _answer(self, prompt: Any) -> Tuple[str, Dict[str, int]]:
+        text = str(prompt)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        answer = (
+            f"<h2>Epic Summary</h2><p>Summary {digest} of a question of {len(text)} characters.</p>"
+            "<h3>Accomplishments</h3><ul><li>Delivered the planned stories.</li></ul>"
+            "<h3>Challenges</h3><ul><li>None reported.</li></ul>"
+        )
+        usage = {"input_tokens": len(text) // 4, "output_tokens": len(answer) // 4}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return answer, usage
+
+    async def ainvoke(self, prompt: Any) -> FakeMessage:
+        await asyncio.sleep(self.latency)
+        answer, usage = self._answer(prompt)
+        return FakeMessage(answer, usage)
+
+    def invoke(self, prompt: Any) -> FakeMessage:
+        time.sleep(self.latency)
+        answer, usage = self._answer(prompt)
+        return FakeMessage(answer, usage)
+
+    async def astream(self, prompt: Any):
+        await asyncio.sleep(self.latency)
+        answer, usage = self._answer(prompt)
+        size = max(1, -(-len(answer) // self.chunks))
+        pieces = [answer[start:start + size] for start in range(0, len(answer), size)]
+        for index, piece in enumerate(pieces):
+            if self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            # Like LangChain with stream_usage=True, the usage comes with the last chunk
+            yield FakeMessage(piece, usage if index == len(pieces) - 1 else None)
@@ -0,0 +1,223 @@
+"""
+Plain-text extraction from Atlassian Document Format (ADF) documents.
+
+The document tree is walked with an explicit stack instead of recursion, so deeply nested
+content cannot hit the recursion limit. Text is emitted through a generator, which lets
+`adf_to_text` stop walking as soon as its length cap is reached.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Any, Iterator, List, Optional, Tuple
+
+# 0 disables the cap
+ADF_MAX_CHARS = int(os.getenv("ADF_MAX_CHARS", "0")) or None
+ADF_CODE_BLOCK_MAX_CHARS = int(os.getenv("ADF_CODE_BLOCK_MAX_CHARS", "2000")) or None
+TRUNCATION_MARK = " […]"
+
+# Nodes whose children are laid out as separate lines
+_BLOCK_NODES = frozenset({
+    "doc", "paragraph", "heading", "blockquote", "panel", "rule", "listItem", "taskItem", "decisionItem",
+    "bulletList", "orderedList", "taskList", "decisionList", "table", "tableRow", "mediaSingle", "mediaGroup",
+    "expand", "nestedExpand", "layoutSection", "layoutColumn", "bodiedExtension", "blockCard", "embedCard",
+})
+
+_NEWLINE = "\n"
+
+
+class _Close:
+    """Stack marker emitting `text` once all children of a node have been walked."""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _inline_text(node: dict) -> Optional[str]:
+    """Returns the text of an inline leaf node, or None if `node` is not one."""
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
+    if node_type == "text":
+        return node.get("text", "")
+    if node_type == "hardBreak":
+        return _NEWLINE
+    if node_type == "mention":
+        return attrs.get("text") or "@user"
+    if node_type == "emoji":
+        return attrs.get("text") or attrs.get("shortName", "")
+    if node_type == "status":
+        return f"[{attrs.get('text', '')}]"
+    if node_type == "date":
+        try:
+            return datetime.fromtimestamp(int(attrs["timestamp"]) / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+        except (KeyError, TypeError, ValueError):
+            return ""
+    if node_type in ("inlineCard", "blockCard", "embedCard"):
+        return attrs.get("url") or (attrs.get("data") or {}).get("url", "")
+    if node_type == "placeholder":
+        return attrs.get("text", "")
+    if node_type in ("media", "mediaInline"):
+        return "[attachment]"
+    if node_type in ("extension", "inlineExtension"):
+        return ""
+    return None
+
+
+def iter_adf_text(document: Any, code_block_max_chars: Optional[int] = ADF_CODE_BLOCK_MAX_CHARS) -> Iterator[str]:
+    """
+    Yields the text fragments of an ADF document in reading order.
+
+    Lists are rendered as `- ` / `1. ` items indented by depth, table cells are separated by ` | `,
+    headings, panels and expands become their own lines, and code blocks longer than
+    `code_block_max_chars` are truncated. Unknown node types are walked for their content.
+
+    Args:
+        document (Any): The ADF document (or any ADF node).
+        code_block_max_chars (int, optional): The maximum length of a single code block; None keeps it whole.
+
+    Yields:
+        str: Text fragments, with "\\n" fragments between blocks.
+    """
+    # Each entry is a node (with its list prefix and depth) or a _Close marker
+    stack: List[Any] = [(document, "", 0)]
+    while stack:
+        entry = stack.pop()
+        if isinstance(entry, _Close):
+            yield entry.text
+            continue
+
+        node, prefix, depth = entry
+        if not isinstance(node, dict):
+            continue
+
+        inline = _inline_text(node)
+        if inline is not None:
+            yield inline
+            continue
+
+        node_type = node.get("type")
+        children = node.get("content") or []
+        attrs = node.get("attrs") or {}
+
+        if node_type == "codeBlock":
+            code = "".join(child.get("text", "") for child in children if isinstance(child, dict))
+            if code_block_max_chars is not None and len(code) > code_block_max_chars:
+                code = code[:code_block_max_chars] + TRUNCATION_MARK
+            yield _NEWLINE
+            yield code
+            yield _NEWLINE
+            continue
+        if node_type == "rule":
+            yield _NEWLINE
+            continue
+
+        if node_type in _BLOCK_NODES:
+            yield _NEWLINE
+            stack.append(_Close(_NEWLINE))
+        if prefix:
+            yield prefix
+        if node_type in ("expand", "nestedExpand") and attrs.get("title"):
+            yield attrs["title"]
+            yield _NEWLINE
+
+        # Children are pushed in reverse, so that they are popped in document order
+        pushed: List[Any] = []
+        if node_type in ("bulletList", "orderedList", "taskList", "decisionList"):
+            order = attrs.get("order", 1) if node_type == "orderedList" else None
+            indent = "  " * depth
+            for index, child in enumerate(children):
+                if order is not None:
+                    item_prefix = f"{indent}{order + index}. "
+                elif node_type == "taskList":
+                    done = (child.get("attrs") or {}).get("state") == "DONE" if isinstance(child, dict) else False
+                    item_prefix = f"{indent}[{'x' if done else ' '}] "
+                else:
+                    item_prefix = f"{indent}- "
+                pushed.append((child, item_prefix, depth + 1))
+        elif node_type == "tableRow":
+            for index, child in enumerate(children):
+                if index:
+                    pushed.append(_Close(" | "))
+                pushed.append((child, "", depth))
+        elif node_type in ("tableCell", "tableHeader"):
+            # Cells hold paragraphs; keep each cell on the row's line
+            pushed.extend((child, "", depth) for child in _inline_paragraphs(children))
+        elif node_type in ("listItem", "taskItem", "decisionItem"):
+            # The first paragraph of an item goes on the line of its bullet
+            pushed.extend((child, "", depth) for child in _inline_paragraphs(children, first_only=True))
+        else:
+            pushed.extend((child, "", depth) for child in children)
+        stack.extend(reversed(pushed))
+
+
+def _inline_paragraphs(children: List[Any], first_only: bool = False) -> Iterator[Any]:
+    """Yields the children with paragraphs replaced by their inline content, separated by spaces."""
+    for index, child in enumerate(children):
+        if isinstance(child, dict) and child.get("type") == "paragraph" and (index == 0 or not first_only):
+            if index:
+                yield {"type": "text", "text": " "}
+            yield from child.get("content") or []
+        else:
+            yield child
+
+
+def adf_to_text(
+    document: Any,
+    max_chars: Optional[int] = ADF_MAX_CHARS,
+    code_block_max_chars: Optional[int] = ADF_CODE_BLOCK_MAX_CHARS
+) -> str:
+    """
+    Converts an ADF field to plain text in a single buffer.
+
+    Consecutive line breaks are collapsed and surrounding whitespace is stripped. Walking stops as
+    soon as `max_chars` characters have been produced. Fields that are not ADF documents are
+    returned as strings, and None becomes "".
+
+    Args:
+        document (Any): The ADF field, e.g. an issue description or a comment body.
+        max_chars (int, optional): The maximum length of the text; None keeps it whole.
+        code_block_max_chars (int, optional): The maximum length of a single code block; None keeps it whole.
+
+    Returns:
+        str: The extracted text.
+    """
+    if document is None:
+        return ""
+    if not isinstance(document, dict):
+        return str(document)
+
+    buffer: List[str] = []
+    length = 0
+    last_newline = True  # suppresses leading line breaks
+    truncated = False
+    for fragment in iter_adf_text(document, code_block_max_chars):
+        if fragment == _NEWLINE:
+            if last_newline:
+                continue
+            last_newline = True
+        elif not fragment:
+            continue
+        else:
+            last_newline = fragment.endswith(_NEWLINE)
+        if max_chars is not None and length + len(fragment) > max_chars:
+            buffer.append(fragment[:max_chars - length])
+            truncated = True
+            break
+        buffer.append(fragment)
+        length += len(fragment)
+
+    text = "".join(buffer).strip()
+    return text + TRUNCATION_MARK if truncated else text
+
+
+def adf_stats(document: Any) -> Tuple[int, int]:
+    """Returns the number of nodes and the maximum depth of an ADF document, for benchmarks and logging."""
+    nodes, max_depth = 0, 0
+    stack = [(document, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        nodes += 1
+        max_depth = max(max_depth, depth)
+        stack.extend((child, depth + 1) for child in node.get("content") or [])
+    return nodes, max_depth
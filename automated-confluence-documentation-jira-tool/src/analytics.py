@@ -0,0 +1,338 @@
+"""
+Progress analytics of a harvested epic, computed in-process rather than by the LLM.
+
+The stories of the epic frame (records_to_df) are reduced with pandas to the figures the page
+reports: the status breakdown and share completed, the contribution of each assignee, and the
+throughput, i.e. the stories created and completed each week. A story counts as completed when its
+status category last changed to done, as Jira records from the changelog in
+`statuscategorychangedate`, or else at its resolution date.
+
+The figures are rendered as Confluence storage-format tables and inline SVG charts and inserted into
+the LLM's narrative with `inject_analytics`; the LLM itself only gets their one-line `digest`.
+"""
+import os
+import re
+import html
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from .records import IssueRecord, records_to_df
+
+# Weeks shown in the throughput chart, the current one included
+ANALYTICS_THROUGHPUT_WEEKS = int(os.getenv("ANALYTICS_THROUGHPUT_WEEKS", "12"))
+# Assignees shown in the contribution chart; the table lists all of them
+ANALYTICS_CHART_ASSIGNEES = int(os.getenv("ANALYTICS_CHART_ASSIGNEES", "10"))
+# The Jira fields the analytics need besides status and assignee
+ANALYTICS_FIELDS = ["created", "resolutiondate", "statuscategorychangedate"]
+
+# Status categories in workflow order, as Jira keys them
+STATUS_CATEGORIES = ("new", "indeterminate", "done")
+CATEGORY_LABELS = {"new": "To Do", "indeterminate": "In Progress", "done": "Done"}
+CATEGORY_COLORS = {"new": "#8993A4", "indeterminate": "#0065FF", "done": "#36B37E"}
+# Categories guessed from the status name for records harvested without one, e.g. in older snapshots
+_CATEGORY_OF_STATUS = {
+    "": "new", "to do": "new", "open": "new", "backlog": "new", "selected for development": "new",
+    "done": "done", "closed": "done", "resolved": "done", "released": "done", "cancelled": "done",
+}
+UNASSIGNED = "Unassigned"
+CREATED_COLOR = "#C1C7D0"
+# The LLM's section before which the analytics are inserted; without it they are appended
+_INSERT_BEFORE = re.compile(r"<h2[^>]*>\s*Accomplishments", re.IGNORECASE)
+
+
+@dataclass
+class EpicAnalytics:
+    total: int
+    # Stories per status category
+    done: int
+    in_progress: int
+    to_do: int
+    # One row per status: status, category, stories, share (percent of all stories)
+    statuses: Any
+    # One row per assignee, by stories done: assignee, new, indeterminate, done, total, share_done
+    assignees: Any
+    # One row per week: week (start date, YYYY-MM-DD), created, completed
+    throughput: Any
+    # One row per story in workflow order: key, summary, status, category, assignee
+    stories: Any
+
+    @property
+    def percent_done(self) -> float:
+        return 100.0 * self.done / self.total if self.total else 0.0
+
+    def digest(self) -> str:
+        """
+        Returns the figures as one line of the LLM question, for the narrative to refer to.
+
+        The question is the key of the LLM response cache, so the digest leaves out the throughput:
+        its window moves with the current week and would change the key of an unchanged epic.
+        """
+        top = self.assignees[self.assignees["done"] > 0].head(3)
+        contributors = ", ".join(f"{row.assignee} ({row.done})" for row in top.itertuples())
+        line = (
+            f"Progress figures (already computed and shown on the page): {self.done} of {self.total} stories done "
+            f"({self.percent_done:.0f}%), {self.in_progress} in progress, {self.to_do} to do"
+        )
+        return f"{line}; most stories done by {contributors}." if contributors else f"{line}."
+
+
+def compute_analytics(
+    records: Iterable[IssueRecord],
+    now: Any = None,
+    weeks: int = ANALYTICS_THROUGHPUT_WEEKS
+) -> Optional[EpicAnalytics]:
+    """
+    Computes the progress analytics of the stories among the harvested `records`.
+
+    Args:
+        records (Iterable[IssueRecord]): The epic and its stories, as harvested.
+        now (optional): The end of the throughput window, anything pandas.Timestamp accepts; now by default.
+        weeks (int): The number of weeks of the throughput window.
+
+    Returns:
+        Optional[EpicAnalytics]: The analytics, or None if the epic has no stories.
+    """
+    import pandas as pd
+
+    frame = records_to_df(records)
+    if frame.empty:
+        return None
+    frame = frame.reindex(
+        columns=["key", "summary", "status", "status_category", "assignee", "issue_type", *ANALYTICS_FIELDS], fill_value=""
+    ).fillna("")
+    stories = frame[frame["issue_type"].str.lower() != "epic"]
+    if stories.empty:
+        return None
+
+    guessed = stories["status"].str.lower().map(_CATEGORY_OF_STATUS).fillna("indeterminate")
+    category = stories["status_category"].where(stories["status_category"].isin(STATUS_CATEGORIES), guessed)
+    category = pd.Categorical(category, categories=STATUS_CATEGORIES, ordered=True)
+    assignee = stories["assignee"].replace("", UNASSIGNED)
+    stories = stories.assign(category=category, assignee=assignee)
+    total = len(stories)
+    per_category = stories["category"].value_counts()
+
+    statuses = stories.groupby(["category", "status"], observed=True).size().rename("stories").reset_index()
+    statuses["share"] = statuses["stories"] * 100.0 / total
+    statuses = statuses.sort_values(["category", "stories"], ascending=[True, False], kind="stable")
+
+    assignees = pd.crosstab(stories["assignee"], stories["category"]).reindex(columns=list(STATUS_CATEGORIES), fill_value=0)
+    assignees.columns = list(STATUS_CATEGORIES)
+    assignees["total"] = assignees.sum(axis=1)
+    done = int(per_category.get("done", 0))
+    assignees["share_done"] = assignees["done"] * 100.0 / done if done else 0.0
+    assignees = assignees.rename_axis("assignee").reset_index().sort_values(
+        ["done", "total", "assignee"], ascending=[False, False, True], kind="stable"
+    )
+
+    # Weeks start on Monday; labelled by date so that the bins don't depend on the datetime resolution
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    now = now.tz_localize("UTC") if now.tzinfo is None else now.tz_convert("UTC")
+    last_week = now.normalize() - pd.Timedelta(days=now.weekday())
+    window = [(last_week - pd.Timedelta(weeks=offset)).strftime("%Y-%m-%d") for offset in range(weeks - 1, -1, -1)]
+
+    def week_of(values):
+        times = pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+        return (times.dt.normalize() - pd.to_timedelta(times.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d")
+
+    completed_at = stories["statuscategorychangedate"].where(stories["statuscategorychangedate"] != "", stories["resolutiondate"])
+    completed_week = week_of(completed_at)[stories["category"] == "done"]
+    throughput = pd.DataFrame({
+        "week": window,
+        "created": week_of(stories["created"]).value_counts().reindex(window, fill_value=0).to_numpy(),
+        "completed": completed_week.value_counts().reindex(window, fill_value=0).to_numpy(),
+    })
+
+    return EpicAnalytics(
+        total=total,
+        done=done,
+        in_progress=int(per_category.get("indeterminate", 0)),
+        to_do=int(per_category.get("new", 0)),
+        statuses=statuses,
+        assignees=assignees,
+        throughput=throughput,
+        stories=stories.sort_values(["category", "key"], kind="stable")[["key", "summary", "status", "category", "assignee"]],
+    )
+
+
+def _text(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def _table(headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> str:
+    """Renders a table; cells are escaped unless they are already markup (a tuple of one string)."""
+    def cell(value: Any) -> str:
+        return value[0] if isinstance(value, tuple) else _text(value)
+
+    head = "".join(f"<th>{_text(header)}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{cell(value)}</td>" for value in row) + "</tr>" for row in rows)
+    return f"<table><tbody><tr>{head}</tr>{body}</tbody></table>"
+
+
+def _svg(width: int, height: int, title: str, body: List[str]) -> str:
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        f'role="img" font-family="sans-serif" font-size="12"><title>{_text(title)}</title>{"".join(body)}</svg>'
+    )
+
+
+def _legend(x: int, y: int, entries: Sequence[Tuple[str, str]]) -> List[str]:
+    parts = []
+    for label, color in entries:
+        parts.append(f'<rect x="{x}" y="{y}" width="10" height="10" fill="{color}"/>')
+        parts.append(f'<text x="{x + 14}" y="{y + 9}">{_text(label)}</text>')
+        x += 24 + 7 * len(label)
+    return parts
+
+
+def bar_chart(title: str, rows: Sequence[Tuple[str, Sequence[int]]], colors: Sequence[str], labels: Sequence[str], width: int = 640) -> str:
+    """
+    Renders horizontal stacked bars as inline SVG, one bar per row, scaled to the largest row total.
+
+    Args:
+        title (str): The accessible title of the chart.
+        rows (Sequence[Tuple[str, Sequence[int]]]): The label of each bar and its segment values.
+        colors (Sequence[str]): The color of each segment.
+        labels (Sequence[str]): The legend of each segment.
+        width (int): The width of the chart in pixels.
+    """
+    label_width = 20 + 7 * max((len(label) for label, _ in rows), default=0) if len(rows) > 1 else 0
+    bar_width = width - label_width - 50
+    scale = max((sum(values) for _, values in rows), default=0) or 1
+    parts = _legend(label_width, 0, list(zip(labels, colors)))
+    for index, (label, values) in enumerate(rows):
+        y = 20 + 24 * index
+        if label_width:
+            parts.append(f'<text x="{label_width - 8}" y="{y + 13}" text-anchor="end">{_text(label)}</text>')
+        x = float(label_width)
+        for value, color, segment in zip(values, colors, labels):
+            if value:
+                length = bar_width * value / scale
+                parts.append(
+                    f'<rect x="{x:.1f}" y="{y}" width="{length:.1f}" height="18" fill="{color}">'
+                    f'<title>{_text(label or title)}: {value} {_text(segment)}</title></rect>'
+                )
+                x += length
+        parts.append(f'<text x="{x + 6:.1f}" y="{y + 13}">{sum(values)}</text>')
+    return _svg(width, 20 + 24 * len(rows), title, parts)
+
+
+def column_chart(title: str, categories: Sequence[str], series: Sequence[Tuple[str, str, Sequence[int]]], width: int = 640) -> str:
+    """
+    Renders grouped vertical bars as inline SVG, one group per category.
+
+    Args:
+        title (str): The accessible title of the chart.
+        categories (Sequence[str]): The label of each group, along the x axis.
+        series (Sequence[Tuple[str, str, Sequence[int]]]): The legend, color and per-category values of each series.
+        width (int): The width of the chart in pixels.
+    """
+    plot_top, plot_height, axis_width = 24, 140, 30
+    group_width = (width - axis_width) / max(len(categories), 1)
+    bar_width = group_width * 0.8 / max(len(series), 1)
+    scale = max((value for _, _, values in series for value in values), default=0) or 1
+    baseline = plot_top + plot_height
+    parts = _legend(axis_width, 0, [(label, color) for label, color, _ in series])
+    parts.append(f'<text x="{axis_width - 6}" y="{plot_top + 10}" text-anchor="end">{scale}</text>')
+    parts.append(f'<text x="{axis_width - 6}" y="{baseline}" text-anchor="end">0</text>')
+    parts.append(f'<line x1="{axis_width}" y1="{baseline}" x2="{width}" y2="{baseline}" stroke="#6B778C"/>')
+    for index, category in enumerate(categories):
+        x = axis_width + group_width * index + group_width * 0.1
+        for offset, (label, color, values) in enumerate(series):
+            value = values[index]
+            height = plot_height * value / scale
+            parts.append(
+                f'<rect x="{x + bar_width * offset:.1f}" y="{baseline - height:.1f}" width="{bar_width:.1f}" height="{height:.1f}" '
+                f'fill="{color}"><title>{_text(category)}: {value} {_text(label)}</title></rect>'
+            )
+        parts.append(
+            f'<text x="{x + group_width * 0.4:.1f}" y="{baseline + 16}" text-anchor="middle" font-size="10">{_text(category)}</text>'
+        )
+    return _svg(width, baseline + 22, title, parts)
+
+
+def render_analytics(analytics: Optional[EpicAnalytics], browse_url: str = "") -> str:
+    """
+    Renders the analytics as Confluence storage-format HTML: the progress, the team contributions,
+    the throughput and the key features table.
+
+    Args:
+        analytics (EpicAnalytics, optional): The analytics of the epic; None renders nothing.
+        browse_url (str): The Jira URL prefix of issue links, e.g. https://example.atlassian.net/browse/.
+    """
+    if analytics is None:
+        return ""
+    category_colors = [CATEGORY_COLORS[category] for category in STATUS_CATEGORIES]
+    category_labels = [CATEGORY_LABELS[category] for category in STATUS_CATEGORIES]
+    parts = [
+        "<h2>Progress</h2>",
+        f"<p><strong>{analytics.done} of {analytics.total} stories done ({analytics.percent_done:.0f}%)</strong>, "
+        f"{analytics.in_progress} in progress, {analytics.to_do} to do.</p>",
+        bar_chart("Stories by status category", [("", [analytics.to_do, analytics.in_progress, analytics.done])], category_colors, category_labels),
+        _table(
+            ["Status", "Category", "Stories", "Share"],
+            [
+                (row.status, CATEGORY_LABELS[row.category], row.stories, f"{row.share:.0f}%")
+                for row in analytics.statuses.itertuples()
+            ]
+        ),
+    ]
+
+    assignees = analytics.assignees
+    parts += [
+        "<h2>Team Contributions</h2>",
+        bar_chart(
+            "Stories per assignee",
+            [
+                (row.assignee, [row.new, row.indeterminate, row.done])
+                for row in assignees.head(ANALYTICS_CHART_ASSIGNEES).itertuples()
+            ],
+            category_colors,
+            category_labels
+        ),
+        _table(
+            ["Assignee", "Done", "In Progress", "To Do", "Total", "Share of done"],
+            [
+                (row.assignee, row.done, row.indeterminate, row.new, row.total, f"{row.share_done:.0f}%")
+                for row in assignees.itertuples()
+            ]
+        ),
+    ]
+
+    throughput = analytics.throughput
+    weeks = [week[5:] for week in throughput["week"]]
+    parts += [
+        "<h2>Throughput</h2>",
+        f"<p>Stories created and completed per week over the last {len(throughput)} weeks.</p>",
+        column_chart(
+            "Stories created and completed per week",
+            weeks,
+            [("Created", CREATED_COLOR, throughput["created"].tolist()), ("Completed", CATEGORY_COLORS["done"], throughput["completed"].tolist())]
+        ),
+        _table(
+            ["Week of", "Created", "Completed"],
+            [(row.week, row.created, row.completed) for row in throughput.itertuples()]
+        ),
+    ]
+
+    def issue_link(key: str) -> Tuple[str]:
+        return (f'<a href="{_text(browse_url + key)}">{_text(key)}</a>',) if browse_url else (_text(key),)
+
+    parts += [
+        "<h2>Key Features</h2>",
+        _table(
+            ["Key", "Feature", "Status", "Assignee"],
+            [(issue_link(row.key), row.summary, row.status, row.assignee) for row in analytics.stories.itertuples()]
+        ),
+    ]
+    return "".join(parts)
+
+
+def inject_analytics(summary_html: str, analytics_html: str) -> str:
+    """Inserts the rendered analytics into the LLM's summary, before its Accomplishments section or else at the end."""
+    if not analytics_html:
+        return summary_html
+    match = _INSERT_BEFORE.search(summary_html)
+    if match is None:
+        return f"{summary_html}\n{analytics_html}"
+    return f"{summary_html[:match.start()]}{analytics_html}\n{summary_html[match.start():]}"
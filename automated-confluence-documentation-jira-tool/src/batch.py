@@ -0,0 +1,175 @@
+"""
+Pipelined scheduling of multi-epic documentation runs.
+
+Every epic passes through the stages in order, but each stage has its own concurrency limit, so the
+stages of different epics overlap: while one epic is being summarized, the next ones are already
+harvested and the previous ones published. The wall time of a batch therefore approaches that of
+its slowest stage instead of the sum of all epics. Only as many epics as the stages can work on at
+once are in the pipeline, so a fast first stage does not pile up results for a slow later one.
+
+Run a batch from the tool root:
+
+    python -m src.batch --epics PLAT-1 PLAT-2 PLAT-3
+    python -m src.batch --jql 'fixVersion = "2024.10"' --title-template "{summary} ({epic_id})"
+"""
+import time
+import asyncio
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    name: str
+    # Works on the item's dict in place
+    run: Callable[[Dict[str, Any]], Awaitable[None]]
+    concurrency: int
+
+
+@dataclass
+class StageStats:
+    completed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    first_started: Optional[float] = None
+    last_finished: Optional[float] = None
+
+    def report(self, concurrency: int) -> Dict[str, Any]:
+        """Returns the stage's counts, its active wall time and throughput, and the mean time per item."""
+        active = (self.last_finished - self.first_started) if self.first_started is not None else 0.0
+        processed = self.completed + self.failed
+        return {
+            "concurrency": concurrency,
+            "completed": self.completed,
+            "failed": self.failed,
+            "active_seconds": round(active, 3),
+            "throughput_per_minute": round(self.completed / active * 60, 2) if active else 0.0,
+            "mean_seconds": round(self.busy_seconds / processed, 3) if processed else 0.0,
+        }
+
+
+async def run_pipeline(
+    items: List[Dict[str, Any]],
+    stages: List[Stage],
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    max_in_flight: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Runs every item through the stages, each stage bounded by its own semaphore.
+
+    An item whose stage raises is marked failed with the error and skips the remaining stages;
+    the other items carry on.
+
+    Args:
+        items (List[Dict[str, Any]]): One dict per item, updated in place with `status`, `stage` and `error`.
+        stages (List[Stage]): The stages, in order.
+        on_progress (Callable[[Dict[str, Any]], None], optional): Called with an item whenever it changes stage or fails.
+        max_in_flight (int, optional): The most items between entering the first stage and leaving the pipeline;
+            the sum of the stage concurrencies by default, so the results waiting for a busy stage stay bounded.
+
+    Returns:
+        Dict[str, Any]: The `items`, a per-stage report in `stages` and the batch's `wall_seconds`.
+    """
+    semaphores = {stage.name: asyncio.Semaphore(max(1, stage.concurrency)) for stage in stages}
+    in_flight = asyncio.Semaphore(max(1, max_in_flight or sum(max(1, stage.concurrency) for stage in stages)))
+    stats = {stage.name: StageStats() for stage in stages}
+    started = time.perf_counter()
+
+    async def process(item: Dict[str, Any]):
+        async with in_flight:
+            await run_stages(item)
+
+    async def run_stages(item: Dict[str, Any]):
+        for stage in stages:
+            async with semaphores[stage.name]:
+                item["stage"] = stage.name
+                if on_progress is not None:
+                    on_progress(item)
+                stage_stats = stats[stage.name]
+                stage_started = time.perf_counter()
+                if stage_stats.first_started is None:
+                    stage_stats.first_started = stage_started
+                try:
+                    await stage.run(item)
+                except Exception as err:
+                    logger.exception(f"Batch item {item.get('epic_id')} failed in stage {stage.name}: {err}")
+                    stage_stats.failed += 1
+                    item["status"] = "failed"
+                    item["error"] = f"{stage.name}: {err}"
+                    if on_progress is not None:
+                        on_progress(item)
+                    return
+                else:
+                    stage_stats.completed += 1
+                finally:
+                    stage_finished = time.perf_counter()
+                    stage_stats.busy_seconds += stage_finished - stage_started
+                    stage_stats.last_finished = stage_finished
+        item["status"] = "done"
+        if on_progress is not None:
+            on_progress(item)
+
+    for item in items:
+        item.setdefault("status", "running")
+    await asyncio.gather(*(process(item) for item in items))
+
+    return {
+        "items": items,
+        "stages": {stage.name: stats[stage.name].report(stage.concurrency) for stage in stages},
+        "wall_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Renders a batch report as a plain-text table."""
+    lines = [f"{'stage':>12} {'conc.':>5} {'done':>5} {'failed':>6} {'active s':>9} {'per min':>8} {'mean s':>7}"]
+    for name, stage in report["stages"].items():
+        lines.append(
+            f"{name:>12} {stage['concurrency']:>5} {stage['completed']:>5} {stage['failed']:>6} "
+            f"{stage['active_seconds']:>9.1f} {stage['throughput_per_minute']:>8.1f} {stage['mean_seconds']:>7.2f}"
+        )
+    done = sum(1 for item in report["items"] if item.get("status") == "done")
+    lines.append(f"{done}/{len(report['items'])} epics documented in {report['wall_seconds']:.1f}s")
+    for item in report["items"]:
+        if item.get("status") == "failed":
+            lines.append(f"  {item['epic_id']}: {item['error']}")
+    return "\n".join(lines)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument("--epics", nargs="+", help="keys of the epics to document")
+    targets.add_argument("--jql", help="JQL selecting the epics to document")
+    parser.add_argument("--title-template", default=None, help="page title, formatted with {epic_id} and {summary}")
+    parser.add_argument("--harvest-concurrency", type=int, default=None)
+    parser.add_argument("--llm-concurrency", type=int, default=None)
+    parser.add_argument("--publish-concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Imported here, as the app module configures clients and the LLM on import
+    from . import main
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await main.run_epic_batch(
+                epic_ids=args.epics,
+                jql=args.jql,
+                page_title_template=args.title_template,
+                harvest_concurrency=args.harvest_concurrency,
+                llm_concurrency=args.llm_concurrency,
+                publish_concurrency=args.publish_concurrency,
+            )
+        finally:
+            await main.get_async_transport().aclose()
+
+    print(format_report(asyncio.run(run())))
+
+
+if __name__ == "__main__":
+    main_cli()
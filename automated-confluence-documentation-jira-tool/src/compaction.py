@@ -0,0 +1,203 @@
+"""
+Compaction of harvested issues before they are formatted as the LLM question.
+
+Comments by bots are dropped, near-identical comments are deduplicated, only the newest comments
+of each issue are kept and long descriptions are truncated. When a hard token budget is set and the
+question still exceeds it, comments and descriptions are cut further, level by level, and the
+question is truncated as a last resort.
+"""
+import os
+import re
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from .adf import TRUNCATION_MARK
+from .records import CommentRecord, IssueRecord, format_records_for_llm, join_llm_blocks
+from .summarization import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _cap(name: str, default: str) -> Optional[int]:
+    # 0 disables the cap
+    return int(os.getenv(name, default)) or None
+
+
+# Off by default, since it changes the question, and so the summary, of every epic it applies to
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "false").lower() == "true"
+COMPACTION_DROP_BOTS = os.getenv("COMPACTION_DROP_BOTS", "true").lower() == "true"
+# Authors treated as bots besides Atlassian app accounts
+COMPACTION_BOT_AUTHORS = frozenset(
+    name.strip().lower() for name in os.getenv("COMPACTION_BOT_AUTHORS", "Automation for Jira,Jenkins,GitHub,Bitbucket,GitLab").split(",") if name.strip()
+)
+# Comments at least this similar (word trigram Jaccard) to a newer one are dropped; 0 only drops exact repeats
+COMPACTION_DEDUP_SIMILARITY = float(os.getenv("COMPACTION_DEDUP_SIMILARITY", "0.85"))
+COMPACTION_MAX_COMMENTS = _cap("COMPACTION_MAX_COMMENTS", "10")
+COMPACTION_MAX_DESCRIPTION_TOKENS = _cap("COMPACTION_MAX_DESCRIPTION_TOKENS", "600")
+PROMPT_TOKEN_BUDGET = _cap("PROMPT_TOKEN_BUDGET", "0")
+
+# Successively tighter (comments per issue, description tokens) caps tried to fit the token budget
+BUDGET_LEVELS = ((5, 300), (3, 150), (1, 60), (0, 30))
+
+
+@dataclass(frozen=True)
+class CompactionPolicy:
+    drop_bots: bool = COMPACTION_DROP_BOTS
+    bot_authors: FrozenSet[str] = COMPACTION_BOT_AUTHORS
+    dedup_similarity: float = COMPACTION_DEDUP_SIMILARITY
+    # None keeps everything
+    max_comments: Optional[int] = COMPACTION_MAX_COMMENTS
+    max_description_tokens: Optional[int] = COMPACTION_MAX_DESCRIPTION_TOKENS
+    token_budget: Optional[int] = PROMPT_TOKEN_BUDGET
+
+
+@dataclass
+class CompactionReport:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    bot_comments_dropped: int = 0
+    duplicate_comments_dropped: int = 0
+    old_comments_dropped: int = 0
+    descriptions_truncated: int = 0
+    # Index into BUDGET_LEVELS that fit the budget, -1 if none was needed
+    budget_level: int = -1
+    question_truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**{name: getattr(self, name) for name in self.__dataclass_fields__}, "tokens_saved": self.tokens_saved}
+
+
+_NON_WORD = re.compile(r"[^\w]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def _normalize(text: str) -> str:
+    """Lower-cases a comment and blanks out numbers and punctuation, so 'Build #12 passed' equals 'Build #13 passed'."""
+    return _NON_WORD.sub(" ", _DIGITS.sub("0", text.lower())).strip()
+
+
+def _shingles(words: List[str]) -> FrozenSet[Tuple[str, ...]]:
+    if len(words) < 3:
+        return frozenset([tuple(words)])
+    return frozenset(zip(words, words[1:], words[2:]))
+
+
+def is_bot(comment: CommentRecord, policy: CompactionPolicy) -> bool:
+    return comment.author_type == "app" or comment.author.lower() in policy.bot_authors or comment.author.lower().endswith("[bot]")
+
+
+def deduplicate_comments(comments: List[CommentRecord], similarity: float) -> List[CommentRecord]:
+    """Drops comments that repeat a newer one of the same thread, keeping the chronological order."""
+    kept: List[CommentRecord] = []
+    seen_texts = set()
+    seen_shingles: List[FrozenSet[Tuple[str, ...]]] = []
+    for comment in reversed(comments):
+        normalized = _normalize(comment.content)
+        if normalized in seen_texts:
+            continue
+        shingles = _shingles(normalized.split())
+        if similarity > 0 and any(
+            len(shingles & other) / len(shingles | other) >= similarity for other in seen_shingles
+        ):
+            continue
+        seen_texts.add(normalized)
+        seen_shingles.append(shingles)
+        kept.append(comment)
+    kept.reverse()
+    return kept
+
+
+def _compact_record(
+    record: IssueRecord,
+    policy: CompactionPolicy,
+    report: CompactionReport,
+    max_comments: Optional[int],
+    max_description_tokens: Optional[int]
+) -> IssueRecord:
+    comments = record.comments
+    if policy.drop_bots:
+        humans = [comment for comment in comments if not is_bot(comment, policy)]
+        report.bot_comments_dropped += len(comments) - len(humans)
+        comments = humans
+    unique = deduplicate_comments(comments, policy.dedup_similarity)
+    report.duplicate_comments_dropped += len(comments) - len(unique)
+    comments = unique
+    if max_comments is not None and len(comments) > max_comments:
+        report.old_comments_dropped += len(comments) - max_comments
+        comments = comments[len(comments) - max_comments:] if max_comments else []
+
+    description = record.description
+    if max_description_tokens is not None:
+        truncated = truncate_to_tokens(description, max_description_tokens)
+        if truncated != description:
+            report.descriptions_truncated += 1
+            description = truncated.rstrip() + TRUNCATION_MARK
+    return replace(record, comments=comments, description=description)
+
+
+def _question_text(records: List[IssueRecord], trailer: str = "") -> str:
+    return join_llm_blocks(*format_records_for_llm(records)) + trailer
+
+
+def compact_records(
+    records: List[IssueRecord],
+    policy: CompactionPolicy = CompactionPolicy(),
+    trailer: str = ""
+) -> Tuple[List[IssueRecord], CompactionReport]:
+    """
+    Applies the compaction policy to the records of an epic.
+
+    The input records are left untouched, so cached snapshots keep every comment.
+
+    Args:
+        records (List[IssueRecord]): The epic and its stories.
+        policy (CompactionPolicy): What to drop and how far to cut.
+        trailer (str): The text appended to the formatted records in the question, counted against the budget.
+
+    Returns:
+        Tuple[List[IssueRecord], CompactionReport]: The compacted records and what compaction saved, in tokens of the formatted question.
+    """
+    report = CompactionReport(tokens_before=estimate_tokens(_question_text(records, trailer)))
+
+    def compact(max_comments: Optional[int], max_description_tokens: Optional[int]) -> Tuple[List[IssueRecord], CompactionReport]:
+        level_report = CompactionReport(tokens_before=report.tokens_before)
+        compacted = [_compact_record(record, policy, level_report, max_comments, max_description_tokens) for record in records]
+        level_report.tokens_after = estimate_tokens(_question_text(compacted, trailer))
+        return compacted, level_report
+
+    compacted, final_report = compact(policy.max_comments, policy.max_description_tokens)
+    if policy.token_budget is not None and final_report.tokens_after > policy.token_budget:
+        for level, (level_comments, level_description) in enumerate(BUDGET_LEVELS):
+            compacted, final_report = compact(
+                min(level_comments, policy.max_comments or level_comments),
+                min(level_description, policy.max_description_tokens or level_description)
+            )
+            final_report.budget_level = level
+            if final_report.tokens_after <= policy.token_budget:
+                break
+    return compacted, final_report
+
+
+def enforce_token_budget(
+    question: str,
+    report: CompactionReport,
+    token_budget: Optional[int] = PROMPT_TOKEN_BUDGET,
+    trailer: str = ""
+) -> str:
+    """
+    Appends the trailer to the formatted records and truncates the records so that both fit the token budget.
+
+    Truncation is the last resort when even the tightest compaction level exceeds the budget; the
+    trailer, e.g. the link to the epic, is always kept whole.
+    """
+    if token_budget is None or estimate_tokens(question + trailer) <= token_budget:
+        return question + trailer
+    report.question_truncated = True
+    question = truncate_to_tokens(question, max(token_budget - estimate_tokens(trailer), 0)) + trailer
+    report.tokens_after = estimate_tokens(question)
+    return question
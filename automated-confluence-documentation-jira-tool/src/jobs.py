@@ -0,0 +1,289 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .shared_state import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Job stages, in the order a job goes through them
+QUEUED = "queued"
+HARVESTING = "harvesting"
+SUMMARIZING = "summarizing"
+PUBLISHING = "publishing"
+DONE = "done"
+FAILED = "failed"
+
+FINISHED_STAGES = (DONE, FAILED)
+
+# runner(epic_id, page_title, on_stage) -> result dict with at least "page_url"
+JobRunner = Callable[[str, str, Callable[[str], None]], Awaitable[Dict[str, Any]]]
+
+
+def new_job(epic_id: str, page_title: str) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "epic_id": epic_id,
+        "page_title": page_title,
+        "stage": QUEUED,
+        "page_url": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        # The worker process running the job
+        "worker_pid": os.getpid(),
+    }
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # e.g. owned by another user, but running
+        return True
+    return True
+
+
+class InMemoryJobStore:
+    """Keeps jobs in a dict. Jobs are lost when the process restarts."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Stores a new job, unless an identical one is active. Returns the job that is in flight."""
+        with self._lock:
+            for existing in self._jobs.values():
+                if existing["epic_id"] == job["epic_id"] and existing["page_title"] == job["page_title"] and existing["stage"] not in FINISHED_STAGES:
+                    return dict(existing)
+            self._jobs[job["id"]] = dict(job)
+            return dict(job)
+
+    def update(self, job_id: str, **changes):
+        with self._lock:
+            self._jobs[job_id].update(changes, updated_at=time.time())
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def find_active(self, epic_id: str, page_title: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job["epic_id"] == epic_id and job["page_title"] == page_title and job["stage"] not in FINISHED_STAGES:
+                    return dict(job)
+        return None
+
+    def list_unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job["stage"] not in FINISHED_STAGES]
+
+    def claim_unfinished(self, worker_pid: int) -> List[Dict[str, Any]]:
+        """Requeues the unfinished jobs for `worker_pid`; in memory, they can only be left over by this process."""
+        with self._lock:
+            claimed = [job for job in self._jobs.values() if job["stage"] not in FINISHED_STAGES]
+            for job in claimed:
+                job.update(stage=QUEUED, worker_pid=worker_pid, updated_at=time.time())
+            return [dict(job) for job in claimed]
+
+
+class SQLiteJobStore:
+    """
+    Persists jobs in a SQLite file, so queued and running jobs survive a restart.
+
+    Several worker processes may share the file: an identical submission to another worker joins
+    the job in flight, and a worker only resumes the unfinished jobs of workers that are gone.
+    """
+
+    COLUMNS = ("id", "epic_id", "page_title", "stage", "page_url", "error", "created_at", "updated_at", "worker_pid")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = connect_sqlite(path)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    epic_id TEXT NOT NULL,
+                    page_title TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    page_url TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    worker_pid INTEGER
+                )
+                """
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_by_submission ON jobs (epic_id, page_title, stage)")
+            # Stores created before jobs had an owner
+            if "worker_pid" not in {row["name"] for row in self._connection.execute("PRAGMA table_info(jobs)")}:
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN worker_pid INTEGER")
+        try:
+            with self._lock, self._connection:
+                # Lets only one of several workers queue a job for the same submission
+                self._connection.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_submission ON jobs (epic_id, page_title) "
+                    f"WHERE stage NOT IN ({', '.join(repr(stage) for stage in FINISHED_STAGES)})"
+                )
+        except sqlite3.IntegrityError:
+            logger.warning(f"{path} holds several active jobs of the same submission, so identical submissions to different workers are not merged.")
+
+    def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Stores a new job, unless an identical one is active. Returns the job that is in flight."""
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    [job.get(column) for column in self.COLUMNS]
+                )
+        except sqlite3.IntegrityError:
+            existing = self.find_active(job["epic_id"], job["page_title"])
+            if existing is None:
+                raise
+            return existing
+        return dict(job)
+
+    def update(self, job_id: str, **changes):
+        changes["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        with self._lock, self._connection:
+            self._connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*changes.values(), job_id])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_active(self, epic_id: str, page_title: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT * FROM jobs WHERE epic_id = ? AND page_title = ? AND stage NOT IN ({', '.join('?' * len(FINISHED_STAGES))})",
+                (epic_id, page_title, *FINISHED_STAGES)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT * FROM jobs WHERE stage NOT IN ({', '.join('?' * len(FINISHED_STAGES))}) ORDER BY created_at",
+                FINISHED_STAGES
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_unfinished(self, worker_pid: int) -> List[Dict[str, Any]]:
+        """
+        Requeues for `worker_pid` the unfinished jobs whose worker is gone, e.g. after a restart.
+
+        Each job is claimed with a compare-and-set on its previous worker, so when several
+        workers start at once every job is resumed by exactly one of them.
+        """
+        claimed = []
+        for job in self.list_unfinished():
+            previous = job.get("worker_pid")
+            if previous not in (None, worker_pid) and _process_alive(previous):
+                continue
+            with self._lock, self._connection:
+                updated = self._connection.execute(
+                    "UPDATE jobs SET stage = ?, worker_pid = ?, updated_at = ? WHERE id = ? AND worker_pid IS ?",
+                    (QUEUED, worker_pid, time.time(), job["id"], previous)
+                ).rowcount
+            if updated:
+                claimed.append({**job, "stage": QUEUED, "worker_pid": worker_pid})
+        return claimed
+
+
+class JobQueue:
+    def __init__(self, runner: JobRunner, store=None, workers: int = 4):
+        """
+        Runs documentation jobs on a bounded pool of asyncio workers.
+
+        Args:
+            runner (JobRunner): Coroutine function running the pipeline of one job. It reports its
+                progress through the `on_stage` callback and returns a dict with the `page_url`.
+            store (InMemoryJobStore | SQLiteJobStore, optional): Where jobs are kept. Defaults to an InMemoryJobStore.
+            workers (int, optional): How many jobs run at the same time. Defaults to 4.
+        """
+        self.runner = runner
+        self.store = store if store is not None else InMemoryJobStore()
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        # Jobs that were queued or running when their process stopped are picked up again
+        for job in self.store.claim_unfinished(os.getpid()):
+            logger.info(f"Resuming job {job['id']} for epic {job['epic_id']}.")
+            self._queue.put_nowait(job["id"])
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, epic_id: str, page_title: str) -> Dict[str, Any]:
+        """
+        Queues a documentation job, or returns the in-flight job of an identical submission.
+
+        Returns:
+            Dict[str, Any]: The job.
+        """
+        existing = self.store.find_active(epic_id, page_title)
+        if existing is not None:
+            logger.info(f"Job {existing['id']} for epic {epic_id} is already in flight.")
+            return existing
+
+        job = new_job(epic_id, page_title)
+        stored = self.store.create(job)
+        if stored["id"] != job["id"]:
+            # Submitted to another worker at the same time
+            logger.info(f"Job {stored['id']} for epic {epic_id} is already in flight.")
+            return stored
+        self._queue.put_nowait(job["id"])
+        logger.info(f"Queued job {job['id']} for epic {epic_id}.")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+
+        def on_stage(stage: str):
+            self.store.update(job_id, stage=stage)
+
+        try:
+            result = await self.runner(job["epic_id"], job["page_title"], on_stage)
+            self.store.update(job_id, stage=DONE, page_url=(result or {}).get("page_url"))
+            logger.info(f"Job {job_id} for epic {job['epic_id']} finished.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.exception(f"Job {job_id} for epic {job['epic_id']} failed: {err}")
+            self.store.update(job_id, stage=FAILED, error=str(err))
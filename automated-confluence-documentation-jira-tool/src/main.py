@@ -1,26 +1,41 @@
 #!/usr/bin/env python
 # coding: utf-8
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-import requests
-from requests.auth import HTTPBasicAuth
+import asyncio
+import httpx
 import json
+import hmac
+import hashlib
+import math
+import uuid
+import time
 import logging
-import pandas as pd
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, AsyncGenerator, AsyncIterator, Awaitable, Callable, Tuple
 
 
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, HTTPException, Header
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
 load_dotenv()  # take environment variables from .env.
 
-pd.set_option('display.max_colwidth', None)
+from .transport import get_async_transport
+from . import jobs
+from . import batch
+from .compaction import COMPACTION_ENABLED, compact_records, enforce_token_budget
+from .snapshots import EpicSnapshotStore
+from .shared_state import is_shared, state_path
+from .llm_cache import LLMResponseCache
+from .ratelimit import LLM_RATE_LIMITER, llm_tenant
+from .metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, CACHE_REQUESTS, STAGE_SECONDS, debug_dump, llm_span, operation_of, span
+from .summarization import estimate_tokens, map_reduce_question
+from .analytics import ANALYTICS_FIELDS, compute_analytics, inject_analytics, render_analytics
+from .records import IssueRecord, format_records_for_llm, join_llm_blocks, records_to_df
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -34,6 +49,7 @@ logger.addHandler(handler)
 
 # Constants
 OPEN_AI_MODEL = "gpt-4o"
+OPEN_AI_TEMPERATURE = 0
 
 # Retrieve environment variables, defaulting to empty strings if not set
 USERNAME = os.getenv("USERNAME", "")
@@ -49,31 +65,73 @@ def check_and_log_env_var(var_name, var_value):
     else:
         logging.info(f"{var_name} is set. Length: {len(var_value)}")
 
-check_and_log_env_var("USERNAME", USERNAME)
-check_and_log_env_var("CONFLUENCE_USERNAME", CONFLUENCE_USERNAME)
-check_and_log_env_var("PASSWORD", PASSWORD)
-check_and_log_env_var("CONFLUENCE_PASSWORD", CONFLUENCE_PASSWORD)
-check_and_log_env_var("OPENAI_API_KEY", OPENAI_API_KEY)
+def log_configuration():
+    """Logs which credentials are set and which stores are per worker, once when the app starts rather than on every import."""
+    check_and_log_env_var("USERNAME", USERNAME)
+    check_and_log_env_var("CONFLUENCE_USERNAME", CONFLUENCE_USERNAME)
+    check_and_log_env_var("PASSWORD", PASSWORD)
+    check_and_log_env_var("CONFLUENCE_PASSWORD", CONFLUENCE_PASSWORD)
+    check_and_log_env_var("OPENAI_API_KEY", OPENAI_API_KEY)
+    if WEB_CONCURRENCY > 1:
+        not_shared = [name for name, path in (("SNAPSHOT_STORE_PATH", SNAPSHOT_STORE_PATH), ("LLM_CACHE_PATH", LLM_CACHE_PATH), ("JOB_STORE_PATH", JOB_STORE_PATH)) if not is_shared(path)]
+        if not_shared:
+            logging.warning(f"Running {WEB_CONCURRENCY} workers, but {', '.join(not_shared)} are per worker; set SHARED_STATE_DIR to share them.")
 
 ATLASSIAN_BASE_URL = "https://one-atlas-szdg.atlassian.net"
 EPIC_ID = "PLAT-30837"
-FIELDS_OF_INTEREST = ["summary", "description", "status", "assignee"]
-
-DEFAULT_LLAMA_JIRA_SUMMARIZER_PROMPT = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate.from_template(
-        """You are a Project Manager specialized in creating high-level summaries for management. Your summaries should provide an executive overview of the current state of high-level features within a specific epic, focusing on progress, key accomplishments, and any significant issues or dependencies."""
-    ),
-    HumanMessagePromptTemplate.from_template(
-        """{question}
+# The analytics fields are only used for the charts and tables of the page, never sent to the LLM
+FIELDS_OF_INTEREST = ["summary", "description", "status", "assignee", *ANALYTICS_FIELDS]
+# Jira caps /search pages at 100 issues
+STORIES_PAGE_SIZE = int(os.getenv("STORIES_PAGE_SIZE", "100"))
+JIRA_HARVEST_WORKERS = int(os.getenv("JIRA_HARVEST_WORKERS", "8"))
+COMMENTS_PAGE_SIZE = int(os.getenv("COMMENTS_PAGE_SIZE", "100"))
+JIRA_COMMENT_WORKERS = int(os.getenv("JIRA_COMMENT_WORKERS", "8"))
+# Epic snapshot cache; set SNAPSHOT_STORE_PATH to only fetch issues updated since the last run
+SNAPSHOT_STORE_PATH = state_path("SNAPSHOT_STORE_PATH", "snapshots.db")
+SNAPSHOT_FULL_SYNC_HOURS = float(os.getenv("SNAPSHOT_FULL_SYNC_HOURS", "24"))
+# JQL dates have minute precision, so delta queries reach a little further back than the last sync
+SNAPSHOT_OVERLAP_MINUTES = 2
+# LLM response cache; set LLM_CACHE_PATH to keep responses across restarts
+LLM_CACHE_PATH = state_path("LLM_CACHE_PATH", "llm_cache.db", ":memory:")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+# Map-reduce summarization kicks in for questions larger than MAP_REDUCE_THRESHOLD_TOKENS
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "60000"))
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "12000"))
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+# Documentation jobs; set JOB_STORE_PATH to persist them in SQLite across restarts
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_STORE_PATH = state_path("JOB_STORE_PATH", "jobs.db")
+# Worker processes, as passed to uvicorn or gunicorn; with more than one, the stores above must be files (see SHARED_STATE_DIR)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Shared with the backend, whose Jira webhook receiver invalidates the snapshots of epics that lost or gained stories;
+# /cache/invalidate refuses every request without one
+CACHE_INVALIDATION_TOKEN = os.getenv("CACHE_INVALIDATION_TOKEN", "")
+# Update the page of the same title instead of creating a new one, skipping the write when the content is unchanged
+CONFLUENCE_UPSERT = os.getenv("CONFLUENCE_UPSERT", "true").lower() == "true"
+# Prefix of the version message that records the hash of the content published by this tool
+CONTENT_HASH_PREFIX = "docgen:sha256:"
+# Multi-epic batches: the stages of different epics overlap, each stage with its own concurrency limit
+BATCH_HARVEST_CONCURRENCY = int(os.getenv("BATCH_HARVEST_CONCURRENCY", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_PUBLISH_CONCURRENCY = int(os.getenv("BATCH_PUBLISH_CONCURRENCY", "2"))
+BATCH_PAGE_TITLE_TEMPLATE = os.getenv("BATCH_PAGE_TITLE_TEMPLATE", "{summary} ({epic_id})")
+# Readiness probe: each upstream check times out after READINESS_TIMEOUT_SECONDS, and a successful
+# warm-up is trusted for READINESS_RECHECK_SECONDS before the probe checks the upstreams again
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "10"))
+READINESS_RECHECK_SECONDS = float(os.getenv("READINESS_RECHECK_SECONDS", "60"))
+
+DEFAULT_LLAMA_JIRA_SUMMARIZER_SYSTEM_TEMPLATE = """You are a Project Manager specialized in creating high-level summaries for management. Your summaries should provide an executive overview of the current state of high-level features within a specific epic, focusing on progress, key accomplishments, and any significant issues or dependencies."""
+DEFAULT_LLAMA_JIRA_SUMMARIZER_HUMAN_TEMPLATE = """{question}
 
 Generate a concise, high-level summary in HTML format suitable for management consumption and compatible with Confluence integration via API. The summary should:
 
-- Use valid HTML tags (e.g., <h2>, <p>, <ul>, <li>, <table>, <tr>, <th>, <td>).
+- Use valid HTML tags (e.g., <h2>, <p>, <ul>, <li>).
 - Include the following sections:
   - <a>Link to Epic</a>: Link to the epic and use epic title as link name. 
   - <h2>Epic Summary</h2>: A brief description of the epic.
-  - <h2>Current Status</h2>: Overall progress (e.g., percentage completed, milestones achieved).
-  - <h2>Key Features</h2>: A table listing major features with columns for "Feature", "Status", and "Assignee".
+  - <h2>Current Status</h2>: A short narrative of the overall progress and milestones achieved, using the progress figures given above as they are.
   - <h2>Accomplishments</h2>: Notable achievements since the last update.
   - <h2>Challenges</h2>: Any significant issues or blockers.
   - <h2>Dependencies</h2>: Critical dependencies that may impact progress.
@@ -85,19 +143,37 @@ Ensure the summary:
 - Is clear, concise, and free of technical jargon.
 - Provides a high-level perspective understandable to non-technical stakeholders.
 - Contains only valid HTML elements.
+- Contains no tables or charts and computes no percentages or counts: the status breakdown, team contributions, throughput and feature table are added to the page automatically.
 - The final answer should only consist of the HTML code itself, without any Markdown formatting or code fences.
 - Use inner quotes ('') are used for quoting.
-""")
+"""
+
+@lru_cache(maxsize=1)
+def summarizer_prompt():
+    """Builds the summarizer prompt on first use, as importing LangChain is slow."""
+    from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+    return ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(DEFAULT_LLAMA_JIRA_SUMMARIZER_SYSTEM_TEMPLATE),
+        HumanMessagePromptTemplate.from_template(DEFAULT_LLAMA_JIRA_SUMMARIZER_HUMAN_TEMPLATE),
+    ])
+
+# The raw templates, so that editing the prompt invalidates cached responses
+DEFAULT_LLAMA_JIRA_SUMMARIZER_PROMPT_FINGERPRINT = json.dumps([
+    DEFAULT_LLAMA_JIRA_SUMMARIZER_SYSTEM_TEMPLATE,
+    DEFAULT_LLAMA_JIRA_SUMMARIZER_HUMAN_TEMPLATE,
 ])
 
-logger.info(f"Length of Atlassian Password: {len(PASSWORD)}")
-logger.info(f"Length of Confluence Password: {len(CONFLUENCE_PASSWORD)}")
-logger.info(f"Length of OpenAI API Key: {len(os.environ['OPENAI_API_KEY'])}")
+class AsyncJiraRequestor:
+    """
+    Harvests epics from Jira, with their stories and comments, into issue records.
+
+    Every request is awaited on the shared AsyncAtlassianTransport and comments are loaded in batch
+    through the search's `comment` field, so harvesting an epic never blocks the event loop.
+    """
 
-class JiraRequestor:
     def __init__(self, base_url: str, username: str, password: str):
         """
-        Initializes the JiraRequestor with the base URL, username, and password.
+        Initializes the AsyncJiraRequestor with the base URL, username, and password.
 
         Args:
             base_url (str): The base URL of the Jira instance (e.g., https://your-domain.atlassian.net).
@@ -107,287 +183,357 @@ class JiraRequestor:
         self.api_url = f"{base_url}/rest/api/3"
         self.api_search_url = f"{self.api_url}/search"
         self.username = username
-        self._password = password
-
-    def _get_all_stories_by_epic_raw(
-        self, 
-        epic_id: str, 
-        fields_of_interest: List[str], 
-        max_results: int = 5
-    ):
-        """
-        Fetches all stories associated with a specific epic from Jira.
-
-        Args:
-            epic_id (str): The ID or key of the epic.
-            fields_of_interest (List[str]): A list of fields to retrieve for each story.
-            max_results (int, optional): The number of results to return per request. Defaults to 50.
+        self._async_auth = httpx.BasicAuth(username, password)
+        self._async_transport = get_async_transport()
 
-        Returns:
-            Optional[List[Dict[str, Any]]]: A list of stories as dictionaries if successful, else None.
-        """
-        jql = f'"Epic Link" = "{epic_id}"'
-        params = {
+    @staticmethod
+    def _stories_by_epic_params(
+        epic_id: str,
+        fields_of_interest: List[str],
+        max_results: int,
+        start_at: int,
+        jql: Optional[str] = None
+    ) -> Dict[str, Any]:
+        jql = jql or f'"Epic Link" = "{epic_id}"'
+        return {
             'jql': jql,
             'fields': ','.join(fields_of_interest),
             'maxResults': max_results,
-            'startAt': 0
+            'startAt': start_at
         }
 
-        try:
-            logger.debug(f"Fetching stories with params: {params}")
-            response = self._make_jira_request(self.api_search_url, params)
+    @staticmethod
+    def _delta_sync_since(epic_id: str, snapshot_store: Optional[EpicSnapshotStore], now: float) -> Optional[float]:
+        """Returns the last sync of the epic's snapshot if the refresh can be a delta sync, None if it has to be a full harvest."""
+        if snapshot_store is None or snapshot_store.needs_full_sync(epic_id, SNAPSHOT_FULL_SYNC_HOURS * 3600, now):
+            return None
+        # Another worker may have invalidated the snapshot in between
+        times = snapshot_store.sync_times(epic_id)
+        return times["last_sync"] if times else None
 
-            if response is None:
-                logger.error("Failed to fetch stories.")
-                return None
+    @staticmethod
+    def _changed_issues_of_epic_jql(epic_id: str, last_sync: float, now: float) -> str:
+        # A relative date ("-15m") avoids depending on the timezone of the Jira user's profile
+        minutes = math.ceil((now - last_sync) / 60) + SNAPSHOT_OVERLAP_MINUTES
+        return f'(key = "{epic_id}" OR "Epic Link" = "{epic_id}") AND updated >= "-{minutes}m"'
 
-            logger.info(f"Fetched {len(response.get('issues', []))} stories.")
-            return response
+    @staticmethod
+    def _merge_into_snapshot(
+        epic_id: str,
+        changed_records: List[IssueRecord],
+        snapshot_store: EpicSnapshotStore,
+        synced_at: float
+    ) -> Optional[List[IssueRecord]]:
+        """Returns the merged snapshot, or None if the epic was invalidated meanwhile and needs a full harvest."""
+        for record in changed_records:
+            record.issue_type = "epic" if record.key == epic_id else "story"
+        merged = snapshot_store.merge(epic_id, [record.to_state() for record in changed_records], synced_at)
+        return [IssueRecord.from_state(state) for state in merged] if merged is not None else None
 
-        except Exception as e:
-            logger.exception(f"An unexpected error occurred: {e}")
-            return None
+    @staticmethod
+    def _with_comment_field(fields_of_interest: List[str]) -> List[str]:
+        return fields_of_interest if "comment" in fields_of_interest else [*fields_of_interest, "comment"]
 
-    def get_all_stories_by_epic(
-        self, 
-        epic_id: str, 
-        fields_of_interest: List[str], 
-        max_results: int = 5
-    ):
-        stories_by_epic_data_raw = self._get_all_stories_by_epic_raw(epic_id, fields_of_interest, max_results)
-        processed_issues_by_epic = [self._pre_process_issue(story_by_epic_data_raw, FIELDS_OF_INTEREST) for story_by_epic_data_raw in stories_by_epic_data_raw["issues"]]
-        df_processed_issues_by_epic = pd.DataFrame(processed_issues_by_epic)
-        df_processed_issues_by_epic["issue_type"] = "story"
-        return df_processed_issues_by_epic
-
-    def _get_epic_raw(
-        self, 
-        epic_id: str, 
-        fields_of_interest: List[str]
+    async def _aget_all_stories_by_epic_raw(
+        self,
+        epic_id: str,
+        fields_of_interest: List[str],
+        max_results: int = STORIES_PAGE_SIZE,
+        start_at: int = 0,
+        jql: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
+        params = self._stories_by_epic_params(epic_id, fields_of_interest, max_results, start_at, jql)
+        logger.debug(f"Fetching stories with params: {params}")
+        response = await self._amake_jira_request(self.api_search_url, params)
+        if response is None:
+            logger.error("Failed to fetch stories.")
+            return None
+
+        logger.info(f"Fetched {len(response.get('issues', []))} stories (startAt={start_at}).")
+        return response
+
+    async def aiter_stories_by_epic_raw(
+        self,
+        epic_id: str,
+        fields_of_interest: List[str],
+        max_results: int = STORIES_PAGE_SIZE,
+        max_workers: int = JIRA_HARVEST_WORKERS,
+        jql: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Fetches details of a specific epic from Jira.
+        Yields every raw story of an epic, page by page, as the pages arrive.
+
+        The first page is fetched alone to learn the ``total``; the remaining ``startAt`` windows are
+        fetched concurrently with at most ``max_workers`` pages in flight, so only a bounded number of
+        raw pages is held in memory at once.
 
         Args:
             epic_id (str): The ID or key of the epic.
-            fields_of_interest (List[str]): A list of fields to retrieve for the epic.
+            fields_of_interest (List[str]): A list of fields to retrieve for each story.
+            max_results (int, optional): The page size. Defaults to STORIES_PAGE_SIZE.
+            max_workers (int, optional): The number of concurrent page requests. Defaults to JIRA_HARVEST_WORKERS.
+            jql (str, optional): Replaces the default query for the stories of the epic.
 
-        Returns:
-            Optional[Dict[str, Any]]: A dictionary containing epic details if successful, else None.
+        Yields:
+            Dict[str, Any]: A raw story as returned by the Jira search API.
+
+        Raises:
+            RuntimeError: If a page cannot be fetched, so that a partial epic is never documented.
         """
-        issue_url = f"{self.api_url}/issue/{epic_id}"
-        params = {
-            'fields': ','.join(fields_of_interest)
-        }
+        first_page = await self._aget_all_stories_by_epic_raw(epic_id, fields_of_interest, max_results, 0, jql)
+        if first_page is None:
+            raise RuntimeError(f"Failed to fetch the stories of epic {epic_id}.")
+
+        first_issues = first_page.get("issues", [])
+        total = first_page.get("total", len(first_issues))
+        page_size = len(first_issues) or max_results
+        for issue in first_issues:
+            yield issue
+
+        pending_starts = iter(range(page_size, total, page_size))
+        in_flight = {}
+
+        def submit_next() -> bool:
+            start_at = next(pending_starts, None)
+            if start_at is None:
+                return False
+            task = asyncio.ensure_future(
+                self._aget_all_stories_by_epic_raw(epic_id, fields_of_interest, page_size, start_at, jql)
+            )
+            in_flight[task] = start_at
+            return True
 
-        try:
-            logger.debug(f"Fetching epic with ID: {epic_id} and params: {params}")
-            response = self._make_jira_request(issue_url, params)
+        while len(in_flight) < max_workers and submit_next():
+            pass
 
-            if response is None:
-                logger.error("Failed to fetch epic.")
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    start_at = in_flight.pop(task)
+                    page = task.result()
+                    if page is None:
+                        raise RuntimeError(f"Failed to fetch stories page startAt={start_at} of epic {epic_id}.")
+                    for issue in page.get("issues", []):
+                        yield issue
+                    submit_next()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _aget_all_comments_of_issue_raw(self, issue_key, start_at: int = 0) -> Optional[List[Dict[str, Any]]]:
+        comments_raw = []
+        issue_url = f"{self.api_url}/issue/{issue_key}/comment"
+        while True:
+            params = {'startAt': start_at, 'maxResults': COMMENTS_PAGE_SIZE}
+            page = await self._amake_jira_request(issue_url, params)
+            if page is None:
+                logger.error(f"Failed to fetch comments of issue {issue_key}.")
                 return None
 
-            logger.info(f"Epic {epic_id} fetched successfully.")
-            return response
-
-        except Exception as e:
-            logger.exception(f"An unexpected error occurred: {e}")
-            return None
+            page_comments = page.get("comments", [])
+            comments_raw.extend(page_comments)
+            start_at += len(page_comments)
+            if not page_comments or start_at >= page.get("total", 0):
+                return comments_raw
 
-    def get_epic(self, epic_id: str, fields_of_interest: List[str]):
-        epic_data_raw = self._get_epic_raw(epic_id, fields_of_interest)
-        pre_processed_epic = self._pre_process_issue(epic_data_raw, fields_of_interest)
-        df_pre_processed_epic = pd.DataFrame([pre_processed_epic])
-        df_pre_processed_epic["issue_type"] = "epic"
-        return df_pre_processed_epic
-
-    def cooked_df_epic_with_stories(self, epic_id, fields_of_interest):
-        df_epic = self.get_epic(epic_id, fields_of_interest)
-        df_enriched_stories = self.get_all_stories_by_epic(epic_id, fields_of_interest)
-
-        return pd.concat([df_epic, df_enriched_stories], ignore_index=True)
-
-    def format_for_llm(self, cooked_df_epic_with_enriched_stories):
-        df = cooked_df_epic_with_enriched_stories
-        # Separate epics and stories
-        epics = df[df['issue_type'].str.lower() == 'epic']
-        stories = df[df['issue_type'].str.lower() == 'story']
-    
-        formatted_output = []
-    
-        for _, epic_row in epics.iterrows():
-            formatted_output.append("Epic:")
-            formatted_output.append(f"title: {epic_row['summary']}")
-            formatted_output.append(f"description: {epic_row['description']}")
-            formatted_output.append(f"status: {epic_row['status']}")
-            formatted_output.append(f"comments_string: {epic_row['comments_string']}")
-            formatted_output.append("")
-    
-        # Since all stories are assumed to be associated with this epic,
-        # we'll just include all stories here.
-        if not stories.empty:
-            formatted_output.append("stories:")
-            for _, story_row in stories.iterrows():
-                formatted_output.append(f"  title: {story_row['summary']}")
-                formatted_output.append(f"  description: {story_row['description']}")
-                formatted_output.append(f"  status: {story_row['status']}")
-                formatted_output.append(f"  comments_string: {story_row['comments_string']}")
-                formatted_output.append("")
-    
-        return "\n".join(formatted_output).strip()        
-
-    def _pre_process_issue(self, issue, fields_of_interest):
-        # Initialize the result dictionary
-        result = {}
-        result["key"] = issue["key"]
-    
-        # Helper function to extract text from Jira's "doc" type description
-        def extract_description_text(description_field):
-            # Check if description is in the doc format
-            if isinstance(description_field, dict) and description_field.get('type') == 'doc':
-                # Traverse the content array to extract the text
-                content = description_field.get('content', [])
-                text_parts = []
-                for block in content:
-                    if block.get('type') == 'paragraph':
-                        for inner_content in block.get('content', []):
-                            if inner_content.get('type') == 'text':
-                                text_parts.append(inner_content.get('text', ''))
-                return ' '.join(text_parts).strip()
-            # If it's not in doc format (rare cases), just return it as a string
-            return str(description_field)
-        
-        # Extract values based on fields_of_interest
-        for field in fields_of_interest:
-            if field == "title":
-                # title in Jira issue fields is 'summary'
-                result[field] = issue.get('fields', {}).get('summary', '')
-            elif field == "description":
-                # description might be in doc format
-                description_field = issue.get('fields', {}).get('description', '')
-                result[field] = extract_description_text(description_field)
-            elif field == "status":
-                # status name is in fields.status.name
-                result[field] = issue.get('fields', {}).get('status', {}).get('name', '')
-            elif field == "assignee":
-                result[field] = issue.get('fields', {}).get('assignee', {}).get('displayName', '')
-            else:
-                # If any other fields are requested directly from fields
-                result[field] = str(issue.get('fields', {}).get(field, ''))
-
-        issue_with_enriched_comments_string = self._enrich_issue_with_comments(result)
-        return issue_with_enriched_comments_string
-
-    def _enrich_issue_with_comments(self, issue):
-        issue_key = issue["key"]
-        df_comments_of_issue = self.get_comments_df_of_issue(issue_key)
-        comments_string = self.concatenate_comments(df_comments_of_issue)
-        issue["comments_string"] = comments_string 
-        return issue
-
-    def _get_comments_of_issue_raw(self, issue_key):
+    async def _aissue_records_with_embedded_comments(
+        self,
+        issues_raw: AsyncGenerator[Dict[str, Any], None],
+        fields_of_interest: List[str],
+        issue_type: str = ""
+    ) -> List[IssueRecord]:
         """
-  bb      Get the comments of a specific issue. 
+        Builds the records of issues that were fetched with the `comment` field.
+
+        Issues whose whole comment thread is embedded are processed right away. Jira only embeds
+        the first page of comments, so issues with overflow comments have the rest fetched with at
+        most JIRA_COMMENT_WORKERS requests in flight and are processed once their thread is complete.
 
         Args:
-            issue_key (str): The key of the issue.
+            issues_raw (AsyncGenerator[Dict[str, Any], None]): Raw issues including `fields.comment`, closed once consumed.
+            fields_of_interest (List[str]): A list of fields to keep for each issue.
+            issue_type (str, optional): The issue type of the records.
+
+        Returns:
+            List[IssueRecord]: The records, in the order the issues were received.
         """
-        issue_url = f"{self.api_url}/issue/{issue_key}/comment"
-        params = {}
+        semaphore = asyncio.Semaphore(max(1, JIRA_COMMENT_WORKERS))
 
+        async def fetch_overflow(issue_key: str, start_at: int):
+            async with semaphore:
+                return await self._aget_all_comments_of_issue_raw(issue_key, start_at)
+
+        records = []
+        overflow = []
         try:
-            logger.debug(f"Fetching story with key: {issue_key} and params: {params}")
-            response = self._make_jira_request(issue_url, params)
+            async for issue_raw in issues_raw:
+                embedded = (issue_raw.get("fields", {}).get("comment") or {})
+                comments_raw = embedded.get("comments", [])
+                total = embedded.get("total", len(comments_raw))
+                if total > len(comments_raw):
+                    task = asyncio.ensure_future(fetch_overflow(issue_raw["key"], len(comments_raw)))
+                    overflow.append((len(records), issue_raw, comments_raw, task))
+                    records.append(None)
+                else:
+                    records.append(IssueRecord.from_raw(issue_raw, fields_of_interest, comments_raw, issue_type))
+
+            for index, issue_raw, comments_raw, task in overflow:
+                remaining_comments_raw = await task
+                if remaining_comments_raw is None:
+                    logger.error(f"Failed to fetch overflow comments of issue {issue_raw['key']}.")
+                    remaining_comments_raw = []
+                records[index] = IssueRecord.from_raw(
+                    issue_raw, fields_of_interest, comments_raw + remaining_comments_raw, issue_type
+                )
+        except BaseException:
+            # A failed harvest leaves no comment requests behind
+            for _, _, _, task in overflow:
+                task.cancel()
+            raise
+        finally:
+            # Cancels the page requests still in flight when the harvest stopped early
+            await issues_raw.aclose()
+
+        logger.info(f"Loaded comments of {len(records)} issues ({len(overflow)} needed extra comment pages).")
+        return records
+
+    async def aget_all_story_records_by_epic(
+        self,
+        epic_id: str,
+        fields_of_interest: List[str],
+        max_results: int = STORIES_PAGE_SIZE
+    ) -> List[IssueRecord]:
+        story_records = await self._aissue_records_with_embedded_comments(
+            self.aiter_stories_by_epic_raw(epic_id, self._with_comment_field(fields_of_interest), max_results),
+            fields_of_interest,
+            "story"
+        )
+        logger.info(f"Harvested {len(story_records)} stories of epic {epic_id}.")
+        return story_records
 
-            if response is None:
-                logger.error("Failed to fetch epic.")
-                return None
+    async def aget_epic_record(self, epic_id: str, fields_of_interest: List[str]) -> IssueRecord:
+        issue_url = f"{self.api_url}/issue/{epic_id}"
+        params = {'fields': ','.join(self._with_comment_field(fields_of_interest))}
+        logger.debug(f"Fetching epic with ID: {epic_id} and params: {params}")
+        epic_data_raw = await self._amake_jira_request(issue_url, params)
+        if epic_data_raw is None:
+            raise RuntimeError(f"Failed to fetch epic {epic_id}.")
 
-            logger.info(f"Epic {issue_key} fetched successfully.")
-            return response
+        async def single_issue():
+            yield epic_data_raw
 
-        except Exception as e:
-            logger.exception(f"An unexpected error occurred: {e}")
-            return None
+        return (await self._aissue_records_with_embedded_comments(single_issue(), fields_of_interest, "epic"))[0]
 
-    def get_comments_df_of_issue(self, issue_key):
-        comments_data_raw = self._get_comments_of_issue_raw(issue_key)["comments"]
-        pre_processed_comments = []
-        for comment_data_raw in comments_data_raw:
-            pre_processed_comment = self._pre_process_comment(comment_data_raw) 
-            pre_processed_comment["key"] = issue_key
-            pre_processed_comments.append(pre_processed_comment)
-        
-        return pd.DataFrame(pre_processed_comments)
-
-    def concatenate_comments(self, df_comments):
-        concatenated_comment_string = []
-        # Iterate over rows in the DataFrame
-        for idx, row in df_comments.iterrows():
-            author = row["author"]
-            content = row["content"]
-            concatenated_comment_string.append(f"{idx}. {author}: {content};")
-        return "\n".join(concatenated_comment_string)
-    
-    @staticmethod
-    def _pre_process_comment(comment):
-        def extract_text_from_doc(doc_field):
-            # Check if body is in the doc format
-            if isinstance(doc_field, dict) and doc_field.get('type') == 'doc':
-                content = doc_field.get('content', [])
-                text_parts = []
-                for block in content:
-                    if block.get('type') == 'paragraph':
-                        for inner_content in block.get('content', []):
-                            if inner_content.get('type') == 'text':
-                                text_parts.append(inner_content.get('text', ''))
-                return ' '.join(text_parts).strip()
-            # If it's not doc format, just return it as string
-            return str(doc_field)
-        
-        author = comment.get('author', {}).get('displayName', '')
-        body_field = comment.get('body', {})
-        content = extract_text_from_doc(body_field)
-    
-        return {
-            'author': author,
-            'content': content
-        }
-    
-    def _make_jira_request(
-        self, 
-        url: str, 
+    async def acooked_records_epic_with_stories(
+        self,
+        epic_id,
+        fields_of_interest,
+        snapshot_store: Optional[EpicSnapshotStore] = None
+    ) -> List[IssueRecord]:
+        """
+        Harvests the epic and all of its stories as records, the epic first.
+
+        With a `snapshot_store`, only the issues updated since the last sync are fetched and
+        merged into the cached snapshot, except when a full harvest is due.
+        """
+        sync_started = time.time()
+        last_sync = self._delta_sync_since(epic_id, snapshot_store, sync_started)
+        if last_sync is not None:
+            CACHE_REQUESTS.inc(cache="snapshot", result="delta")
+            changed_records = await self._aissue_records_with_embedded_comments(
+                self.aiter_stories_by_epic_raw(
+                    epic_id,
+                    self._with_comment_field(fields_of_interest),
+                    jql=self._changed_issues_of_epic_jql(epic_id, last_sync, sync_started)
+                ),
+                fields_of_interest
+            )
+            merged = self._merge_into_snapshot(epic_id, changed_records, snapshot_store, sync_started)
+            if merged is not None:
+                return merged
+            # Invalidated by another request or worker meanwhile
+            sync_started = time.time()
+
+        harvests = [
+            asyncio.ensure_future(self.aget_epic_record(epic_id, fields_of_interest)),
+            asyncio.ensure_future(self.aget_all_story_records_by_epic(epic_id, fields_of_interest)),
+        ]
+        try:
+            epic_record, story_records = await asyncio.gather(*harvests)
+        except BaseException:
+            # The stories are no use without the epic and the other way round; stop both
+            for harvest in harvests:
+                harvest.cancel()
+            await asyncio.gather(*harvests, return_exceptions=True)
+            raise
+
+        records = [epic_record, *story_records]
+        if snapshot_store is not None:
+            CACHE_REQUESTS.inc(cache="snapshot", result="full")
+            snapshot_store.replace(epic_id, [record.to_state() for record in records], sync_started)
+        return records
+
+    async def acooked_df_epic_with_stories(self, epic_id, fields_of_interest, snapshot_store: Optional[EpicSnapshotStore] = None):
+        return records_to_df(await self.acooked_records_epic_with_stories(epic_id, fields_of_interest, snapshot_store))
+
+    async def asearch_epic_keys(self, jql: str, max_results: int = STORIES_PAGE_SIZE) -> List[str]:
+        """Returns the keys of the epics matching `jql`, in rank order."""
+        keys = []
+        start_at = 0
+        while True:
+            params = {
+                "jql": f"issuetype = Epic AND ({jql})",
+                "fields": "summary",
+                "maxResults": max_results,
+                "startAt": start_at
+            }
+            response = await self._amake_jira_request(self.api_search_url, params)
+            if response is None:
+                raise RuntimeError(f"Failed to search epics with JQL: {jql}")
+            issues = response.get("issues", [])
+            keys.extend(issue["key"] for issue in issues)
+            start_at += len(issues)
+            if not issues or start_at >= response.get("total", 0):
+                return keys
+
+    async def aping(self):
+        """Checks the credentials with a cheap request, which also opens a pooled connection to Jira."""
+        if await self._amake_jira_request(f"{self.api_url}/myself", {}) is None:
+            raise RuntimeError("Jira did not answer /myself.")
+
+    async def _amake_jira_request(
+        self,
+        url: str,
         params: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
         """
         Makes a GET request to the specified Jira API endpoint with given parameters.
 
-        Args:
-            url (str): The full URL to send the GET request to.
-            params (Dict[str, Any]): Query parameters for the GET request.
-
         Returns:
             Optional[Dict[str, Any]]: The JSON response as a dictionary if successful, else None.
         """
         try:
-            response = requests.get(
-                url,
-                params=params,
-                auth=HTTPBasicAuth(self.username, self._password)
-            )
+            with span("jira", operation_of(url)) as result:
+                response = await self._async_transport.request(
+                    "GET",
+                    url,
+                    params=params,
+                    auth=self._async_auth
+                )
+                result["outcome"] = f"{response.status_code // 100}xx"
+                result["bytes"] = len(response.content)
 
             # Raise an exception for HTTP error responses
             response.raise_for_status()
 
             data = response.json()
-            logger.debug(f"Response data: {json.dumps(data, indent=2)}")
+            debug_dump(logger, "Response data", lambda: data)
             return data
 
-        except requests.exceptions.HTTPError as http_err:
-            logger.error(f"HTTP error occurred: {http_err} - Response: {response.text}")
-        except requests.exceptions.RequestException as req_err:
+        except httpx.HTTPStatusError as http_err:
+            logger.error(f"HTTP error occurred: {http_err} - Response: {http_err.response.text}")
+        except httpx.RequestError as req_err:
             logger.error(f"Request exception occurred: {req_err}")
         except json.JSONDecodeError as json_err:
             logger.error(f"JSON decode error: {json_err} - Response Text: {response.text}")
@@ -396,18 +542,53 @@ class JiraRequestor:
 
         return None
 
-class ConfluenceRequestor:
+# (base URL, space key, title) -> page id, so that known pages are read by id instead of searched by title
+_confluence_page_ids: Dict[Tuple[str, str, str], str] = {}
+
+class AsyncConfluenceRequestor:
+    """Publishes pages to Confluence, awaiting every request on the shared AsyncAtlassianTransport."""
+
     def __init__(self, base_url: str, username: str, password: str):
         self.base_url = base_url
         self.username = username
-        self._password = password
+        self._async_auth = httpx.BasicAuth(username, password)
+        self._async_transport = get_async_transport()
 
-    def write_to_confluence_page(self, title: str, content: str, space_key: str = "testmax"):
-        """Create a new Confluence page with the given title and content."""
-        confluence_url = f"{self.base_url}/wiki/rest/api/content"
+    @staticmethod
+    def _find_page_params(title: str, space_key: str) -> Dict[str, Any]:
+        return {"title": title, "spaceKey": space_key, "type": "page", "expand": "version", "limit": 1}
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def page_content_hash(page: Dict[str, Any]) -> Optional[str]:
+        """Returns the content hash recorded in the version message of a page published by this tool."""
+        message = (page.get("version") or {}).get("message") or ""
+        return message[len(CONTENT_HASH_PREFIX):] if message.startswith(CONTENT_HASH_PREFIX) else None
+
+    @classmethod
+    def _page_create_body(cls, title: str, content: str, space_key: str, content_hash: str) -> Dict[str, Any]:
+        # The hash lets the next run of an unchanged page skip its write
+        body = cls._page_body(title, content, space_key)
+        body["version"] = {"number": 1, "message": CONTENT_HASH_PREFIX + content_hash}
+        return body
+
+    @classmethod
+    def _page_update_body(cls, page: Dict[str, Any], title: str, content: str, space_key: str, content_hash: str) -> Dict[str, Any]:
+        body = cls._page_body(title, content, space_key)
+        body["id"] = page["id"]
+        body["version"] = {
+            "number": page["version"]["number"] + 1,
+            "message": CONTENT_HASH_PREFIX + content_hash
+        }
+        return body
 
+    @staticmethod
+    def _page_body(title: str, content: str, space_key: str) -> Dict[str, Any]:
         # Construct the request body for creating a page
-        req_body = {
+        return {
             "type": "page",
             "title": title,
             "space": {
@@ -421,17 +602,96 @@ class ConfluenceRequestor:
             }
         }
 
-        response = self._make_confluence_request(
+    async def awrite_to_confluence_page(self, title: str, content: str, space_key: str = "testmax"):
+        """Create a new Confluence page with the given title and content."""
+        confluence_url = f"{self.base_url}/wiki/rest/api/content"
+        req_body = self._page_body(title, content, space_key)
+
+        response = await self._amake_confluence_request(
             url=confluence_url,
             method="POST",
             json_body=req_body
         )
         if response:
-            logger.info(f"Page '{title}' created successfully: {json.dumps(response, indent=2)}")
+            logger.info(f"Page '{title}' created successfully (id {response.get('id')}).")
         else:
             logger.error(f"Failed to create page '{title}'.")
+        return response
+
+    async def aupsert_confluence_page(self, title: str, content: str, space_key: str = "testmax") -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Creates the page, or updates the page with the same title in the space if its content changed.
+
+        The hash of the published content is kept in the version message, so an unchanged page is
+        recognized from its version alone and not written again.
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], str]: The page (None on failure) and "created", "updated", "unchanged" or "failed".
+        """
+        content_hash = self.content_hash(content)
+        page = await self._afind_page(title, space_key)
+        if page is None:
+            response = await self._amake_confluence_request(
+                url=f"{self.base_url}/wiki/rest/api/content",
+                method="POST",
+                json_body=self._page_create_body(title, content, space_key, content_hash)
+            )
+            action = "created"
+        elif self.page_content_hash(page) == content_hash:
+            logger.info(f"Page '{title}' is unchanged, skipping the write.")
+            return page, "unchanged"
+        else:
+            response = await self._amake_confluence_request(
+                url=f"{self.base_url}/wiki/rest/api/content/{page['id']}",
+                method="PUT",
+                json_body=self._page_update_body(page, title, content, space_key, content_hash)
+            )
+            action = "updated"
+
+        if not response:
+            logger.error(f"Failed to publish page '{title}'.")
+            return None, "failed"
+        _confluence_page_ids[(self.base_url, space_key, title)] = response["id"]
+        logger.info(f"Page '{title}' {action} (id {response['id']}).")
+        return response, action
+
+    async def _afind_page(self, title: str, space_key: str) -> Optional[Dict[str, Any]]:
+        """Returns the page with the given title in the space with its version, looked up by id once known."""
+        index_key = (self.base_url, space_key, title)
+        page_id = _confluence_page_ids.get(index_key)
+        if page_id is not None:
+            page = await self._amake_confluence_request(
+                url=f"{self.base_url}/wiki/rest/api/content/{page_id}",
+                params={"expand": "version"}
+            )
+            if page and page.get("title") == title:
+                return page
+            _confluence_page_ids.pop(index_key, None)
 
-    def _make_confluence_request(
+        response = await self._amake_confluence_request(
+            url=f"{self.base_url}/wiki/rest/api/content",
+            params=self._find_page_params(title, space_key)
+        )
+        results = (response or {}).get("results", [])
+        if not results:
+            return None
+        _confluence_page_ids[index_key] = results[0]["id"]
+        return results[0]
+
+    async def aping(self):
+        """Checks the credentials with a cheap request, which also opens a pooled connection to Confluence."""
+        if await self._amake_confluence_request(url=f"{self.base_url}/wiki/rest/api/space", params={"limit": 1}) is None:
+            raise RuntimeError("Confluence did not answer /space.")
+
+    def page_url(self, response: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Returns the browser URL of a page from its content API response."""
+        links = (response or {}).get("_links", {})
+        if "webui" not in links:
+            return None
+        # Pages inside search results carry no base link of their own
+        return links.get("base", f"{self.base_url}/wiki") + links["webui"]
+
+    async def _amake_confluence_request(
         self,
         url: str,
         method: str = "GET",
@@ -441,42 +701,35 @@ class ConfluenceRequestor:
         """
         Makes a request to the specified Confluence API endpoint with given parameters or JSON body.
 
-        Args:
-            url (str): The full URL to send the request to.
-            method (str): The HTTP method to use ('GET' or 'POST', etc.).
-            params (Dict[str, Any], optional): Query parameters for the request.
-            json_body (Dict[str, Any], optional): JSON body for POST/PUT requests.
-
         Returns:
             Optional[Dict[str, Any]]: The JSON response as a dictionary if successful, else None.
         """
         try:
-            if method.upper() == "GET":
-                response = requests.get(
+            if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
+                logger.error(f"HTTP method '{method}' not supported.")
+                return None
+
+            with span("confluence", operation_of(url)) as result:
+                response = await self._async_transport.request(
+                    method,
                     url,
                     params=params,
-                    auth=HTTPBasicAuth(self.username, self._password)
-                )
-            elif method.upper() == "POST":
-                response = requests.post(
-                    url,
                     json=json_body,
-                    auth=HTTPBasicAuth(self.username, self._password)
+                    auth=self._async_auth
                 )
-            else:
-                logger.error(f"HTTP method '{method}' not supported.")
-                return None
+                result["outcome"] = f"{response.status_code // 100}xx"
+                result["bytes"] = len(response.content)
 
             # Raise an exception for HTTP error responses
             response.raise_for_status()
 
             data = response.json()
-            logger.debug(f"Response data: {json.dumps(data, indent=2)}")
+            debug_dump(logger, "Response data", lambda: data)
             return data
 
-        except requests.exceptions.HTTPError as http_err:
-            logger.error(f"HTTP error occurred: {http_err} - Response: {response.text}")
-        except requests.exceptions.RequestException as req_err:
+        except httpx.HTTPStatusError as http_err:
+            logger.error(f"HTTP error occurred: {http_err} - Response: {http_err.response.text}")
+        except httpx.RequestError as req_err:
             logger.error(f"Request exception occurred: {req_err}")
         except json.JSONDecodeError as json_err:
             logger.error(f"JSON decode error: {json_err} - Response Text: {response.text}")
@@ -485,74 +738,490 @@ class ConfluenceRequestor:
 
         return None
 
-app = FastAPI()
-
-app.mount(
-    "/static",
-    StaticFiles(directory=Path(__file__).parent.parent.absolute() / "static"),
-    name="static",
-)
-
-templates = Jinja2Templates(directory="templates")
-
-@app.get("/", response_class=HTMLResponse)
-async def read_root(request: Request):
-    # Renders a simple HTML page with a form to input Jira Epic ID
-    return templates.TemplateResponse("index.html", {"request": request})
-
-@app.post("/submit", response_class=HTMLResponse)
-async def submit_epic(request: Request, epic_id: str = Form(...), page_title: str = Form(...)):
-
-
-    # This is where you would handle the epic_id, e.g.:
-    # - Validate the format.
-    # - Retrieve information from Jira via its API.
-    # For this example, we'll just return a message with the entered Epic ID.
-
-    # Initialize the JiraRequestor
-    jira = JiraRequestor(ATLASSIAN_BASE_URL, USERNAME, PASSWORD)
-
-    df_cooked_epic_with_stories = jira.cooked_df_epic_with_stories(epic_id, FIELDS_OF_INTEREST)
-    logger.info(f"Cooked epic with with stories: {df_cooked_epic_with_stories}")
-
-    JIRA_TICKET_URL = ATLASSIAN_BASE_URL + f"/browse/{epic_id}"
-
-    question = jira.format_for_llm(df_cooked_epic_with_stories)
-    question += f"\nLink to app: {JIRA_TICKET_URL}"
-    logger.info(f"Produced LLM question: {question}")
-
+def build_chat_model():
     # # Instantiate the ChatOllama model
     # chat_model = ChatOllama(model="llama3.1:8b")
 
-    chat_model = ChatOpenAI(
+    # Imported on first use, as importing LangChain is slow
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
         model=OPEN_AI_MODEL,
-        temperature=0,
+        temperature=OPEN_AI_TEMPERATURE,
         max_tokens=None,
         timeout=None,
         max_retries=2,
+        # Reports token usage on the last streamed chunk, for the llm_tokens_total metric
+        stream_usage=True,
         # api_key="...",  # if you prefer to pass api key in directly instaed of using env vars
         # base_url="...",
         # organization="...",
         # other params...
     )
 
+# Clients shared by every request, built on first use or by the readiness warm-up
+_clients: Dict[str, Any] = {}
+
+def _shared_client(name: str, build: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is None:
+        client = _clients[name] = build()
+    return client
+
+def get_jira() -> "AsyncJiraRequestor":
+    return _shared_client("jira", lambda: AsyncJiraRequestor(ATLASSIAN_BASE_URL, USERNAME, PASSWORD))
+
+def get_confluence() -> "AsyncConfluenceRequestor":
+    return _shared_client("confluence", lambda: AsyncConfluenceRequestor(ATLASSIAN_BASE_URL, CONFLUENCE_USERNAME, CONFLUENCE_PASSWORD))
+
+def get_chat_model():
+    return _shared_client("chat_model", lambda: build_chat_model())
+
+def reset_clients():
+    """Drops the shared clients, so that the next request builds them from the current configuration."""
+    _clients.clear()
+
+epic_snapshots = EpicSnapshotStore(SNAPSHOT_STORE_PATH) if SNAPSHOT_STORE_PATH else None
+llm_cache = LLMResponseCache(
+    LLM_CACHE_PATH,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    max_bytes=LLM_CACHE_MAX_BYTES,
+    ttl_seconds=LLM_CACHE_TTL_HOURS * 3600
+)
+
+async def stream_summary(question: str, epic_text: str = "", story_blocks: Optional[List[str]] = None) -> AsyncIterator[str]:
+    """
+    Streams the summary of a formatted epic from the LLM, answering byte-identical questions from the response cache.
+
+    Questions estimated above MAP_REDUCE_THRESHOLD_TOKENS are first condensed hierarchically from
+    `epic_text` and `story_blocks`; only the final call is streamed.
+
+    Args:
+        question (str): The epic as formatted by format_records_for_llm and join_llm_blocks.
+        epic_text (str, optional): The epic part of the question, for map-reduce summarization.
+        story_blocks (List[str], optional): One block per story, for map-reduce summarization.
+
+    Yields:
+        str: Chunks of the HTML summary as the model produces them.
+    """
+    cache_key = llm_cache.key(OPEN_AI_MODEL, OPEN_AI_TEMPERATURE, DEFAULT_LLAMA_JIRA_SUMMARIZER_PROMPT_FINGERPRINT, question)
+    summary_content = llm_cache.get(cache_key)
+    if summary_content is not None:
+        CACHE_REQUESTS.inc(cache="llm", result="hit")
+        logger.info(f"LLM cache hit ({llm_cache.stats()}).")
+        yield summary_content
+        return
+
+    chat_model = get_chat_model()
+
+    prompt_question = question
+    question_tokens = estimate_tokens(question)
+    if story_blocks and question_tokens > MAP_REDUCE_THRESHOLD_TOKENS:
+        logger.info(f"Question has ~{question_tokens} tokens, summarizing {len(story_blocks)} stories with map-reduce.")
+        prompt_question = await map_reduce_question(
+            chat_model,
+            epic_text,
+            story_blocks,
+            chunk_token_budget=MAP_CHUNK_TOKENS,
+            reduce_token_budget=MAP_REDUCE_THRESHOLD_TOKENS,
+            concurrency=MAP_CONCURRENCY
+        )
+
+    # Stream the model's answer to the formatted prompt
+    chunks = []
+    await LLM_RATE_LIMITER.aacquire(*llm_tenant(chat_model))
+    with llm_span(OPEN_AI_MODEL, "summarize") as result:
+        async for chunk in chat_model.astream(summarizer_prompt().format(question=prompt_question)):
+            chunks.append(chunk.content)
+            result["usage"] = getattr(chunk, "usage_metadata", None) or result["usage"]
+            yield chunk.content
+    llm_cache.put(cache_key, "".join(chunks))
+    CACHE_REQUESTS.inc(cache="llm", result="miss")
+    logger.info(f"LLM cache miss ({llm_cache.stats()}).")
+
+async def summarize(question: str, epic_text: str = "", story_blocks: Optional[List[str]] = None) -> str:
+    """Returns the whole summary produced by `stream_summary`."""
+    return "".join([chunk async for chunk in stream_summary(question, epic_text, story_blocks)])
+
+async def stream_epic_documentation(epic_id: str, page_title: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Runs the whole documentation pipeline for one epic without blocking the event loop:
+    harvests the epic from Jira, summarizes it with the LLM and publishes the summary to Confluence.
+
+    Args:
+        epic_id (str): The ID or key of the epic.
+        page_title (str): The title of the Confluence page to create.
+
+    Yields:
+        Tuple[str, Any]: Progress events: ("stage", jobs.HARVESTING | jobs.SUMMARIZING | jobs.PUBLISHING),
+            ("token", chunk of the summary) while the model streams, and finally ("done", result) with
+            the published HTML `summary`, analytics included, and the `page_url` of the page.
+    """
+    yield "stage", jobs.HARVESTING
+    harvested = await harvest_epic(epic_id)
+
     ## Summarization Step
+    yield "stage", jobs.SUMMARIZING
+    chunks = []
+    summarizing_started = time.perf_counter()
+    async for chunk in stream_summary(harvested["question"], harvested["epic_text"], harvested["story_blocks"]):
+        chunks.append(chunk)
+        yield "token", chunk
+    STAGE_SECONDS.observe(time.perf_counter() - summarizing_started, stage=jobs.SUMMARIZING)
+    summary_content = inject_analytics("".join(chunks), harvested["analytics"])
+    logger.info(f"Summary of epic {epic_id} by OpenAI Model {OPEN_AI_MODEL}: {len(summary_content)} characters.")
+    debug_dump(logger, "Summary content", lambda: summary_content)
+
+    # Publishing starts as soon as the document is complete
+    yield "stage", jobs.PUBLISHING
+    published = await publish_summary(page_title, summary_content)
+
+    yield "done", {"summary": summary_content, "compaction": harvested["compaction"], **published}
+
+async def harvest_epic(epic_id: str) -> Dict[str, Any]:
+    """
+    Harvests an epic with its stories from Jira and formats them as the LLM question.
+
+    Returns:
+        Dict[str, Any]: The `records`, the `question`, its `epic_text` and `story_blocks` for map-reduce
+            summarization, and the rendered `analytics` to insert into the summary.
+    """
+    started = time.perf_counter()
+    records = await get_jira().acooked_records_epic_with_stories(epic_id, FIELDS_OF_INTEREST, epic_snapshots)
+    logger.info(f"Cooked epic {epic_id} with {len(records) - 1} stories.")
+
+    JIRA_TICKET_URL = ATLASSIAN_BASE_URL + f"/browse/{epic_id}"
+
+    # The figures of the page are computed here; the LLM only gets their digest to write the narrative
+    analytics_started = time.perf_counter()
+    analytics = compute_analytics(records)
+    analytics_html = render_analytics(analytics, ATLASSIAN_BASE_URL + "/browse/")
+    STAGE_SECONDS.observe(time.perf_counter() - analytics_started, stage="analytics")
+
+    trailer_lines = [f"Link to app: {JIRA_TICKET_URL}"]
+    if analytics is not None:
+        trailer_lines.append(analytics.digest())
+    trailer = "".join(f"\n{line}" for line in trailer_lines)
+
+    # Drop bot and duplicate comments and cut long threads and descriptions before formatting
+    records_for_llm, compaction_report = compact_records(records, trailer=trailer) if COMPACTION_ENABLED else (records, None)
+
+    epic_blocks, story_blocks = format_records_for_llm(records_for_llm)
+    question = join_llm_blocks(epic_blocks, story_blocks)
+    if compaction_report is not None:
+        # Only the records are cut to fit the budget, the trailer is appended whole
+        question = enforce_token_budget(question, compaction_report, trailer=trailer)
+        logger.info(f"Compacted epic {epic_id}: {compaction_report.as_dict()}")
+    else:
+        question += trailer
+    logger.info(f"Produced LLM question for epic {epic_id} (~{estimate_tokens(question)} tokens).")
+    debug_dump(logger, "LLM question", lambda: question)
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage=jobs.HARVESTING)
+    return {
+        "records": records,
+        "question": question,
+        "epic_text": "\n\n".join([*epic_blocks, *trailer_lines]),
+        "story_blocks": story_blocks,
+        "compaction": compaction_report.as_dict() if compaction_report is not None else None,
+        "analytics": analytics_html,
+    }
+
+async def publish_summary(page_title: str, summary_content: str) -> Dict[str, Any]:
+    """
+    Publishes a summary to Confluence.
+
+    Returns:
+        Dict[str, Any]: The `page_url` and the `page_action` ("created", "updated" or "unchanged").
+    """
+    started = time.perf_counter()
+    confluence = get_confluence()
+    if CONFLUENCE_UPSERT:
+        response, action = await confluence.aupsert_confluence_page(page_title, summary_content)
+    else:
+        response, action = await confluence.awrite_to_confluence_page(page_title, summary_content), "created"
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage=jobs.PUBLISHING)
+    if response is None:
+        raise RuntimeError(f"Failed to publish Confluence page '{page_title}'.")
+    return {"page_url": confluence.page_url(response), "page_action": action}
+
+async def run_epic_batch(
+    epic_ids: Optional[List[str]] = None,
+    jql: Optional[str] = None,
+    page_title_template: Optional[str] = None,
+    harvest_concurrency: Optional[int] = None,
+    llm_concurrency: Optional[int] = None,
+    publish_concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Documents many epics at once, with harvesting, summarization and publishing pipelined across epics.
+
+    Args:
+        epic_ids (List[str], optional): The keys of the epics to document.
+        jql (str, optional): JQL selecting the epics to document, used when no `epic_ids` are given.
+        page_title_template (str, optional): The page title, formatted with `epic_id` and the epic's `summary`.
+        harvest_concurrency (int, optional): Epics harvested from Jira at once; BATCH_HARVEST_CONCURRENCY by default.
+        llm_concurrency (int, optional): Epics summarized at once; BATCH_LLM_CONCURRENCY by default.
+        publish_concurrency (int, optional): Pages written to Confluence at once; BATCH_PUBLISH_CONCURRENCY by default.
+        on_progress (Callable[[Dict[str, Any]], None], optional): Called with an epic's item whenever it changes stage.
+
+    Returns:
+        Dict[str, Any]: The batch report of batch.run_pipeline, with one item per epic.
+    """
+    if not epic_ids:
+        epic_ids = await get_jira().asearch_epic_keys(jql)
+        logger.info(f"JQL {jql} selected {len(epic_ids)} epics.")
+    title_template = page_title_template or BATCH_PAGE_TITLE_TEMPLATE
+    items = [{"epic_id": epic_id} for epic_id in dict.fromkeys(epic_ids)]
+    # Intermediate results, kept out of the items that are reported
+    work: Dict[str, Dict[str, Any]] = {}
+
+    async def harvest(item: Dict[str, Any]):
+        harvested = await harvest_epic(item["epic_id"])
+        epic = next((record for record in harvested["records"] if record.issue_type.lower() == "epic"), None)
+        item["page_title"] = title_template.format(epic_id=item["epic_id"], summary=epic.summary if epic else item["epic_id"])
+        if harvested["compaction"] is not None:
+            item["tokens_saved"] = harvested["compaction"]["tokens_saved"]
+        work[item["epic_id"]] = harvested
+
+    async def summarize_stage(item: Dict[str, Any]):
+        harvested = work[item["epic_id"]]
+        summary = await summarize(harvested["question"], harvested["epic_text"], harvested["story_blocks"])
+        harvested["summary"] = inject_analytics(summary, harvested["analytics"])
+
+    async def publish(item: Dict[str, Any]):
+        harvested = work.pop(item["epic_id"])
+        item.update(await publish_summary(item["page_title"], harvested["summary"]))
+
+    stages = [
+        batch.Stage(jobs.HARVESTING, harvest, harvest_concurrency or BATCH_HARVEST_CONCURRENCY),
+        batch.Stage(jobs.SUMMARIZING, summarize_stage, llm_concurrency or BATCH_LLM_CONCURRENCY),
+        batch.Stage(jobs.PUBLISHING, publish, publish_concurrency or BATCH_PUBLISH_CONCURRENCY),
+    ]
+    def progress(item: Dict[str, Any]):
+        if item.get("status") == "failed":
+            # The results of the stages before the failure are of no more use
+            work.pop(item["epic_id"], None)
+        if on_progress is not None:
+            on_progress(item)
+
+    report = await batch.run_pipeline(items, stages, progress)
+    work.clear()
+    logger.info(f"Batch report:\n{batch.format_report(report)}")
+    return report
+
+async def generate_epic_documentation(
+    epic_id: str,
+    page_title: str,
+    on_stage: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    """
+    Runs `stream_epic_documentation` to completion.
+
+    Args:
+        epic_id (str): The ID or key of the epic.
+        page_title (str): The title of the Confluence page to create.
+        on_stage (Callable[[str], None], optional): Called with jobs.HARVESTING, jobs.SUMMARIZING and
+            jobs.PUBLISHING as the pipeline enters each stage.
+
+    Returns:
+        Dict[str, Any]: The generated HTML `summary` and the `page_url` of the published page.
+    """
+    result = None
+    async for event, data in stream_epic_documentation(epic_id, page_title):
+        if event == "stage" and on_stage is not None:
+            on_stage(data)
+        elif event == "done":
+            result = data
+    return result
+
+job_queue = jobs.JobQueue(
+    generate_epic_documentation,
+    store=jobs.SQLiteJobStore(JOB_STORE_PATH) if JOB_STORE_PATH else jobs.InMemoryJobStore(),
+    workers=JOB_WORKERS
+)
+
+_warm_up_task: Optional["asyncio.Task[Dict[str, Any]]"] = None
+
+def _prepare_llm():
+    # Runs in a thread: importing LangChain and building the client would block the event loop
+    summarizer_prompt()
+    get_chat_model()
+
+async def warm_up() -> Dict[str, Any]:
+    """
+    Builds the shared clients and opens pooled connections to Jira and Confluence, so that the
+    first request pays for neither.
+
+    Returns:
+        Dict[str, Any]: Whether every check passed (`ready`), "ok" or the error of each check, and when they ran.
+    """
+    checks = {}
+
+    async def check(name: str, probe: Callable[[], Awaitable[Any]]):
+        try:
+            await asyncio.wait_for(probe(), READINESS_TIMEOUT_SECONDS)
+            checks[name] = "ok"
+        except Exception as err:
+            logger.warning(f"Readiness check {name} failed: {err!r}")
+            checks[name] = f"{type(err).__name__}: {err}"
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        check("jira", lambda: get_jira().aping()),
+        check("confluence", lambda: get_confluence().aping()),
+        check("llm", lambda: asyncio.to_thread(_prepare_llm)),
+    )
+    ready = all(result == "ok" for result in checks.values())
+    logger.info(f"Warm-up {'succeeded' if ready else 'failed'} in {time.perf_counter() - started:.2f}s: {checks}")
+    return {"ready": ready, "checks": checks, "checked_at": time.time()}
+
+async def check_readiness() -> Dict[str, Any]:
+    """Returns the result of the last warm-up, running a new one if it failed or is older than READINESS_RECHECK_SECONDS."""
+    global _warm_up_task
+    if _warm_up_task is not None and _warm_up_task.done():
+        last = _warm_up_task.result()
+        if not last["ready"] or time.time() - last["checked_at"] > READINESS_RECHECK_SECONDS:
+            _warm_up_task = None
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.create_task(warm_up())
+    # Concurrent probes share one warm-up, and a probe timing out does not cancel it
+    return await asyncio.shield(_warm_up_task)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _warm_up_task
+    log_configuration()
+    await job_queue.start()
+    # Warms up in the background, so that startup is not held up by the upstreams; /ready waits for it
+    _warm_up_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        if not _warm_up_task.done():
+            _warm_up_task.cancel()
+        await job_queue.stop()
+        reset_clients()
+        await get_async_transport().aclose()
+
+app = FastAPI(lifespan=lifespan)
 
-    # Invoke the model with the formatted prompt
-    summary = chat_model.invoke(DEFAULT_LLAMA_JIRA_SUMMARIZER_PROMPT.format(question=question))
-    # summary
+app.mount(
+    "/static",
+    StaticFiles(directory=Path(__file__).parent.parent.absolute() / "static"),
+    name="static",
+)
 
-    summary_content = summary.content
-    logger.info(f"Summary content by OpenAI Model {OPEN_AI_MODEL} {summary_content}")
+templates = Jinja2Templates(directory="templates")
 
-    confluence = ConfluenceRequestor(ATLASSIAN_BASE_URL, CONFLUENCE_USERNAME, CONFLUENCE_PASSWORD)
+@app.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
+    # Renders a simple HTML page with a form to input Jira Epic ID
+    return templates.TemplateResponse("index.html", {"request": request})
 
-    # In[38]:
-    confluence.write_to_confluence_page(page_title, summary_content)
+@app.get("/ready")
+async def readiness():
+    # Ready once the clients are built and Jira, Confluence and the LLM client answered the warm-up
+    state = await check_readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
 
+@app.post("/submit", response_class=HTMLResponse)
+async def submit_epic(request: Request, epic_id: str = Form(...), page_title: str = Form(...)):
+    await generate_epic_documentation(epic_id, page_title)
 
     # After submission, display the epic_id and the chosen page title.
     return templates.TemplateResponse(
         "index.html", 
         {"request": request, "epic_id": epic_id, "page_title": page_title}
     )
+
+@app.post("/jobs", status_code=202)
+async def create_job(epic_id: str = Form(...), page_title: str = Form(...)):
+    # Returns right away; poll GET /jobs/{id} for the stage and the final page URL.
+    return job_queue.submit(epic_id, page_title)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.post("/submit/stream")
+async def submit_epic_stream(epic_id: str = Form(...), page_title: str = Form(...)):
+    # Server-sent events: stage changes, summary tokens as they are generated, then the page URL.
+    async def event_stream():
+        try:
+            async for event, data in stream_epic_documentation(epic_id, page_title):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as err:
+            logger.exception(f"Streaming documentation of epic {epic_id} failed: {err}")
+            yield f"event: error\ndata: {json.dumps(str(err))}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/cache/invalidate")
+async def invalidate_epic_cache(request: Request, x_cache_invalidation_token: str = Header("")):
+    if not CACHE_INVALIDATION_TOKEN:
+        raise HTTPException(status_code=503, detail="Cache invalidation is disabled, CACHE_INVALIDATION_TOKEN is not set")
+    if not hmac.compare_digest(x_cache_invalidation_token, CACHE_INVALIDATION_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid cache invalidation token")
+    payload = await request.json()
+    epic_ids = payload.get("epic_ids", []) if isinstance(payload, dict) else []
+    if epic_snapshots is not None:
+        for epic_id in epic_ids:
+            epic_snapshots.invalidate(epic_id)
+    return {"invalidated": epic_ids if epic_snapshots is not None else []}
+
+@app.get("/metrics")
+async def metrics():
+    """Exposes the latency, payload size, retry, cache and token metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+# Multi-epic batches, kept in memory; poll GET /batches/{id} for progress and the final report
+batches: Dict[str, Dict[str, Any]] = {}
+_batch_tasks = set()
+
+@app.post("/batches", status_code=202)
+async def create_batch(request: Request):
+    payload = await request.json()
+    if not isinstance(payload, dict) or bool(payload.get("epic_ids")) == bool(payload.get("jql")):
+        raise HTTPException(status_code=400, detail="Provide either epic_ids or jql")
+
+    batch_id = uuid.uuid4().hex
+    record = {"id": batch_id, "status": "running", "created_at": time.time(), "epics": {}, "report": None, "error": None}
+    batches[batch_id] = record
+
+    def on_progress(item: Dict[str, Any]):
+        record["epics"][item["epic_id"]] = dict(item)
+
+    async def run():
+        try:
+            record["report"] = await run_epic_batch(
+                epic_ids=payload.get("epic_ids"),
+                jql=payload.get("jql"),
+                page_title_template=payload.get("page_title_template"),
+                on_progress=on_progress
+            )
+            record["status"] = "done"
+        except Exception as err:
+            logger.exception(f"Batch {batch_id} failed: {err}")
+            record["status"] = "failed"
+            record["error"] = str(err)
+
+    task = asyncio.create_task(run())
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+    return {"id": batch_id, "status": record["status"]}
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    record = batches.get(batch_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    return record
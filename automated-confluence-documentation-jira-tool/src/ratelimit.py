@@ -0,0 +1,194 @@
+"""
+Client-side rate limiting and request coalescing in front of Atlassian and the LLM.
+
+Every upstream host and credential pair draws from its own token bucket, shared by all coroutines
+of the process, so concurrent documentation runs and endpoints stay under the tenant's limit
+together instead of each discovering it through 429s. A 429 pauses the whole bucket for the
+server's Retry-After, so the requests queued behind it don't run into the same wall.
+
+Identical concurrent GETs (same URL, params, headers and credential) are coalesced: the first one
+is sent, the others wait for and share its response.
+
+The backend keeps a threaded counterpart in backend/services/ratelimit.py; the two apps are
+deployed separately, so a fix to the bucket logic belongs in both.
+"""
+import os
+import time
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .metrics import COALESCED_REQUESTS, RATE_LIMIT_QUEUE_DEPTH, RATE_LIMIT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Sustained requests per second and burst size per Atlassian host and credential; a rate of 0 disables the limiter
+ATLASSIAN_RATE_LIMIT_PER_SECOND = float(os.getenv("ATLASSIAN_RATE_LIMIT_PER_SECOND", "20"))
+ATLASSIAN_RATE_LIMIT_BURST = int(os.getenv("ATLASSIAN_RATE_LIMIT_BURST", "40"))
+ATLASSIAN_COALESCE_GETS = os.getenv("ATLASSIAN_COALESCE_GETS", "true").lower() == "true"
+# Sustained LLM calls per minute and burst size per API host and key; a rate of 0 disables the limiter
+LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", "300"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "20"))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        """
+        A thread-safe token bucket that hands out reservations instead of blocking.
+
+        Callers take a token with `reserve` and await the returned delay themselves, outside of the
+        bucket's lock. The tokens may go negative; every reservation behind the debt waits for its
+        share of the refill.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (int): The maximum number of tokens, i.e. requests sent back to back after a quiet period.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Takes a token and returns how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def pause(self, seconds: float):
+        """Holds back every new reservation for at least `seconds`, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # Concurrent 429s of the same bucket don't add up, the longest pause wins
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def credential_of(auth: Any = None, headers: Optional[Dict[str, str]] = None) -> str:
+    """Returns a short, non-reversible id of the credential of a request, so buckets never hold the secret itself."""
+    secret = (
+        getattr(auth, "username", None)
+        or getattr(auth, "_auth_header", None)
+        or (auth[0] if isinstance(auth, tuple) and auth else None)
+        or (headers or {}).get("Authorization")
+    )
+    if not secret:
+        return "anonymous"
+    return hashlib.sha256(str(secret).encode()).hexdigest()[:12]
+
+
+class RateLimiter:
+    def __init__(self, name: str, rate: float, burst: int):
+        """
+        One token bucket per upstream host and credential.
+
+        Args:
+            name (str): The `limiter` label of the rate limit metrics.
+            rate (float): Tokens per second of every bucket; 0 disables the limiter.
+            burst (int): The size of every bucket.
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def bucket(self, host: str, credential: str) -> TokenBucket:
+        key = (host, credential)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(self.rate, self.burst))
+        return bucket
+
+    def _reserve(self, host: str, credential: str) -> float:
+        delay = self.bucket(host, credential).reserve()
+        RATE_LIMIT_WAIT_SECONDS.observe(delay, limiter=self.name, host=host)
+        if delay > 0:
+            logger.debug(f"Rate limiter {self.name} delays a request to {host} by {delay:.2f}s.")
+        return delay
+
+    async def aacquire(self, host: str, credential: str):
+        """Waits, without blocking the event loop, until a request to `host` with `credential` may be sent."""
+        if not self.enabled:
+            return
+        delay = self._reserve(host, credential)
+        if delay <= 0:
+            return
+        RATE_LIMIT_QUEUE_DEPTH.inc(limiter=self.name, host=host)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            RATE_LIMIT_QUEUE_DEPTH.dec(limiter=self.name, host=host)
+
+    def pause(self, host: str, credential: str, seconds: float):
+        if self.enabled and seconds > 0:
+            self.bucket(host, credential).pause(seconds)
+            logger.info(f"Rate limiter {self.name} paused {host} for {seconds:.2f}s.")
+
+
+ATLASSIAN_RATE_LIMITER = RateLimiter("atlassian", ATLASSIAN_RATE_LIMIT_PER_SECOND, ATLASSIAN_RATE_LIMIT_BURST)
+LLM_RATE_LIMITER = RateLimiter("llm", LLM_RATE_LIMIT_PER_MINUTE / 60, LLM_RATE_LIMIT_BURST)
+
+
+def llm_tenant(chat_model: Any) -> Tuple[str, str]:
+    """Returns the (host, credential) bucket of a LangChain chat model, from its API base and key."""
+    base_url = getattr(chat_model, "openai_api_base", None) or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com"
+    api_key = getattr(chat_model, "openai_api_key", None) or os.getenv("OPENAI_API_KEY")
+    if hasattr(api_key, "get_secret_value"):
+        api_key = api_key.get_secret_value()
+    return urlsplit(base_url).netloc or base_url, credential_of(headers={"Authorization": api_key} if api_key else None)
+
+
+def coalescing_key(method: str, url: str, credential: str, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+    """
+    Returns the key under which a request may share an identical one in flight, or None if it may not.
+
+    Only plain GETs are coalesced; anything with a body or a streamed response is always sent.
+    """
+    if method != "GET" or any(kwargs.get(name) for name in ("data", "json", "files", "content", "stream")):
+        return None
+    try:
+        params = json.dumps(kwargs.get("params"), sort_keys=True, default=str)
+        headers = json.dumps(dict(kwargs.get("headers") or {}), sort_keys=True, default=str)
+    except TypeError:
+        return None
+    return (url, params, headers, credential)
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        """Runs one call per key at a time on the event loop; concurrent callers of the same key share its result."""
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]], host: str = "") -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED_REQUESTS.inc(host=host)
+        # Shielded, so a cancelled caller doesn't cancel the request the others are waiting for
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Marks the error as retrieved when every waiter was cancelled
+            task.exception()
@@ -0,0 +1,156 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .adf import adf_to_text
+
+# Fields of interest that map to dedicated IssueRecord attributes; any other field lands in `extra`
+_RECORD_FIELDS = ("summary", "description", "status", "assignee")
+
+
+def doc_to_text(doc_field) -> str:
+    """Extracts the text of an Atlassian Document Format (ADF) field, within the ADF_MAX_CHARS cap."""
+    return adf_to_text(doc_field)
+
+
+@dataclass(slots=True)
+class CommentRecord:
+    author: str
+    content: str
+    created: str = ""
+    author_type: str = ""
+
+    @classmethod
+    def from_raw(cls, comment: Dict[str, Any]) -> "CommentRecord":
+        author = comment.get('author') or {}
+        return cls(
+            author=author.get('displayName', ''),
+            content=doc_to_text(comment.get('body', {})),
+            created=comment.get('created', ''),
+            author_type=author.get('accountType', '')
+        )
+
+
+@dataclass(slots=True)
+class IssueRecord:
+    key: str
+    issue_type: str = ""
+    summary: str = ""
+    description: str = ""
+    status: str = ""
+    assignee: str = ""
+    # Jira's category of the status: "new", "indeterminate" or "done", whatever the workflow calls it
+    status_category: str = ""
+    comments: List[CommentRecord] = field(default_factory=list)
+    extra: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_raw(
+        cls,
+        issue: Dict[str, Any],
+        fields_of_interest: Iterable[str],
+        comments_raw: Iterable[Dict[str, Any]] = (),
+        issue_type: str = ""
+    ) -> "IssueRecord":
+        """Builds a record from a raw Jira issue and its raw comments, keeping only `fields_of_interest`."""
+        fields = issue.get('fields', {})
+        record = cls(key=issue["key"], issue_type=issue_type)
+        for field_name in fields_of_interest:
+            if field_name == "title":
+                # title in Jira issue fields is 'summary'
+                record.extra["title"] = fields.get('summary', '')
+            elif field_name == "summary":
+                record.summary = fields.get('summary', '')
+            elif field_name == "description":
+                # description might be in doc format
+                record.description = doc_to_text(fields.get('description', ''))
+            elif field_name == "status":
+                # status name is in fields.status.name
+                status = fields.get('status') or {}
+                record.status = status.get('name', '')
+                record.status_category = (status.get('statusCategory') or {}).get('key', '')
+            elif field_name == "assignee":
+                record.assignee = (fields.get('assignee') or {}).get('displayName', '')
+            else:
+                # If any other fields are requested directly from fields
+                value = fields.get(field_name)
+                record.extra[field_name] = '' if value is None else str(value)
+        record.comments = [CommentRecord.from_raw(comment) for comment in comments_raw]
+        return record
+
+    @property
+    def comments_string(self) -> str:
+        return "\n".join(f"{idx}. {comment.author}: {comment.content};" for idx, comment in enumerate(self.comments))
+
+    def to_row(self) -> Dict[str, Any]:
+        """Returns the flat row of the record, as in the cooked DataFrame."""
+        row = {"key": self.key}
+        row.update((name, getattr(self, name)) for name in _RECORD_FIELDS)
+        row["status_category"] = self.status_category
+        row.update(self.extra)
+        row["comments_string"] = self.comments_string
+        row["issue_type"] = self.issue_type
+        return row
+
+    def to_state(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable dict from which `from_state` rebuilds the record, comments included."""
+        state = {name: getattr(self, name) for name in ("key", "issue_type", *_RECORD_FIELDS, "status_category", "extra")}
+        state["comments"] = [[c.author, c.content, c.created, c.author_type] for c in self.comments]
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "IssueRecord":
+        state = dict(state)
+        comments = [CommentRecord(*comment) for comment in state.pop("comments", [])]
+        return cls(comments=comments, **state)
+
+
+def format_issue_block(issue_type: str, summary: str, description: str, status: str, comments_string: str) -> str:
+    """Formats one issue as a block of LLM input."""
+    if issue_type.lower() == "epic":
+        return (
+            f"Epic:\ntitle: {summary}\ndescription: {description}\n"
+            f"status: {status}\ncomments_string: {comments_string}"
+        )
+    return (
+        f"  title: {summary}\n  description: {description}\n"
+        f"  status: {status}\n  comments_string: {comments_string}"
+    )
+
+
+def format_records_for_llm(records: Iterable[IssueRecord]) -> Tuple[List[str], List[str]]:
+    """Formats the epic and story records as blocks of LLM input in a single pass."""
+    epic_blocks, story_blocks = [], []
+    for record in records:
+        issue_type = record.issue_type.lower()
+        if issue_type not in ("epic", "story"):
+            continue
+        block = format_issue_block(issue_type, record.summary, record.description, record.status, record.comments_string)
+        (epic_blocks if issue_type == "epic" else story_blocks).append(block)
+    return epic_blocks, story_blocks
+
+
+def iter_llm_lines(epic_blocks: List[str], story_blocks: List[str]) -> Iterator[str]:
+    for epic_block in epic_blocks:
+        yield epic_block
+        yield ""
+    # Since all stories are assumed to be associated with this epic,
+    # we'll just include all stories here.
+    if story_blocks:
+        yield "stories:"
+        for story_block in story_blocks:
+            yield story_block
+            yield ""
+
+
+def join_llm_blocks(epic_blocks: List[str], story_blocks: List[str]) -> str:
+    return "\n".join(iter_llm_lines(epic_blocks, story_blocks)).strip()
+
+
+def records_to_df(records: Iterable[IssueRecord], issue_type: Optional[str] = None):
+    """Returns the records as a DataFrame view with one row per issue."""
+    import pandas as pd
+
+    df = pd.DataFrame([record.to_row() for record in records])
+    if issue_type is not None:
+        df["issue_type"] = issue_type
+    return df
@@ -0,0 +1,46 @@
+"""
+State shared by the worker processes of the app when it runs with several workers on one machine:
+
+    SHARED_STATE_DIR=/var/lib/docgen uvicorn src.main:app --workers 4
+
+SHARED_STATE_DIR puts the epic snapshots, the LLM response cache and the documentation jobs into
+SQLite files there, unless their own *_PATH settings say otherwise. Every store opens its file in
+WAL mode, so the workers read concurrently while one writes, and waits up to
+SQLITE_BUSY_TIMEOUT_SECONDS for the write lock instead of failing.
+
+The backend opens its stores the same way in backend/services/shared_state.py.
+"""
+import os
+import sqlite3
+
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "10"))
+
+
+def state_path(env_name: str, filename: str, default: str = "") -> str:
+    """
+    Returns the path of a store: the `env_name` setting if set, else `filename` in SHARED_STATE_DIR if
+    that is set, else `default`.
+    """
+    explicit = os.getenv(env_name)
+    if explicit:
+        return explicit
+    shared_dir = os.getenv("SHARED_STATE_DIR")
+    if shared_dir:
+        os.makedirs(shared_dir, exist_ok=True)
+        return os.path.join(shared_dir, filename)
+    return default
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Opens a SQLite database to be shared by threads and, for a file, by worker processes."""
+    connection = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+    if path != ":memory:":
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent after a crash with NORMAL; only the last commits may be lost on power failure
+        connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def is_shared(path: str) -> bool:
+    """Whether a store at `path` is seen by every worker, i.e. is a file rather than in memory or disabled."""
+    return bool(path) and path != ":memory:"
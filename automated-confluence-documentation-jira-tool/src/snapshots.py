@@ -0,0 +1,147 @@
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .shared_state import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class EpicSnapshotStore:
+    """
+    Caches the pre-processed issues (epic and stories, comments included) of each epic in SQLite.
+
+    A snapshot remembers when it was last synchronized, so a refresh only has to ask Jira for the
+    issues updated since then and merge them in with `merge`. Adding a comment bumps an issue's
+    `updated` timestamp, so comment threads are kept fresh by the same query.
+
+    The file may be shared by several worker processes. A sync that started before the epic was
+    invalidated, in this or another worker, does not write its result back, so the next refresh
+    is a full harvest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = connect_sqlite(path)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS snapshot_issues (
+                    epic_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    issue_type TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (epic_id, key)
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS snapshot_syncs (
+                    epic_id TEXT PRIMARY KEY,
+                    last_sync REAL NOT NULL,
+                    last_full_sync REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot_invalidations (epic_id TEXT PRIMARY KEY, invalidated_at REAL NOT NULL)"
+            )
+
+    def sync_times(self, epic_id: str) -> Optional[Dict[str, float]]:
+        """Returns the `last_sync` and `last_full_sync` timestamps of an epic, or None if it was never cached."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_sync, last_full_sync FROM snapshot_syncs WHERE epic_id = ?", (epic_id,)
+            ).fetchone()
+        return {"last_sync": row[0], "last_full_sync": row[1]} if row else None
+
+    def load(self, epic_id: str) -> List[Dict[str, Any]]:
+        """Returns the cached issues of an epic, the epic first and then its stories by key."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM snapshot_issues WHERE epic_id = ? ORDER BY issue_type != 'epic', key", (epic_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _invalidated_since(self, epic_id: str, since: float) -> bool:
+        row = self._connection.execute(
+            "SELECT invalidated_at FROM snapshot_invalidations WHERE epic_id = ?", (epic_id,)
+        ).fetchone()
+        return row is not None and row[0] >= since
+
+    def replace(self, epic_id: str, issues: List[Dict[str, Any]], synced_at: float) -> bool:
+        """
+        Replaces the snapshot of an epic by a full harvest started at `synced_at`.
+
+        Returns:
+            bool: False if the epic was invalidated since, in which case nothing is stored.
+        """
+        with self._lock, self._connection:
+            # Taking the write lock first makes the check and the write atomic across processes
+            self._connection.execute("BEGIN IMMEDIATE")
+            if self._invalidated_since(epic_id, synced_at):
+                logger.info(f"Epic {epic_id} was invalidated during its harvest, not storing the snapshot.")
+                return False
+            self._connection.execute("DELETE FROM snapshot_issues WHERE epic_id = ?", (epic_id,))
+            self._insert(epic_id, issues)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO snapshot_syncs (epic_id, last_sync, last_full_sync) VALUES (?, ?, ?)",
+                (epic_id, synced_at, synced_at)
+            )
+        logger.info(f"Stored full snapshot of epic {epic_id} with {len(issues)} issues.")
+        return True
+
+    def merge(self, epic_id: str, changed_issues: List[Dict[str, Any]], synced_at: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        Upserts the issues that changed since the last sync into the snapshot of an epic.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The merged snapshot, as `load` returns it, or None if the
+                snapshot was invalidated since the delta sync started, which then needs a full harvest.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            synced = self._connection.execute("SELECT 1 FROM snapshot_syncs WHERE epic_id = ?", (epic_id,)).fetchone()
+            if synced is None or self._invalidated_since(epic_id, synced_at):
+                logger.info(f"Epic {epic_id} was invalidated during its delta sync, not merging.")
+                return None
+            self._insert(epic_id, changed_issues)
+            self._connection.execute(
+                "UPDATE snapshot_syncs SET last_sync = ? WHERE epic_id = ?", (synced_at, epic_id)
+            )
+            rows = self._connection.execute(
+                "SELECT data FROM snapshot_issues WHERE epic_id = ? ORDER BY issue_type != 'epic', key", (epic_id,)
+            ).fetchall()
+        logger.info(f"Merged {len(changed_issues)} changed issues into snapshot of epic {epic_id}.")
+        return [json.loads(row[0]) for row in rows]
+
+    def invalidate(self, epic_id: str):
+        """Drops the snapshot of an epic, so the next refresh is a full harvest."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM snapshot_issues WHERE epic_id = ?", (epic_id,))
+            self._connection.execute("DELETE FROM snapshot_syncs WHERE epic_id = ?", (epic_id,))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO snapshot_invalidations (epic_id, invalidated_at) VALUES (?, ?)", (epic_id, time.time())
+            )
+
+    def _insert(self, epic_id: str, issues: List[Dict[str, Any]]):
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO snapshot_issues (epic_id, key, issue_type, data) VALUES (?, ?, ?, ?)",
+            [(epic_id, issue["key"], issue["issue_type"], json.dumps(issue)) for issue in issues]
+        )
+
+    def needs_full_sync(self, epic_id: str, max_age_seconds: float, now: Optional[float] = None) -> bool:
+        """
+        Whether the next refresh of an epic has to be a full harvest.
+
+        Delta queries cannot see stories that were removed from the epic, so a full harvest is
+        forced once the last one is older than `max_age_seconds`.
+        """
+        times = self.sync_times(epic_id)
+        if times is None:
+            return True
+        return (now if now is not None else time.time()) - times["last_full_sync"] > max_age_seconds
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import List
+
+from .metrics import llm_span
+from .ratelimit import LLM_RATE_LIMITER, llm_tenant
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SEPARATOR = "\n\n"
+
+MAP_STORIES_SYSTEM_TEMPLATE = """You are a Project Manager condensing the Jira stories of one epic into notes that will later be turned into an executive summary."""
+MAP_STORIES_HUMAN_TEMPLATE = """Epic:
+{epic}
+
+Stories:
+{stories}
+
+Condense these stories into plain-text notes:
+- One line per story with its title, status and assignee.
+- Then the notable accomplishments, challenges or blockers, and dependencies mentioned in the descriptions or comments.
+
+Be brief and factual. Do not use HTML or Markdown."""
+
+
+@lru_cache(maxsize=1)
+def map_stories_prompt():
+    """Builds the map prompt on first use, as importing LangChain is slow."""
+    from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+    return ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(MAP_STORIES_SYSTEM_TEMPLATE),
+        HumanMessagePromptTemplate.from_template(MAP_STORIES_HUMAN_TEMPLATE),
+    ])
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as err:
+        # tiktoken downloads its encodings on first use, into TIKTOKEN_CACHE_DIR if set; offline hosts
+        # need the encoding cached there beforehand, e.g. when the image is built
+        logger.warning(
+            f"tiktoken cannot load the o200k_base encoding ({err}); token counts and budgets are estimated from "
+            f"characters for the lifetime of this process. Pre-cache the encoding in TIKTOKEN_CACHE_DIR to count exactly."
+        )
+        return None
+
+
+def _model_name(chat_model) -> str:
+    return getattr(chat_model, "model_name", None) or getattr(chat_model, "model", None) or type(chat_model).__name__
+
+
+def estimate_tokens(text: str) -> int:
+    """Returns the number of tokens `text` takes for the GPT-4o family (roughly 4 characters per token without tiktoken)."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Returns the longest prefix of `text` that takes at most `max_tokens` tokens."""
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def chunk_by_token_budget(blocks: List[str], token_budget: int) -> List[str]:
+    """
+    Greedily packs consecutive blocks into chunks of at most `token_budget` tokens.
+
+    A block that is larger than the budget on its own becomes a chunk of its own.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    separator_tokens = estimate_tokens(CHUNK_SEPARATOR)
+    for block in blocks:
+        block_tokens = estimate_tokens(block) + separator_tokens
+        if current and current_tokens + block_tokens > token_budget:
+            chunks.append(CHUNK_SEPARATOR.join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += block_tokens
+    if current:
+        chunks.append(CHUNK_SEPARATOR.join(current))
+    return chunks
+
+
+async def map_reduce_question(
+    chat_model,
+    epic_text: str,
+    story_blocks: List[str],
+    chunk_token_budget: int,
+    reduce_token_budget: int,
+    concurrency: int
+) -> str:
+    """
+    Condenses the stories of an epic that is too large for a single model call into a reduce question.
+
+    The stories are packed into chunks of `chunk_token_budget` tokens, and each chunk is condensed
+    into notes by a concurrent model call, with at most `concurrency` calls in flight. While the
+    notes together still exceed `reduce_token_budget`, they are condensed again the same way.
+
+    Args:
+        chat_model: A LangChain chat model.
+        epic_text (str): The formatted epic, placed in front of the notes.
+        story_blocks (List[str]): One formatted block per story.
+        chunk_token_budget (int): The maximum size of one map call's input, in tokens.
+        reduce_token_budget (int): The maximum size of the notes passed to the reduce call, in tokens.
+        concurrency (int): The maximum number of concurrent map calls.
+
+    Returns:
+        str: The epic followed by the condensed notes, to be passed to the summarizer prompt as `question`.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def condense(chunk: str) -> str:
+        async with semaphore:
+            await LLM_RATE_LIMITER.aacquire(*llm_tenant(chat_model))
+            with llm_span(_model_name(chat_model), "map") as result:
+                response = await chat_model.ainvoke(map_stories_prompt().format(epic=epic_text, stories=chunk))
+                result["usage"] = getattr(response, "usage_metadata", None)
+            return response.content
+
+    notes = story_blocks
+    level = 0
+    while True:
+        chunks = chunk_by_token_budget(notes, chunk_token_budget)
+        logger.info(f"Map-reduce level {level}: condensing {len(notes)} blocks in {len(chunks)} chunks.")
+        notes = list(await asyncio.gather(*(condense(chunk) for chunk in chunks)))
+        level += 1
+        # A single chunk cannot be condensed any further by another level
+        if len(chunks) == 1 or estimate_tokens(CHUNK_SEPARATOR.join(notes)) <= reduce_token_budget:
+            break
+
+    return f"{epic_text}\n\nstories (condensed notes):\n{CHUNK_SEPARATOR.join(notes)}"
+
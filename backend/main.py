@@ -1,9 +1,43 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from services import jira_service
+from services.response_cache import ResponseCache, SQLiteResponseCache
+from services.shared_state import state_path
+from services import sync_engine
+from services import issue_index
+from services import webhooks
+from services.transport import get_transport
+from services.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY
 from dotenv import load_dotenv
 load_dotenv() 
 
+# Jira reads are served from a short-lived cache shared by concurrent identical requests
+JIRA_CACHE_TTL_SECONDS = float(os.getenv("JIRA_CACHE_TTL_SECONDS", "30"))
+JIRA_CACHE_MAX_ENTRIES = int(os.getenv("JIRA_CACHE_MAX_ENTRIES", "256"))
+# With several workers, set JIRA_CACHE_PATH (or SHARED_STATE_DIR) so that they share one cache
+JIRA_CACHE_PATH = state_path("JIRA_CACHE_PATH", "jira_cache.db")
+JIRA_PAGE_SIZE = int(os.getenv("JIRA_PAGE_SIZE", "50"))
+# Largest number of issues accepted by one POST /jira/issues/bulk
+BULK_MAX_ISSUES = int(os.getenv("BULK_MAX_ISSUES", "10000"))
+# The documentation tool, notified when issues move between epics
+DOC_TOOL_URL = os.getenv("DOC_TOOL_URL")
+CACHE_INVALIDATION_TOKEN = os.getenv("CACHE_INVALIDATION_TOKEN", "")
+
+if JIRA_CACHE_PATH:
+    jira_cache = SQLiteResponseCache(JIRA_CACHE_PATH, JIRA_CACHE_TTL_SECONDS, JIRA_CACHE_MAX_ENTRIES, name="jira")
+else:
+    jira_cache = ResponseCache(JIRA_CACHE_TTL_SECONDS, JIRA_CACHE_MAX_ENTRIES, name="jira")
+
+logger = logging.getLogger(__name__)
+
 
 app = FastAPI()
 
@@ -24,12 +58,47 @@ def read_hello(name: str = "World"):
 def create_item(item: dict):
     return {"status": "success", "item": item}
 
+@app.get("/metrics")
+def get_metrics():
+    """Exposes the Jira latency, payload size, retry and cache metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Jira endpoints
+def _json_entry(data: Any) -> Tuple[bytes, str]:
+    """Serializes a payload once, along with its ETag, for caching."""
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+def _cached_json_response(key: Tuple, loader, if_none_match: Optional[str]) -> Response:
+    body, etag = jira_cache.get_or_load(key, lambda: _json_entry(loader()))
+    # no-cache lets browsers keep the response but revalidate it with If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/jira/issues")
-def get_jira_issues(project_key: str):
+def get_jira_issues(
+    project_key: str,
+    fields: Optional[str] = Query(None, description="Comma-separated issue fields to return"),
+    max_results: int = Query(JIRA_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    if_none_match: Optional[str] = Header(None)
+):
+    field_list = tuple(field.strip() for field in fields.split(",") if field.strip()) if fields else None
     try:
-        data = jira_service.get_issues(project_key)
-        return data
+        return _cached_json_response(
+            ("issues", project_key, field_list, max_results, cursor),
+            lambda: jira_service.get_issues(project_key, field_list, max_results, cursor),
+            if_none_match
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -37,15 +106,234 @@ def get_jira_issues(project_key: str):
 def post_jira_issue(project_key: str, summary: str, issue_type: str = "Task", description: str = ""):
     try:
         data = jira_service.create_issue(project_key, summary, issue_type, description)
+        # The cached pages of the project no longer list every issue
+        jira_cache.invalidate(lambda key: key[:2] == ("issues", project_key))
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_bulk_body(body: bytes, content_type: str) -> List[Any]:
+    """
+    Parses the issues of a bulk request, a JSON array or NDJSON (one JSON object per line).
+
+    An NDJSON line that is not valid JSON becomes a ValueError in its place, so that only that item fails.
+
+    Raises:
+        ValueError: If a JSON body is not an array of issues.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        for number, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f"Invalid JSON on line {number}: {e}"))
+        return items
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON payload: {e}")
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of issues.")
+    return items
+
+@app.post("/jira/issues/bulk")
+async def post_jira_issues_bulk(request: Request, project_key: Optional[str] = None):
+    # Issues are created BULK_CREATE_SIZE at a time; the response holds one result per issue, in order,
+    # and is 207 when some of them failed
+    try:
+        items = _parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items:
+        raise HTTPException(status_code=400, detail="No issues given.")
+    if len(items) > BULK_MAX_ISSUES:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ISSUES} issues can be created at once.")
+
+    results = await run_in_threadpool(jira_service.create_issues, items, project_key)
+    # The cached pages of every project no longer list every issue
+    jira_cache.invalidate(lambda key: key[0] == "issues")
+    created = sum(1 for result in results if result["key"])
+    return JSONResponse(
+        {"created": created, "failed": len(results) - created, "results": results},
+        status_code=200 if created == len(results) else 207
+    )
+
 # New route to fetch Jira projects
 @app.get("/jira/projects")
-def get_jira_projects():
+def get_jira_projects(
+    max_results: int = Query(JIRA_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    if_none_match: Optional[str] = Header(None)
+):
     try:
-        data = jira_service.get_projects()
-        return data
+        return _cached_json_response(
+            ("projects", max_results, cursor),
+            lambda: jira_service.get_projects(max_results, cursor),
+            if_none_match
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+# Jira-to-Jira synchronization, enabled by the SYNC_* settings
+sync = sync_engine.build_sync_engine() if sync_engine.sync_configured() else None
+_sync_stop = threading.Event()
+
+@app.on_event("startup")
+def start_sync():
+    if sync is None:
+        logger.info("Jira sync is not configured.")
+        return
+    threading.Thread(target=sync.run_forever, args=(_sync_stop,), name="jira-sync", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_sync():
+    _sync_stop.set()
+
+def _require_sync():
+    if sync is None:
+        raise HTTPException(status_code=503, detail="Jira sync is not configured.")
+    return sync
+
+@app.post("/sync/run")
+def run_sync():
+    engine = _require_sync()
+    try:
+        return engine.run_once()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/sync/status")
+def get_sync_status():
+    return _require_sync().status()
+
+# Local search index of the ISSUE_INDEX_PROJECTS, for dashboard queries that never reach Jira
+indexer = issue_index.build_issue_indexer() if issue_index.index_configured() else None
+_index_stop = threading.Event()
+
+@app.on_event("startup")
+def start_issue_index():
+    if indexer is None:
+        logger.info("The issue index is not configured.")
+        return
+    threading.Thread(target=indexer.run_forever, args=(_index_stop,), name="issue-index", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_issue_index():
+    _index_stop.set()
+
+def _require_indexer():
+    if indexer is None:
+        raise HTTPException(status_code=503, detail="The issue index is not configured.")
+    return indexer
+
+@app.get("/jira/issues/search")
+def search_jira_issues(
+    project_key: str,
+    q: Optional[str] = Query(None, description="Words to find in the summary, description or comments"),
+    status: Optional[List[str]] = Query(None, description="Statuses to keep, by name; repeat for several"),
+    assignee: Optional[str] = Query(None, description=f"Display name or account id, or '{issue_index.UNASSIGNED}'"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    facets: bool = Query(False, description="Also return the issue counts per status and assignee")
+):
+    index = _require_indexer()
+    if project_key not in index.projects:
+        raise HTTPException(status_code=404, detail=f"Project {project_key} is not indexed.")
+    result = index.index.search(project_key, q, status, assignee, limit, offset)
+    if facets:
+        result["facets"] = index.index.facets(project_key)
+    return result
+
+@app.post("/jira/index/refresh")
+def refresh_issue_index(project_key: Optional[str] = None, full: bool = False):
+    index = _require_indexer()
+    if project_key is not None and project_key not in index.projects:
+        raise HTTPException(status_code=404, detail=f"Project {project_key} is not indexed.")
+    try:
+        if project_key is not None:
+            return index.refresh(project_key, full=full or None)
+        return {key: index.refresh(key, full=full or None) for key in index.projects}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jira/index/status")
+def get_issue_index_status():
+    return _require_indexer().status()
+
+# Jira webhooks, coalesced per issue and dispatched to the sync engine and the documentation tool
+webhook_ingestor = webhooks.WebhookIngestor()
+
+def sync_changed_issues(changes):
+    if sync is None:
+        return
+    local_url = sync.instances[sync_engine.LOCAL].base_url.rstrip("/")
+    local_keys = [change.issue_key for change in changes if change.base_url.rstrip("/") == local_url]
+    remote_keys = [change.issue_key for change in changes if change.base_url.rstrip("/") != local_url]
+    stats = sync.sync_keys(local_keys, remote_keys)
+    logger.info(f"Synced {len(changes)} issues from webhooks: {stats}")
+
+def invalidate_epic_snapshots(changes):
+    # Incremental refreshes cannot see stories leaving an epic, so those epics are harvested again
+    epic_ids = sorted({key for change in changes if change.epic_membership_changed for key in change.epic_keys})
+    if not DOC_TOOL_URL or not epic_ids:
+        return
+    response = get_transport().request(
+        "POST",
+        f"{DOC_TOOL_URL.rstrip('/')}/cache/invalidate",
+        json={"epic_ids": epic_ids},
+        headers={"X-Cache-Invalidation-Token": CACHE_INVALIDATION_TOKEN}
+    )
+    response.raise_for_status()
+    logger.info(f"Invalidated the snapshots of epics {epic_ids}.")
+
+def index_changed_issues(changes):
+    if indexer is None:
+        return
+    site_url = (jira_service.JIRA_BASE_URL or "").rstrip("/")
+    keys = [change.issue_key for change in changes if change.base_url.rstrip("/") == site_url]
+    if keys:
+        logger.info(f"Re-indexed {indexer.refresh_keys(keys)} issues from webhooks.")
+
+webhook_ingestor.subscribe(sync_changed_issues)
+webhook_ingestor.subscribe(index_changed_issues)
+webhook_ingestor.subscribe(invalidate_epic_snapshots)
+
+@app.on_event("startup")
+def start_webhooks():
+    if not webhooks.JIRA_WEBHOOK_SECRET:
+        if webhooks.JIRA_WEBHOOK_ALLOW_UNSIGNED:
+            logger.warning("JIRA_WEBHOOK_SECRET is not set and JIRA_WEBHOOK_ALLOW_UNSIGNED is on: anyone can post webhook deliveries.")
+        else:
+            logger.warning("JIRA_WEBHOOK_SECRET is not set: webhook deliveries are rejected.")
+    webhook_ingestor.start()
+
+@app.on_event("shutdown")
+def stop_webhooks():
+    webhook_ingestor.stop()
+
+@app.post("/webhooks/jira", status_code=202)
+async def receive_jira_webhook(
+    request: Request,
+    x_hub_signature: Optional[str] = Header(None),
+    x_atlassian_webhook_identifier: Optional[str] = Header(None)
+):
+    body = await request.body()
+    if not webhooks.verify_signature(body, x_hub_signature, webhooks.JIRA_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature.")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload.")
+    # Unsupported events are acknowledged too, so that Jira does not retry them
+    return {"status": webhook_ingestor.accept(payload, x_atlassian_webhook_identifier)}
+
+@app.get("/webhooks/status")
+def get_webhook_status():
+    return webhook_ingestor.status()
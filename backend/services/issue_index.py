@@ -0,0 +1,418 @@
+"""
+Local search index of the issues of Jira projects, for dashboard queries that never reach Jira.
+
+The issues of each indexed project are kept in SQLite: status, assignee and type as indexed
+columns, and summary, description and comments in an FTS5 full-text index. A refresh only asks
+Jira for the issues updated since the previous one (watermark JQL) and upserts them; a full
+refresh every ISSUE_INDEX_FULL_SYNC_HOURS also drops the issues that were deleted or moved to
+another project, which updated-based queries cannot see. Issues reported by Jira webhooks are
+refreshed right away with `refresh_keys`.
+
+Comments are indexed as far as Jira embeds them in search results (its first page of comments).
+"""
+import os
+import re
+import json
+import math
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services import jira_service
+from services.shared_state import ProcessLock, connect_sqlite, state_path
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated keys of the indexed projects; the index is off without any
+ISSUE_INDEX_PROJECTS = [key.strip() for key in os.getenv("ISSUE_INDEX_PROJECTS", "").split(",") if key.strip()]
+ISSUE_INDEX_PATH = state_path("ISSUE_INDEX_PATH", "issue_index.db", "issue_index.db")
+ISSUE_INDEX_INTERVAL_SECONDS = float(os.getenv("ISSUE_INDEX_INTERVAL_SECONDS", "60"))
+ISSUE_INDEX_FULL_SYNC_HOURS = float(os.getenv("ISSUE_INDEX_FULL_SYNC_HOURS", "24"))
+# JQL dates have minute precision, so refreshes reach a little further back than the last one
+ISSUE_INDEX_OVERLAP_MINUTES = 2
+ISSUE_INDEX_PAGE_SIZE = 100
+
+INDEXED_FIELDS = ["summary", "description", "status", "assignee", "issuetype", "priority", "created", "updated", "comment"]
+# The fields returned for each search hit, in the shape of Jira's search results
+RESULT_FIELDS = ("summary", "status", "issuetype", "assignee", "priority", "created", "updated")
+UNASSIGNED = "unassigned"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+_BLOCK_NODES = ("paragraph", "heading", "codeBlock", "listItem", "blockquote", "rule")
+
+
+def adf_text(node: Any) -> str:
+    """Flattens an Atlassian Document Format node (or a plain string) to text, one line per block."""
+    parts = []
+    # Walked with an explicit stack, so deeply nested documents cannot hit the recursion limit;
+    # plain strings on the stack are text, including the line break closing a block
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        node_type = node.get("type")
+        if node_type == "text":
+            parts.append(node.get("text", ""))
+        elif node_type in ("mention", "emoji", "status", "inlineCard"):
+            attrs = node.get("attrs") or {}
+            parts.append(attrs.get("text") or attrs.get("shortName") or attrs.get("url") or "")
+        elif node_type == "hardBreak":
+            parts.append("\n")
+        else:
+            if node_type in _BLOCK_NODES:
+                stack.append("\n")
+            stack.append(node.get("content"))
+    return "".join(parts)
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query matching every word, the last one as a prefix for search-as-you-type.
+
+    Returns None if the text has no words. Operators and quotes in the text are not interpreted.
+    """
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _issue_row(issue: Dict[str, Any], project_key: str) -> Tuple:
+    fields = issue.get("fields") or {}
+    status = fields.get("status") or {}
+    assignee = fields.get("assignee") or {}
+    comments = (fields.get("comment") or {}).get("comments", [])
+    updated = fields.get("updated") or ""
+    result = {"key": issue["key"], "fields": {name: fields.get(name) for name in RESULT_FIELDS}}
+    return (
+        issue["key"],
+        project_key,
+        fields.get("summary") or "",
+        adf_text(fields.get("description")).strip(),
+        "\n".join(adf_text(comment.get("body")).strip() for comment in comments),
+        status.get("name"),
+        (status.get("statusCategory") or {}).get("key"),
+        assignee.get("displayName"),
+        assignee.get("accountId"),
+        (fields.get("issuetype") or {}).get("name"),
+        (fields.get("priority") or {}).get("name"),
+        updated,
+        json.dumps(result, separators=(",", ":")),
+    )
+
+
+class IssueIndex:
+    COLUMNS = (
+        "key", "project_key", "summary", "description", "comments", "status", "status_category",
+        "assignee", "assignee_id", "issue_type", "priority", "updated", "data"
+    )
+
+    def __init__(self, path: str):
+        """
+        The indexed issues and the refresh watermark of each project, in a SQLite file that the
+        backend's workers share.
+
+        Args:
+            path (str): The SQLite file.
+        """
+        self.path = path
+        self._connection = connect_sqlite(path)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_issues (
+                    key TEXT PRIMARY KEY,
+                    project_key TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    comments TEXT NOT NULL,
+                    status TEXT,
+                    status_category TEXT,
+                    assignee TEXT,
+                    assignee_id TEXT,
+                    issue_type TEXT,
+                    priority TEXT,
+                    updated TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS indexed_issues_by_status ON indexed_issues (project_key, status)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS indexed_issues_by_assignee ON indexed_issues (project_key, assignee)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS indexed_issues_by_updated ON indexed_issues (project_key, updated)")
+            # External content table: the text lives once, in indexed_issues, and the triggers keep the index in step
+            self._connection.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS indexed_issues_fts USING fts5(
+                    key UNINDEXED, summary, description, comments,
+                    content='indexed_issues', tokenize='unicode61 remove_diacritics 2'
+                )
+                """
+            )
+            self._connection.executescript(
+                """
+                CREATE TRIGGER IF NOT EXISTS indexed_issues_ai AFTER INSERT ON indexed_issues BEGIN
+                    INSERT INTO indexed_issues_fts (rowid, key, summary, description, comments)
+                    VALUES (new.rowid, new.key, new.summary, new.description, new.comments);
+                END;
+                CREATE TRIGGER IF NOT EXISTS indexed_issues_ad AFTER DELETE ON indexed_issues BEGIN
+                    INSERT INTO indexed_issues_fts (indexed_issues_fts, rowid, key, summary, description, comments)
+                    VALUES ('delete', old.rowid, old.key, old.summary, old.description, old.comments);
+                END;
+                CREATE TRIGGER IF NOT EXISTS indexed_issues_au AFTER UPDATE ON indexed_issues BEGIN
+                    INSERT INTO indexed_issues_fts (indexed_issues_fts, rowid, key, summary, description, comments)
+                    VALUES ('delete', old.rowid, old.key, old.summary, old.description, old.comments);
+                    INSERT INTO indexed_issues_fts (rowid, key, summary, description, comments)
+                    VALUES (new.rowid, new.key, new.summary, new.description, new.comments);
+                END;
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS index_watermarks (
+                    project_key TEXT PRIMARY KEY,
+                    last_sync REAL NOT NULL,
+                    last_full_sync REAL NOT NULL
+                )
+                """
+            )
+
+    def upsert(self, issues: Iterable[Dict[str, Any]], project_key: str) -> int:
+        """Inserts or updates raw Jira issues of a project. Returns how many were written."""
+        rows = [_issue_row(issue, project_key) for issue in issues]
+        if not rows:
+            return 0
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the delete trigger
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in self.COLUMNS[1:])
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT INTO indexed_issues ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))}) "
+                f"ON CONFLICT (key) DO UPDATE SET {assignments}",
+                rows
+            )
+        return len(rows)
+
+    def prune(self, project_key: str, kept_keys: Iterable[str]) -> int:
+        """Deletes the issues of a project that are not in `kept_keys`, i.e. were not seen by a full refresh. Returns how many."""
+        kept = set(kept_keys)
+        with self._lock, self._connection:
+            stale = [
+                (row[0],) for row in self._connection.execute("SELECT key FROM indexed_issues WHERE project_key = ?", (project_key,))
+                if row[0] not in kept
+            ]
+            self._connection.executemany("DELETE FROM indexed_issues WHERE key = ?", stale)
+        return len(stale)
+
+    def watermark(self, project_key: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_sync, last_full_sync FROM index_watermarks WHERE project_key = ?", (project_key,)
+            ).fetchone()
+        return {"last_sync": row[0], "last_full_sync": row[1]} if row else None
+
+    def set_watermark(self, project_key: str, last_sync: float, full: bool):
+        with self._lock, self._connection:
+            if full:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO index_watermarks (project_key, last_sync, last_full_sync) VALUES (?, ?, ?)",
+                    (project_key, last_sync, last_sync)
+                )
+            else:
+                self._connection.execute("UPDATE index_watermarks SET last_sync = ? WHERE project_key = ?", (last_sync, project_key))
+
+    def search(
+        self,
+        project_key: Optional[str] = None,
+        text: Optional[str] = None,
+        statuses: Optional[List[str]] = None,
+        assignee: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Finds indexed issues.
+
+        Args:
+            project_key (str, optional): Only issues of this project.
+            text (str, optional): Words that must all occur in the summary, description or comments;
+                hits are then ranked by relevance instead of by last update.
+            statuses (List[str], optional): Only issues in one of these statuses, by name.
+            assignee (str, optional): Only issues of this assignee, by display name or account id,
+                or UNASSIGNED for issues without one.
+            limit (int): The maximum number of issues returned.
+            offset (int): How many matching issues to skip, for paging.
+
+        Returns:
+            dict: The matching `issues` in the shape of Jira's search results and their `total` count.
+        """
+        conditions, params = [], []
+        source = "indexed_issues AS issues"
+        order = "issues.updated DESC, issues.key"
+        query = fts_query(text) if text else None
+        if text and query is None:
+            return {"issues": [], "total": 0}
+        if query is not None:
+            source = "indexed_issues_fts JOIN indexed_issues AS issues ON issues.rowid = indexed_issues_fts.rowid"
+            conditions.append("indexed_issues_fts MATCH ?")
+            params.append(query)
+            # bm25 weights of summary, description and comments; key is unindexed
+            order = "bm25(indexed_issues_fts, 0.0, 10.0, 3.0, 1.0), issues.updated DESC"
+        if project_key:
+            conditions.append("issues.project_key = ?")
+            params.append(project_key)
+        if statuses:
+            conditions.append(f"issues.status COLLATE NOCASE IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if assignee:
+            if assignee.lower() == UNASSIGNED:
+                conditions.append("issues.assignee_id IS NULL")
+            else:
+                conditions.append("(issues.assignee = ? COLLATE NOCASE OR issues.assignee_id = ?)")
+                params.extend([assignee, assignee])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            total = self._connection.execute(f"SELECT COUNT(*) FROM {source} {where}", params).fetchone()[0]
+            rows = self._connection.execute(
+                f"SELECT issues.data FROM {source} {where} ORDER BY {order} LIMIT ? OFFSET ?", [*params, limit, offset]
+            ).fetchall()
+        return {"issues": [json.loads(row[0]) for row in rows], "total": total}
+
+    def facets(self, project_key: str) -> Dict[str, Dict[str, int]]:
+        """Returns the number of indexed issues of a project per status and per assignee, for the dashboard's filters."""
+        with self._lock:
+            statuses = self._connection.execute(
+                "SELECT status, COUNT(*) FROM indexed_issues WHERE project_key = ? GROUP BY status ORDER BY 2 DESC", (project_key,)
+            ).fetchall()
+            assignees = self._connection.execute(
+                "SELECT COALESCE(assignee, ?), COUNT(*) FROM indexed_issues WHERE project_key = ? GROUP BY 1 ORDER BY 2 DESC",
+                (UNASSIGNED, project_key)
+            ).fetchall()
+        return {"statuses": {name or "": count for name, count in statuses}, "assignees": dict(assignees)}
+
+    def count(self, project_key: str) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM indexed_issues WHERE project_key = ?", (project_key,)).fetchone()[0]
+
+
+class IssueIndexer:
+    def __init__(self, index: IssueIndex, projects: List[str], full_sync_hours: float = ISSUE_INDEX_FULL_SYNC_HOURS):
+        """
+        Keeps the index of the given projects fresh.
+
+        Args:
+            index (IssueIndex): The index.
+            projects (List[str]): The keys of the indexed projects.
+            full_sync_hours (float): How often a full refresh drops deleted and moved issues.
+        """
+        self.index = index
+        self.projects = projects
+        self.full_sync_hours = full_sync_hours
+        self.last_stats: Dict[str, Any] = {}
+        lock_path = None if index.path == ":memory:" else index.path
+        # Only one of several workers sharing the index runs the periodic refreshes
+        self._leader_lock = ProcessLock(f"{lock_path}.leader" if lock_path else None)
+
+    def refresh(self, project_key: str, full: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Brings the index of a project up to date.
+
+        Args:
+            project_key (str): The project.
+            full (bool, optional): Forces a full (True) or incremental (False) refresh; by default it
+                is full when the project was never indexed or its last full refresh is too old.
+
+        Returns:
+            Dict[str, Any]: Whether the refresh was full, how many issues it wrote and pruned, and its duration.
+        """
+        started = time.time()
+        watermark = self.index.watermark(project_key)
+        if full is None:
+            full = watermark is None or started - watermark["last_full_sync"] > self.full_sync_hours * 3600
+        if watermark is None:
+            full = True
+
+        jql = f'project = "{project_key}"'
+        if not full:
+            minutes = math.ceil((started - watermark["last_sync"]) / 60) + ISSUE_INDEX_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+        jql += " ORDER BY updated ASC"
+
+        written, seen_keys, page = 0, [], []
+        for issue in jira_service.iter_search(jql, INDEXED_FIELDS, ISSUE_INDEX_PAGE_SIZE):
+            page.append(issue)
+            seen_keys.append(issue["key"])
+            if len(page) >= ISSUE_INDEX_PAGE_SIZE:
+                written += self.index.upsert(page, project_key)
+                page = []
+        written += self.index.upsert(page, project_key)
+        pruned = self.index.prune(project_key, seen_keys) if full else 0
+        self.index.set_watermark(project_key, started, full)
+
+        stats = {"project_key": project_key, "full": full, "written": written, "pruned": pruned, "seconds": round(time.time() - started, 3)}
+        logger.info(f"Issue index refreshed: {stats}")
+        return stats
+
+    def refresh_all(self) -> Dict[str, Any]:
+        stats = {}
+        for project_key in self.projects:
+            try:
+                stats[project_key] = self.refresh(project_key)
+            except Exception as err:
+                logger.exception(f"Refreshing the issue index of {project_key} failed: {err}")
+                stats[project_key] = {"error": str(err)}
+        self.last_stats = stats
+        return stats
+
+    def refresh_keys(self, keys: List[str]) -> int:
+        """Re-indexes the given issues of the indexed projects right away, e.g. on webhook events. Returns how many were written."""
+        written = 0
+        for project_key in self.projects:
+            project_keys = [key for key in keys if key.rsplit("-", 1)[0] == project_key]
+            for start in range(0, len(project_keys), ISSUE_INDEX_PAGE_SIZE):
+                chunk = project_keys[start:start + ISSUE_INDEX_PAGE_SIZE]
+                jql = f'project = "{project_key}" AND key in ({",".join(chunk)})'
+                written += self.index.upsert(jira_service.iter_search(jql, INDEXED_FIELDS, ISSUE_INDEX_PAGE_SIZE), project_key)
+        return written
+
+    def run_forever(self, stop: threading.Event, interval_seconds: float = ISSUE_INDEX_INTERVAL_SECONDS):
+        """Refreshes every project each `interval_seconds` until `stop` is set, in one of the workers sharing the index."""
+        while not self._leader_lock.acquire(blocking=False):
+            if stop.wait(interval_seconds):
+                return
+        try:
+            while not stop.is_set():
+                self.refresh_all()
+                stop.wait(interval_seconds)
+        finally:
+            self._leader_lock.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "projects": {
+                project_key: {"issues": self.index.count(project_key), "watermark": self.index.watermark(project_key)}
+                for project_key in self.projects
+            },
+            "last_refresh": self.last_stats,
+        }
+
+
+def index_configured() -> bool:
+    return bool(ISSUE_INDEX_PROJECTS)
+
+
+def build_issue_indexer() -> IssueIndexer:
+    return IssueIndexer(IssueIndex(ISSUE_INDEX_PATH), ISSUE_INDEX_PROJECTS)
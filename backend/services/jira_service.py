@@ -1,25 +1,90 @@
 import os
-import requests
+import json
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from requests.auth import HTTPBasicAuth
 from dotenv import load_dotenv
 load_dotenv()  # This will load variables from .env into os.environ
+from services.transport import get_transport
+from services.metrics import operation_of, span
 
 JIRA_BASE_URL = os.getenv("JIRA_BASE_URL")
 JIRA_EMAIL = os.getenv("JIRA_EMAIL")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
 
-def get_issues(project_key: str):
-    search_url = f"{JIRA_BASE_URL}/rest/api/3/search"
+# Bulk create requests sent to Jira at once, fewer while Jira signals rate limiting
+JIRA_BULK_WORKERS = int(os.getenv("JIRA_BULK_WORKERS", "4"))
+
+_auth = HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
+
+logger = logging.getLogger(__name__)
+
+# Fields returned for each issue unless the caller asks for others
+DEFAULT_ISSUE_FIELDS = ["summary", "status", "issuetype", "assignee", "updated"]
+# Jira accepts at most 50 issues per bulk create request
+BULK_CREATE_SIZE = 50
+
+def _request(method: str, url: str, **kwargs):
+    """Sends a request to Jira through the shared transport, timed into the upstream metrics."""
+    with span("jira", operation_of(url)) as result:
+        response = get_transport().request(method, url, **kwargs)
+        result["outcome"] = f"{response.status_code // 100}xx"
+        result["bytes"] = len(response.content)
+    return response
+
+def get_issues(project_key: str, fields: Optional[List[str]] = None, max_results: int = 50, cursor: Optional[str] = None):
+    """
+    Returns one page of the issues of a project.
+
+    Args:
+        project_key (str): The key of the Jira project.
+        fields (List[str], optional): The issue fields to return; DEFAULT_ISSUE_FIELDS if not given.
+        max_results (int): The maximum number of issues on the page.
+        cursor (str, optional): The `next_cursor` of the previous page.
+
+    Returns:
+        dict: The `issues` of the page and the `next_cursor` of the following one (None on the last page).
+    """
+    search_url = f"{JIRA_BASE_URL}/rest/api/3/search/jql"
     jql = f"project={project_key}"
+    params = {
+        "jql": jql,
+        "fields": ",".join(fields or DEFAULT_ISSUE_FIELDS),
+        "maxResults": max_results,
+    }
+    if cursor:
+        params["nextPageToken"] = cursor
 
-    response = requests.get(
+    response = _request(
+        "GET",
         search_url,
         headers={"Accept": "application/json"},
-        auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN),
-        params={"jql": jql}
+        auth=_auth,
+        params=params
     )
     response.raise_for_status()
-    return response.json()
+    data = response.json()
+    return {"issues": data.get("issues", []), "next_cursor": data.get("nextPageToken")}
+
+def iter_search(jql: str, fields: List[str], page_size: int = 100) -> Iterable[Dict[str, Any]]:
+    """Yields every issue matching `jql` with the given fields, following the search's page tokens."""
+    params = {"jql": jql, "fields": ",".join(fields), "maxResults": page_size}
+    while True:
+        response = _request(
+            "GET",
+            f"{JIRA_BASE_URL}/rest/api/3/search/jql",
+            headers={"Accept": "application/json"},
+            auth=_auth,
+            params=params
+        )
+        response.raise_for_status()
+        data = response.json()
+        yield from data.get("issues", [])
+        if not data.get("nextPageToken"):
+            return
+        params = {**params, "nextPageToken": data["nextPageToken"]}
 
 def create_issue(project_key: str, summary: str, issue_type: str = "Task", description: str = ""):
     create_url = f"{JIRA_BASE_URL}/rest/api/3/issue"
@@ -32,21 +97,209 @@ def create_issue(project_key: str, summary: str, issue_type: str = "Task", descr
         }
     }
 
-    response = requests.post(
+    response = _request(
+        "POST",
         create_url,
         json=payload,
         headers={"Accept": "application/json", "Content-Type": "application/json"},
-        auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
+        auth=_auth
     )
     response.raise_for_status()
     return response.json()
 
-def get_projects():
-    projects_url = f"{JIRA_BASE_URL}/rest/api/3/project"
-    response = requests.get(
+def get_projects(max_results: int = 50, cursor: Optional[str] = None):
+    """
+    Returns one page of the projects visible to the user.
+
+    Args:
+        max_results (int): The maximum number of projects on the page.
+        cursor (str, optional): The `next_cursor` of the previous page.
+
+    Returns:
+        dict: The `projects` of the page and the `next_cursor` of the following one (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is not one returned by this function.
+    """
+    projects_url = f"{JIRA_BASE_URL}/rest/api/3/project/search"
+    start_at = int(cursor) if cursor else 0
+    if start_at < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    response = _request(
+        "GET",
         projects_url,
         headers={"Accept": "application/json"},
-        auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN),
+        auth=_auth,
+        params={"startAt": start_at, "maxResults": max_results}
     )
     response.raise_for_status()
-    return response.json()
+    data = response.json()
+    projects = data.get("values", [])
+    next_cursor = None if data.get("isLast", True) else str(start_at + len(projects))
+    return {"projects": projects, "next_cursor": next_cursor}
+
+class AdaptiveConcurrency:
+    def __init__(self, limit: int):
+        """
+        Bounds the number of concurrent writes, halving the bound when Jira signals rate limiting
+        and growing it back by one slot per `limit` successful writes.
+        """
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self._active = 0
+        self._credit = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, throttled: bool):
+        with self._condition:
+            self._active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._credit = 0.0
+                logger.warning(f"Jira is rate limiting, lowering write concurrency to {self.limit}.")
+            elif self.limit < self.max_limit:
+                self._credit += 1 / self.limit
+                if self._credit >= 1:
+                    self.limit += 1
+                    self._credit = 0.0
+            self._condition.notify_all()
+
+
+def is_throttled(response) -> bool:
+    return response.status_code == 429 or response.headers.get("X-RateLimit-NearLimit", "").lower() == "true"
+
+
+def bulk_create_results(response, count: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Matches the outcome of a bulk create request with its `count` issues.
+
+    Returns:
+        List[Tuple[Optional[str], Optional[str]]]: For each issue in order, its key or None and an error message or None.
+    """
+    # A partially failed bulk create answers 400 with both the created issues and the errors
+    if response.status_code != 400:
+        response.raise_for_status()
+    data = response.json()
+    errors = {
+        error.get("failedElementNumber"): json.dumps((error.get("elementErrors") or {}).get("errors") or error)
+        for error in data.get("errors", [])
+    }
+    created = iter(data.get("issues", []))
+    return [(None, errors[index]) if index in errors else (next(created)["key"], None) for index in range(count)]
+
+
+def issue_fields(item: Dict[str, Any], default_project_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Builds the `fields` of an issue to create from an item of a bulk request.
+
+    An item has a `summary` and optionally a `project_key`, an `issue_type` (Task by default), a
+    plain-text `description` and raw Jira `fields`, which take precedence.
+
+    Raises:
+        ValueError: If the item has no summary or no project.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each issue must be a JSON object.")
+    fields = dict(item.get("fields") or {})
+    project_key = item.get("project_key") or default_project_key
+    if "project" not in fields:
+        if not project_key:
+            raise ValueError("Missing project_key.")
+        fields["project"] = {"key": project_key}
+    if "summary" not in fields:
+        if not item.get("summary"):
+            raise ValueError("Missing summary.")
+        fields["summary"] = item["summary"]
+    fields.setdefault("issuetype", {"name": item.get("issue_type") or "Task"})
+    if item.get("description") and "description" not in fields:
+        # The v3 API only takes descriptions in the Atlassian Document Format
+        fields["description"] = {
+            "type": "doc",
+            "version": 1,
+            "content": [{"type": "paragraph", "content": [{"type": "text", "text": item["description"]}]}],
+        }
+    return fields
+
+
+def _create_chunk(chunk: List[Tuple[int, Dict[str, Any]]], concurrency: AdaptiveConcurrency) -> List[Dict[str, Any]]:
+    concurrency.acquire()
+    throttled = False
+    try:
+        response = _request(
+            "POST",
+            f"{JIRA_BASE_URL}/rest/api/3/issue/bulk",
+            json={"issueUpdates": [{"fields": fields} for _, fields in chunk]},
+            headers={"Accept": "application/json", "Content-Type": "application/json"},
+            auth=_auth
+        )
+        throttled = is_throttled(response)
+        outcomes = bulk_create_results(response, len(chunk))
+    except Exception as err:
+        logger.error(f"Bulk create of {len(chunk)} issues failed: {err}")
+        outcomes = [(None, str(err))] * len(chunk)
+    finally:
+        concurrency.release(throttled)
+    return [{"index": index, "key": key, "error": error} for (index, _), (key, error) in zip(chunk, outcomes)]
+
+
+def create_issues(
+    items: Iterable[Any],
+    default_project_key: Optional[str] = None,
+    workers: int = JIRA_BULK_WORKERS
+) -> List[Dict[str, Any]]:
+    """
+    Creates many issues with Jira's bulk create API, BULK_CREATE_SIZE issues per request.
+
+    Chunks are sent as soon as they are full, at most `workers` at once, and fewer while Jira signals
+    rate limiting. Items that are invalid or that Jira rejects fail on their own; the rest of their
+    chunk is still created.
+
+    Args:
+        items (Iterable[Any]): The issues to create, as described in `issue_fields`. Items that could not be parsed may be given as ValueError.
+        default_project_key (str, optional): The project of the items without a `project_key`.
+        workers (int): The maximum number of concurrent bulk create requests.
+
+    Returns:
+        List[Dict[str, Any]]: One result per item, in order: its `index`, the created `key` or None, and the `error` or None.
+    """
+    concurrency = AdaptiveConcurrency(workers)
+    results: List[Dict[str, Any]] = []
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        def submit(ready: List[Tuple[int, Dict[str, Any]]]):
+            # Bounds the parsed items held in memory while the chunks before them are being sent
+            while len(in_flight) >= 2 * max(1, workers):
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.remove(future)
+                    results.extend(future.result())
+            in_flight.add(executor.submit(_create_chunk, ready, concurrency))
+
+        for index, item in enumerate(items):
+            try:
+                if isinstance(item, ValueError):
+                    raise item
+                chunk.append((index, issue_fields(item, default_project_key)))
+            except ValueError as err:
+                results.append({"index": index, "key": None, "error": str(err)})
+                continue
+            if len(chunk) == BULK_CREATE_SIZE:
+                submit(chunk)
+                chunk = []
+        if chunk:
+            submit(chunk)
+        for future in in_flight:
+            results.extend(future.result())
+
+    results.sort(key=lambda result: result["index"])
+    created = sum(1 for result in results if result["key"])
+    logger.info(f"Bulk created {created} of {len(results)} issues.")
+    return results
@@ -0,0 +1,232 @@
+"""
+In-process metrics exposed in the Prometheus text format, and helpers to time spans and to dump
+payloads for debugging without paying for it when debug logging is off.
+
+The documentation tool ships its own copy in src/metrics.py, keep the two in step.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# Share of the payloads dumped when DEBUG logging is on; 0 never dumps them
+DEBUG_DUMP_SAMPLE_RATE = float(os.getenv("DEBUG_DUMP_SAMPLE_RATE", "0.01"))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Sequence[Tuple[str, Any]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "upstream_request_seconds", "Latency of requests to Jira and Confluence.", ("service", "operation", "outcome")
+)
+UPSTREAM_BYTES = REGISTRY.histogram(
+    "upstream_response_bytes", "Size of the responses of Jira and Confluence.", ("service", "operation"), BYTES_BUCKETS
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "upstream_retries_total", "Requests retried by the Atlassian transport.", ("host", "reason")
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by result.", ("cache", "result")
+)
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "rate_limit_wait_seconds", "Time requests waited for a token of the client-side rate limiter.", ("limiter", "host")
+)
+RATE_LIMIT_QUEUE_DEPTH = REGISTRY.gauge(
+    "rate_limit_queue_depth", "Requests currently waiting for a token of the client-side rate limiter.", ("limiter", "host")
+)
+COALESCED_REQUESTS = REGISTRY.counter(
+    "upstream_coalesced_requests_total", "GET requests served by an identical request already in flight.", ("host",)
+)
+
+
+def operation_of(url: str) -> str:
+    """Names the REST resource of a URL without its ids, e.g. issue.comment for /rest/api/3/issue/PLAT-1/comment."""
+    path = urlsplit(url).path
+    _, _, resource = path.partition("/rest/api/")
+    segments = [segment for segment in resource.split("/")[1:] if segment and not any(char.isdigit() for char in segment)]
+    return ".".join(segments[:2]) or "other"
+
+
+@contextmanager
+def span(service: str, operation: str) -> Iterator[Dict[str, Any]]:
+    """
+    Times a block into UPSTREAM_SECONDS, with outcome "error" if it raises.
+
+    The yielded dict can be given the `outcome` ("ok" by default) and the response `bytes`.
+    """
+    result: Dict[str, Any] = {"outcome": "ok"}
+    started = time.perf_counter()
+    try:
+        yield result
+    except BaseException:
+        result["outcome"] = "error"
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, service=service, operation=operation, outcome=result["outcome"])
+        if result.get("bytes") is not None:
+            UPSTREAM_BYTES.observe(result["bytes"], service=service, operation=operation)
+
+
+def debug_dump(logger: logging.Logger, message: str, payload: Callable[[], Any], sample_rate: float = DEBUG_DUMP_SAMPLE_RATE):
+    """
+    Logs `message` followed by the JSON of `payload()` at DEBUG, for a sample of the calls only.
+
+    `payload` is only called and serialized when the dump is actually logged.
+    """
+    if sample_rate <= 0 or not logger.isEnabledFor(logging.DEBUG) or random.random() >= sample_rate:
+        return
+    logger.debug(f"{message}: {json.dumps(payload(), indent=2, default=str)}")
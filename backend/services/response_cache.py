@@ -0,0 +1,291 @@
+import json
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from services.metrics import CACHE_REQUESTS
+from services.shared_state import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """An upstream load in progress, which concurrent callers of the same key wait for."""
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 256, name: str = "response"):
+        """
+        Short-lived in-memory cache of upstream responses with request coalescing.
+
+        Concurrent callers asking for the same key while it is being loaded wait for that single
+        load instead of starting their own. Failed loads are not cached.
+
+        Args:
+            ttl_seconds (float): How long a loaded value is served before it is loaded again.
+            max_entries (int): The maximum number of cached values; the least recently used are evicted first.
+            name (str): The `cache` label of the cache's lookups in the cache_requests_total metric.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.name = name
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        # Bumped by invalidate(), so that loads started before an invalidation are not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value of `key`, loading it with `loader` if it is missing or expired.
+
+        Args:
+            key (Hashable): The cache key, e.g. the endpoint and its parameters.
+            loader (Callable[[], Any]): Fetches the value from upstream.
+
+        Returns:
+            Any: The cached or freshly loaded value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+            CACHE_REQUESTS.inc(cache=self.name, result="miss" if leader else "coalesced")
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as err:
+            flight.error = err
+            raise
+        else:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, flight.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return flight.value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """Drops the cached values whose key matches `predicate`, or all of them."""
+        with self._lock:
+            self._generation += 1
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": len(self._entries)}
+
+
+def _freeze(value: Any) -> Any:
+    """Turns the lists of a decoded JSON key back into tuples, so that keys compare as they were given."""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class SQLiteResponseCache:
+    # How often a worker waiting for another worker's load checks whether the value is stored
+    POLL_SECONDS = 0.05
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int = 256, name: str = "response", lease_seconds: float = 30):
+        """
+        A ResponseCache kept in a SQLite file, shared by the worker processes of the machine.
+
+        A value loaded by one worker is served to all of them. Coalescing spans the workers too:
+        the worker that starts a load takes a lease on the key, and the others wait for its value
+        until the lease expires. Invalidation bumps a generation counter stored next to the values,
+        and a load only stores its value if the generation did not change meanwhile, so a load
+        racing an invalidation in another worker never brings a stale value back.
+
+        Keys must be JSON-serializable tuples; values are pickled.
+
+        Args:
+            path (str): The SQLite file shared by the workers.
+            ttl_seconds (float): How long a loaded value is served before it is loaded again.
+            max_entries (int): The maximum number of cached values; those expiring first are evicted first.
+            name (str): The `cache` label of the cache's lookups in the cache_requests_total metric.
+            lease_seconds (float): How long other workers wait for a load before starting their own.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self._flights: Dict[str, _Flight] = {}
+        # Guards the flights and the connection
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._connection = connect_sqlite(path)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS response_cache_by_expiry ON response_cache (expires_at)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS response_cache_leases (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS response_cache_generation (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)")
+            self._connection.execute("INSERT OR IGNORE INTO response_cache_generation (id, value) VALUES (0, 0)")
+
+    @staticmethod
+    def _encode(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def _read(self, encoded: str, now: float) -> Tuple[bool, Any]:
+        row = self._connection.execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?", (encoded, now)
+        ).fetchone()
+        return (True, pickle.loads(row[0])) if row else (False, None)
+
+    def _count(self, result: str):
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "miss":
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        CACHE_REQUESTS.inc(cache=self.name, result=result)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value of `key`, loading it with `loader` if no worker has it cached.
+
+        Args:
+            key (Hashable): The cache key, e.g. the endpoint and its parameters.
+            loader (Callable[[], Any]): Fetches the value from upstream.
+
+        Returns:
+            Any: The cached or freshly loaded value.
+        """
+        encoded = self._encode(key)
+        with self._lock:
+            found, value = self._read(encoded, time.time())
+            if not found:
+                flight = self._flights.get(encoded)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[encoded] = _Flight()
+        if found:
+            self._count("hit")
+            return value
+
+        if not leader:
+            self._count("coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value, loaded = self._load_shared(encoded, loader)
+            self._count("miss" if loaded else "coalesced")
+            return flight.value
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(encoded, None)
+            flight.done.set()
+
+    def _load_shared(self, encoded: str, loader: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Loads the value under a lease, or waits for the worker holding the lease. Returns the value and whether it was loaded here."""
+        while True:
+            with self._lock, self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                found, value = self._read(encoded, now)
+                if found:
+                    return value, False
+                lease = self._connection.execute(
+                    "SELECT expires_at FROM response_cache_leases WHERE key = ?", (encoded,)
+                ).fetchone()
+                if lease is None or lease[0] <= now:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO response_cache_leases (key, expires_at) VALUES (?, ?)", (encoded, now + self.lease_seconds)
+                    )
+                    generation = self._connection.execute("SELECT value FROM response_cache_generation").fetchone()[0]
+                    break
+            time.sleep(self.POLL_SECONDS)
+
+        try:
+            value = loader()
+        except BaseException:
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM response_cache_leases WHERE key = ?", (encoded,))
+            raise
+
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            if self._connection.execute("SELECT value FROM response_cache_generation").fetchone()[0] == generation:
+                now = time.time()
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (encoded, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + self.ttl_seconds)
+                )
+                self._evict(now)
+            self._connection.execute("DELETE FROM response_cache_leases WHERE key = ?", (encoded,))
+        return value, True
+
+    def _evict(self, now: float):
+        self._connection.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        excess = self._connection.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY expires_at LIMIT ?)", (excess,)
+            )
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """Drops the cached values whose key matches `predicate`, or all of them, in every worker."""
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute("UPDATE response_cache_generation SET value = value + 1")
+            if predicate is None:
+                self._connection.execute("DELETE FROM response_cache")
+                return
+            keys = [row[0] for row in self._connection.execute("SELECT key FROM response_cache") if predicate(_freeze(json.loads(row[0])))]
+            self._connection.executemany("DELETE FROM response_cache WHERE key = ?", [(key,) for key in keys])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM response_cache WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": entries}
@@ -0,0 +1,99 @@
+"""
+State shared by the worker processes of the backend when it runs with several workers on one machine:
+
+    SHARED_STATE_DIR=/var/lib/backend uvicorn main:app --workers 4
+
+Every SQLite store opens its file in WAL mode, so the workers read concurrently while one writes,
+and waits up to SQLITE_BUSY_TIMEOUT_SECONDS for the write lock instead of failing. Work that must
+not run in two workers at once is serialized with a ProcessLock (flock on a lock file).
+
+The documentation tool opens its stores the same way in src/shared_state.py.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers the threads of one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "10"))
+
+
+def state_path(env_name: str, filename: str, default: str = "") -> str:
+    """
+    Returns the path of a store: the `env_name` setting if set, else `filename` in SHARED_STATE_DIR if
+    that is set, else `default`.
+    """
+    explicit = os.getenv(env_name)
+    if explicit:
+        return explicit
+    shared_dir = os.getenv("SHARED_STATE_DIR")
+    if shared_dir:
+        os.makedirs(shared_dir, exist_ok=True)
+        return os.path.join(shared_dir, filename)
+    return default
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Opens a SQLite database to be shared by threads and, for a file, by worker processes."""
+    connection = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+    if path != ":memory:":
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent after a crash with NORMAL; only the last commits may be lost on power failure
+        connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class ProcessLock:
+    def __init__(self, path: Optional[str]):
+        """
+        A lock held by one thread of one process of the machine at a time.
+
+        Args:
+            path (str, optional): The lock file. Without one, the lock only covers the threads of this process.
+        """
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self.path is None or fcntl is None:
+            return True
+        try:
+            file = open(self.path, "a+")
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                file.close()
+                self._thread_lock.release()
+                return False
+            except OSError:
+                file.close()
+                raise
+        except OSError:
+            self._thread_lock.release()
+            raise
+        self._file = file
+        return True
+
+    def release(self):
+        file, self._file = self._file, None
+        if file is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            file.close()
+        self._thread_lock.release()
+
+    def __enter__(self) -> "ProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,588 @@
+"""
+Bidirectional synchronization of the issues of a project between two Jira instances.
+
+Each cycle asks both instances only for the issues updated since the previous cycle (watermark
+JQL), diffs them against the field values recorded at the last sync of each issue pair, and
+pushes just the changed fields to the other side. The first cycle scans both projects and pairs
+the issues that already exist on both sides by SYNC_SEED_MATCH_FIELD, so instances that already
+mirror each other are not duplicated. Issues without a counterpart are created there
+with the bulk create API. Writes run concurrently, and concurrency is halved whenever Jira signals
+rate limiting.
+"""
+import os
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from requests.auth import HTTPBasicAuth
+from dotenv import load_dotenv
+load_dotenv()
+from services.transport import get_transport
+from services.metrics import operation_of, span
+from services.shared_state import ProcessLock, connect_sqlite, state_path
+from services.jira_service import BULK_CREATE_SIZE, AdaptiveConcurrency, bulk_create_results, is_throttled
+
+logger = logging.getLogger(__name__)
+
+SYNC_LOCAL_PROJECT = os.getenv("SYNC_LOCAL_PROJECT")
+SYNC_REMOTE_BASE_URL = os.getenv("SYNC_REMOTE_BASE_URL")
+SYNC_REMOTE_EMAIL = os.getenv("SYNC_REMOTE_EMAIL")
+SYNC_REMOTE_API_TOKEN = os.getenv("SYNC_REMOTE_API_TOKEN")
+SYNC_REMOTE_PROJECT = os.getenv("SYNC_REMOTE_PROJECT")
+# Fields kept in sync; user fields are not, since accounts differ between instances
+SYNC_FIELDS = [field.strip() for field in os.getenv("SYNC_FIELDS", "summary,description,priority,labels,duedate").split(",") if field.strip()]
+SYNC_DB_PATH = state_path("SYNC_DB_PATH", "sync_state.db", "sync_state.db")
+SYNC_INTERVAL_SECONDS = float(os.getenv("SYNC_INTERVAL_SECONDS", "120"))
+SYNC_OVERLAP_MINUTES = int(os.getenv("SYNC_OVERLAP_MINUTES", "2"))
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "8"))
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "100"))
+# Issues that failed to sync are retried on later cycles, waiting twice as long after each failure
+SYNC_RETRY_LIMIT = int(os.getenv("SYNC_RETRY_LIMIT", "5"))
+SYNC_RETRY_BACKOFF_SECONDS = float(os.getenv("SYNC_RETRY_BACKOFF_SECONDS", str(SYNC_INTERVAL_SECONDS)))
+# The first cycle pairs existing issues whose value of this field is the same and unique on both sides,
+# e.g. the summary or a custom field holding the key of the counterpart
+SYNC_SEED_MATCH_FIELD = os.getenv("SYNC_SEED_MATCH_FIELD", "summary")
+# Whether the first cycle creates counterparts of the issues it could not pair; otherwise they are
+# created once they change
+SYNC_SEED_CREATE_MISSING = os.getenv("SYNC_SEED_CREATE_MISSING", "false").lower() == "true"
+
+LOCAL = "local"
+REMOTE = "remote"
+
+
+def normalize_field(value: Any) -> Any:
+    """Reduces a field value to what can be written to another instance, e.g. a priority to its name."""
+    if isinstance(value, dict):
+        if "accountId" in value:
+            return None
+        for reference in ("name", "value"):
+            if reference in value and "type" not in value:
+                return {reference: value[reference]}
+    if isinstance(value, list):
+        return [normalize_field(item) for item in value]
+    return value
+
+
+class JiraInstance:
+    def __init__(self, name: str, base_url: str, email: str, api_token: str, project_key: str):
+        """
+        One side of the synchronization: a Jira site and the project synchronized on it.
+
+        Args:
+            name (str): LOCAL or REMOTE.
+            base_url (str): The base URL of the Jira site.
+            email (str): The user of the API token.
+            api_token (str): The API token.
+            project_key (str): The key of the synchronized project.
+        """
+        self.name = name
+        self.base_url = base_url
+        self.auth = HTTPBasicAuth(email, api_token)
+        self.project_key = project_key
+
+    def request(self, method: str, path: str, **kwargs):
+        headers = {"Accept": "application/json"}
+        if "json" in kwargs:
+            headers["Content-Type"] = "application/json"
+        url = f"{self.base_url}{path}"
+        with span(f"jira-{self.name}", operation_of(url)) as result:
+            response = get_transport().request(method, url, headers=headers, auth=self.auth, **kwargs)
+            result["outcome"] = f"{response.status_code // 100}xx"
+            result["bytes"] = len(response.content)
+        return response
+
+    def iter_issues(self, jql: str, fields: List[str]) -> Iterator[Dict[str, Any]]:
+        """Yields the issues matching `jql` with the given fields, page by page."""
+        next_page_token = None
+        while True:
+            params = {"jql": jql, "fields": ",".join(fields), "maxResults": SYNC_PAGE_SIZE}
+            if next_page_token:
+                params["nextPageToken"] = next_page_token
+            response = self.request("GET", "/rest/api/3/search/jql", params=params)
+            response.raise_for_status()
+            data = response.json()
+            yield from data.get("issues", [])
+            next_page_token = data.get("nextPageToken")
+            if not next_page_token:
+                return
+
+    def bulk_create(self, issue_fields: List[Dict[str, Any]]):
+        """Creates up to BULK_CREATE_SIZE issues with one request; see `bulk_create_results` for its outcome."""
+        return self.request("POST", "/rest/api/3/issue/bulk", json={"issueUpdates": [{"fields": fields} for fields in issue_fields]})
+
+    def update(self, key: str, fields: Dict[str, Any]):
+        return self.request("PUT", f"/rest/api/3/issue/{key}", json={"fields": fields}, params={"notifyUsers": "false"})
+
+
+def parse_updated(updated: str) -> datetime:
+    """Parses Jira's `updated` timestamp, e.g. 2024-05-01T10:00:00.000+0200."""
+    try:
+        return datetime.strptime(updated, "%Y-%m-%dT%H:%M:%S.%f%z")
+    except (TypeError, ValueError):
+        return datetime.min.replace(tzinfo=timezone.utc)
+
+
+class SyncStore:
+    """Persists the issue pairs with their last synchronized field values, the watermark of each instance and the issues to retry."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = connect_sqlite(path)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS issue_pairs (
+                    local_key TEXT PRIMARY KEY,
+                    remote_key TEXT NOT NULL UNIQUE,
+                    fields TEXT NOT NULL,
+                    synced_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    instance TEXT PRIMARY KEY,
+                    last_sync REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS failed_issues (
+                    instance TEXT NOT NULL,
+                    issue_key TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    retry_at REAL NOT NULL,
+                    PRIMARY KEY (instance, issue_key)
+                )
+                """
+            )
+
+    def watermark(self, instance: str) -> Optional[float]:
+        with self._lock:
+            row = self._connection.execute("SELECT last_sync FROM watermarks WHERE instance = ?", (instance,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, instance: str, last_sync: float):
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO watermarks (instance, last_sync) VALUES (?, ?)", (instance, last_sync))
+
+    def pairs(self, instance: str, keys: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Returns the counterpart key and last synchronized fields of each of the `keys` of `instance` that is paired."""
+        column, other = ("local_key", "remote_key") if instance == LOCAL else ("remote_key", "local_key")
+        found = {}
+        with self._lock:
+            # Stay below SQLite's limit of host parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT {column}, {other}, fields FROM issue_pairs WHERE {column} IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update((row[0], (row[1], json.loads(row[2]))) for row in rows)
+        return found
+
+    def save_pairs(self, pairs: List[Tuple[str, str, Dict[str, Any]]], synced_at: float):
+        """Upserts (local_key, remote_key, fields) pairs."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO issue_pairs (local_key, remote_key, fields, synced_at) VALUES (?, ?, ?, ?)",
+                [(local_key, remote_key, json.dumps(fields), synced_at) for local_key, remote_key, fields in pairs]
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM issue_pairs").fetchone()[0]
+
+    def record_failures(self, failures: List[Tuple[str, str]], now: float):
+        """Records (instance, key) issues that failed to sync, to be retried after an exponential backoff."""
+        with self._lock, self._connection:
+            for instance, key in failures:
+                row = self._connection.execute(
+                    "SELECT attempts FROM failed_issues WHERE instance = ? AND issue_key = ?", (instance, key)
+                ).fetchone()
+                attempts = (row[0] if row else 0) + 1
+                retry_at = now + SYNC_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO failed_issues (instance, issue_key, attempts, retry_at) VALUES (?, ?, ?, ?)",
+                    (instance, key, attempts, retry_at)
+                )
+                if attempts == SYNC_RETRY_LIMIT:
+                    logger.error(f"Sync: giving up on {key} of {instance} after {attempts} failed attempts.")
+
+    def clear_failures(self, instance: str, keys: List[str]):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM failed_issues WHERE instance = ? AND issue_key = ?", [(instance, key) for key in keys]
+            )
+
+    def due_failures(self, instance: str, now: float) -> List[str]:
+        """Returns the failed issues of `instance` whose backoff has elapsed and that have attempts left."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT issue_key FROM failed_issues WHERE instance = ? AND retry_at <= ? AND attempts < ?",
+                (instance, now, SYNC_RETRY_LIMIT)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def failure_count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM failed_issues").fetchone()[0]
+
+
+class SyncEngine:
+    def __init__(
+        self,
+        local: JiraInstance,
+        remote: JiraInstance,
+        store: SyncStore,
+        fields: List[str] = SYNC_FIELDS,
+        workers: int = SYNC_WORKERS,
+        seed_match_field: str = SYNC_SEED_MATCH_FIELD,
+        seed_create_missing: bool = SYNC_SEED_CREATE_MISSING
+    ):
+        """
+        Keeps the issues of a project on two Jira instances in sync.
+
+        Args:
+            local (JiraInstance): The instance this backend serves.
+            remote (JiraInstance): The instance it is synchronized with.
+            store (SyncStore): The issue pairs and watermarks.
+            fields (List[str]): The synchronized fields.
+            workers (int): The maximum number of concurrent writes.
+            seed_match_field (str): The field the first cycle pairs existing issues on.
+            seed_create_missing (bool): Whether the first cycle creates counterparts of the issues it could not pair.
+        """
+        self.instances = {LOCAL: local, REMOTE: remote}
+        self.store = store
+        self.fields = fields
+        self.workers = workers
+        self.seed_match_field = seed_match_field
+        self.seed_create_missing = seed_create_missing
+        self.concurrency = AdaptiveConcurrency(workers)
+        self.last_stats: Dict[str, Any] = {}
+        # Cycles of several backend workers sharing the store must not run at the same time, or they
+        # would create the same counterparts twice; only one worker runs the periodic cycles
+        lock_path = None if store.path == ":memory:" else store.path
+        self._cycle_lock = ProcessLock(f"{lock_path}.lock" if lock_path else None)
+        self._leader_lock = ProcessLock(f"{lock_path}.leader" if lock_path else None)
+
+    def _changed_issues_jql(self, instance: JiraInstance, last_sync: Optional[float], now: float) -> str:
+        jql = f'project = "{instance.project_key}"'
+        if last_sync is not None:
+            # Relative dates do not depend on the time zone of the Jira user
+            minutes = math.ceil((now - last_sync) / 60) + SYNC_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+        return jql + " ORDER BY updated ASC"
+
+    def _fetch(self, instance: JiraInstance, jql: str) -> Dict[str, Dict[str, Any]]:
+        """Returns the normalized synchronized fields, issue type and update time of the issues matching `jql`, by key."""
+        issues = {}
+        for issue in instance.iter_issues(jql, list(dict.fromkeys([*self.fields, "issuetype", "updated", self.seed_match_field]))):
+            fields = issue.get("fields", {})
+            issues[issue["key"]] = {
+                "fields": {name: normalize_field(fields.get(name)) for name in self.fields},
+                "issuetype": (fields.get("issuetype") or {}).get("name", "Task"),
+                "updated": fields.get("updated", ""),
+                "match": normalize_field(fields.get(self.seed_match_field)),
+            }
+        return issues
+
+    def _seeded(self) -> bool:
+        return any(self.store.watermark(name) is not None for name in self.instances)
+
+    def seed(self, local_issues: Dict[str, Dict[str, Any]], remote_issues: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        Pairs the issues that exist on both instances before the first cycle, by their seed match field.
+
+        A pair is only made when the value is the same and unique on both sides; the fields that
+        already agree are recorded as synchronized, the others are reconciled like a conflict.
+
+        Returns:
+            Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]: The local and remote issues the first cycle
+                reconciles: the paired ones, and the unpaired ones only if SYNC_SEED_CREATE_MISSING is set.
+        """
+        def by_match(issues: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[str]]:
+            keys: Dict[str, Optional[str]] = {}
+            for key, issue in issues.items():
+                match = issue["match"]
+                if match in (None, "", []):
+                    continue
+                value = match.strip().casefold() if isinstance(match, str) else json.dumps(match, sort_keys=True)
+                # None marks a value shared by several issues, which cannot be paired
+                keys[value] = None if value in keys else key
+            return keys
+
+        local_by_match, remote_by_match = by_match(local_issues), by_match(remote_issues)
+        pairs = []
+        for match, local_key in local_by_match.items():
+            remote_key = remote_by_match.get(match)
+            if local_key is None or remote_key is None:
+                continue
+            local_fields, remote_fields = local_issues[local_key]["fields"], remote_issues[remote_key]["fields"]
+            pairs.append((local_key, remote_key, {name: value for name, value in local_fields.items() if remote_fields.get(name) == value}))
+        self.store.save_pairs(pairs, time.time())
+
+        unpaired = {LOCAL: len(local_issues) - len(pairs), REMOTE: len(remote_issues) - len(pairs)}
+        logger.info(f"Sync: paired {len(pairs)} existing issues by {self.seed_match_field}, {unpaired} left unpaired.")
+        if self.seed_create_missing:
+            return local_issues, remote_issues
+        paired_local = {local_key for local_key, _, _ in pairs}
+        paired_remote = {remote_key for _, remote_key, _ in pairs}
+        return (
+            {key: issue for key, issue in local_issues.items() if key in paired_local},
+            {key: issue for key, issue in remote_issues.items() if key in paired_remote},
+        )
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Runs one synchronization cycle over the issues updated on either side since the previous cycle.
+
+        The first cycle has no watermarks: it scans both projects and pairs the issues that exist on
+        both sides with `seed` before reconciling them. The watermarks always advance; the issues that failed are kept in the store and retried by later cycles
+        with `sync_keys`, up to SYNC_RETRY_LIMIT attempts.
+
+        Returns:
+            Dict[str, Any]: Counts of the fetched, created, updated, failed and retried issues, and the cycle's duration.
+        """
+        with self._cycle_lock:
+            started = time.time()
+            seeding = not self._seeded()
+            changes = {}
+            for name, instance in self.instances.items():
+                jql = self._changed_issues_jql(instance, self.store.watermark(name), started)
+                changes[name] = self._fetch(instance, jql)
+                logger.info(f"Sync: {len(changes[name])} changed issues on {name} ({jql}).")
+
+            local_changes, remote_changes = changes[LOCAL], changes[REMOTE]
+            if seeding:
+                local_changes, remote_changes = self.seed(local_changes, remote_changes)
+            stats = self.reconcile(local_changes, remote_changes)
+            for name in self.instances:
+                self.store.set_watermark(name, started)
+
+            retries = {name: self.store.due_failures(name, time.time()) for name in self.instances}
+            stats["retried"] = sum(len(keys) for keys in retries.values())
+            if stats["retried"]:
+                retry_stats = self._sync_keys(retries[LOCAL], retries[REMOTE])
+                for outcome in ("created", "updated", "unchanged", "failed"):
+                    stats[outcome] += retry_stats[outcome]
+            stats["fetched"] = {name: len(issues) for name, issues in changes.items()}
+            stats["seconds"] = round(time.time() - started, 3)
+            self.last_stats = stats
+            logger.info(f"Sync cycle done: {stats}")
+            return stats
+
+    def sync_keys(self, local_keys: List[str] = (), remote_keys: List[str] = ()) -> Dict[str, Any]:
+        """Synchronizes the given issues right away, e.g. on a webhook event, without moving the watermarks."""
+        with self._cycle_lock:
+            return self._sync_keys(local_keys, remote_keys)
+
+    def _sync_keys(self, local_keys: List[str], remote_keys: List[str]) -> Dict[str, Any]:
+        if not self._seeded():
+            # The first cycle scans every issue anyway, and pairs them before anything is created
+            logger.info("Sync: skipping issues to sync before the first cycle.")
+            return {"created": 0, "updated": 0, "unchanged": 0, "failed": 0}
+        changes = {}
+        for name, keys in ((LOCAL, local_keys), (REMOTE, remote_keys)):
+            # Keys of other projects would make the JQL fail
+            keys = [key for key in keys if key.rsplit("-", 1)[0] == self.instances[name].project_key]
+            changes[name] = {}
+            for start in range(0, len(keys), SYNC_PAGE_SIZE):
+                chunk = keys[start:start + SYNC_PAGE_SIZE]
+                jql = f'project = "{self.instances[name].project_key}" AND key in ({",".join(chunk)})'
+                changes[name].update(self._fetch(self.instances[name], jql))
+        # Issues that no longer exist in the project have nothing left to retry
+        self.store.clear_failures(LOCAL, [key for key in local_keys if key not in changes[LOCAL]])
+        self.store.clear_failures(REMOTE, [key for key in remote_keys if key not in changes[REMOTE]])
+        return self.reconcile(changes[LOCAL], changes[REMOTE])
+
+    def reconcile(self, local_changes: Dict[str, Dict[str, Any]], remote_changes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Diffs the changed issues of both instances against their last synchronized values and pushes the differences.
+
+        A field changed on both sides since the last sync takes the value of the side updated last.
+        The issues that failed are recorded in the store for a later retry, the others are cleared from it.
+
+        Returns:
+            Dict[str, Any]: Counts of the created, updated, unchanged and failed issues.
+        """
+        local_pairs = self.store.pairs(LOCAL, list(local_changes))
+        remote_pairs = self.store.pairs(REMOTE, list(remote_changes))
+
+        creates = {LOCAL: [], REMOTE: []}  # target -> [(source key, issue)]
+        updates = []                       # (local_key, remote_key, local fields, remote fields, synced fields)
+        seen_pairs = set()
+
+        for local_key, issue in local_changes.items():
+            if local_key not in local_pairs:
+                creates[REMOTE].append((local_key, issue))
+                continue
+            remote_key, synced = local_pairs[local_key]
+            seen_pairs.add((local_key, remote_key))
+            updates.append((local_key, remote_key, issue, remote_changes.get(remote_key), synced))
+        for remote_key, issue in remote_changes.items():
+            if remote_key not in remote_pairs:
+                creates[LOCAL].append((remote_key, issue))
+                continue
+            local_key, synced = remote_pairs[remote_key]
+            if (local_key, remote_key) not in seen_pairs:
+                updates.append((local_key, remote_key, None, issue, synced))
+
+        stats = {"created": 0, "updated": 0, "unchanged": 0, "failed": 0}
+        synced_at = time.time()
+        pushes = []      # (target, key, changed fields)
+        new_pairs = []   # (local_key, remote_key, fields)
+        for local_key, remote_key, local_issue, remote_issue, synced in updates:
+            local_diff = self._diff(local_issue, synced)
+            remote_diff = self._diff(remote_issue, synced)
+            for name in set(local_diff) & set(remote_diff):
+                if local_diff[name] == remote_diff[name]:
+                    continue
+                # Conflict: the side updated last wins
+                if parse_updated(local_issue["updated"]) >= parse_updated(remote_issue["updated"]):
+                    del remote_diff[name]
+                else:
+                    del local_diff[name]
+            remote_push = {name: value for name, value in local_diff.items() if remote_diff.get(name) != value}
+            local_push = {name: value for name, value in remote_diff.items() if local_diff.get(name) != value}
+            if not remote_push and not local_push:
+                stats["unchanged"] += 1
+                continue
+            if remote_push:
+                pushes.append((REMOTE, remote_key, remote_push))
+            if local_push:
+                pushes.append((LOCAL, local_key, local_push))
+            new_pairs.append((local_key, remote_key, {**synced, **local_diff, **remote_diff}))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            update_results = list(executor.map(lambda push: self._push_update(*push), pushes))
+            create_results = {
+                target: list(executor.map(lambda chunk, target=target: self._push_creates(target, chunk), self._chunks(pending)))
+                for target, pending in creates.items()
+            }
+
+        failed_keys = {key for (target, key, _), ok in zip(pushes, update_results) if not ok}
+        failures = []  # (instance, key)
+        for local_key, remote_key, fields in new_pairs:
+            if local_key in failed_keys or remote_key in failed_keys:
+                stats["failed"] += 1
+                failures.extend([(LOCAL, local_key), (REMOTE, remote_key)])
+            else:
+                stats["updated"] += 1
+        new_pairs = [pair for pair in new_pairs if pair[0] not in failed_keys and pair[1] not in failed_keys]
+
+        for target, chunk_results in create_results.items():
+            for created in chunk_results:
+                for source_key, target_key, fields in created:
+                    if target_key is None:
+                        stats["failed"] += 1
+                        failures.append((LOCAL if target == REMOTE else REMOTE, source_key))
+                        continue
+                    stats["created"] += 1
+                    pair = (source_key, target_key) if target == REMOTE else (target_key, source_key)
+                    new_pairs.append((*pair, fields))
+
+        self.store.save_pairs(new_pairs, synced_at)
+        self.store.record_failures(failures, synced_at)
+        failed = set(failures)
+        for name, changed in ((LOCAL, local_changes), (REMOTE, remote_changes)):
+            self.store.clear_failures(name, [key for key in changed if (name, key) not in failed])
+        return stats
+
+    def _diff(self, issue: Optional[Dict[str, Any]], synced: Dict[str, Any]) -> Dict[str, Any]:
+        if issue is None:
+            return {}
+        return {name: value for name, value in issue["fields"].items() if synced.get(name) != value}
+
+    @staticmethod
+    def _chunks(items: List[Any]) -> List[List[Any]]:
+        return [items[start:start + BULK_CREATE_SIZE] for start in range(0, len(items), BULK_CREATE_SIZE)]
+
+    def _push_update(self, target: str, key: str, fields: Dict[str, Any]) -> bool:
+        self.concurrency.acquire()
+        throttled = False
+        try:
+            response = self.instances[target].update(key, fields)
+            throttled = is_throttled(response)
+            response.raise_for_status()
+            return True
+        except Exception as err:
+            logger.error(f"Sync: failed to update {key} on {target} ({sorted(fields)}): {err}")
+            return False
+        finally:
+            self.concurrency.release(throttled)
+
+    def _push_creates(self, target: str, chunk: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Optional[str], Dict[str, Any]]]:
+        """Creates the counterparts of a chunk of issues on `target`; returns (source key, created key or None, fields)."""
+        instance = self.instances[target]
+        issue_fields = []
+        for _, issue in chunk:
+            fields = {name: value for name, value in issue["fields"].items() if value is not None}
+            issue_fields.append({**fields, "project": {"key": instance.project_key}, "issuetype": {"name": issue["issuetype"]}})
+
+        self.concurrency.acquire()
+        throttled = False
+        try:
+            response = instance.bulk_create(issue_fields)
+            throttled = is_throttled(response)
+            results = bulk_create_results(response, len(issue_fields))
+        except Exception as err:
+            logger.error(f"Sync: bulk create of {len(chunk)} issues on {target} failed: {err}")
+            results = [(None, str(err))] * len(chunk)
+        finally:
+            self.concurrency.release(throttled)
+
+        created = []
+        for (source_key, issue), (target_key, error) in zip(chunk, results):
+            if error:
+                logger.error(f"Sync: failed to create the counterpart of {source_key} on {target}: {error}")
+            created.append((source_key, target_key, issue["fields"]))
+        return created
+
+    def run_forever(self, stop: threading.Event, interval_seconds: float = SYNC_INTERVAL_SECONDS):
+        """
+        Runs a cycle every `interval_seconds` until `stop` is set.
+
+        Of several workers sharing the store, only the first to get here runs the cycles; the
+        others stand by and take over when it exits.
+        """
+        while not self._leader_lock.acquire(blocking=False):
+            if stop.wait(interval_seconds):
+                return
+        logger.info(f"Running the periodic sync cycles in process {os.getpid()}.")
+        try:
+            while not stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as err:
+                    logger.exception(f"Sync cycle failed: {err}")
+                stop.wait(interval_seconds)
+        finally:
+            self._leader_lock.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pairs": self.store.count(),
+            "watermarks": {name: self.store.watermark(name) for name in self.instances},
+            "failed_issues": self.store.failure_count(),
+            "concurrency": self.concurrency.limit,
+            "last_cycle": self.last_stats,
+        }
+
+
+def sync_configured() -> bool:
+    return all([SYNC_LOCAL_PROJECT, SYNC_REMOTE_BASE_URL, SYNC_REMOTE_EMAIL, SYNC_REMOTE_API_TOKEN, SYNC_REMOTE_PROJECT])
+
+
+def build_sync_engine() -> SyncEngine:
+    """Builds the engine between the backend's Jira site (JIRA_*) and the remote site (SYNC_REMOTE_*)."""
+    local = JiraInstance(LOCAL, os.getenv("JIRA_BASE_URL"), os.getenv("JIRA_EMAIL"), os.getenv("JIRA_API_TOKEN"), SYNC_LOCAL_PROJECT)
+    remote = JiraInstance(REMOTE, SYNC_REMOTE_BASE_URL, SYNC_REMOTE_EMAIL, SYNC_REMOTE_API_TOKEN, SYNC_REMOTE_PROJECT)
+    return SyncEngine(local, remote, SyncStore(SYNC_DB_PATH))
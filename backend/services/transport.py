@@ -0,0 +1,193 @@
+"""
+The blocking HTTP transport used for every request to Atlassian: pooled sessions, rate limiting,
+coalesced GETs and retries with backoff. The documentation tool has the asyncio equivalent in
+src/transport.py; the retry policy of the two should stay the same.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.metrics import UPSTREAM_RETRIES
+from services.ratelimit import ATLASSIAN_COALESCE_GETS, ATLASSIAN_RATE_LIMITER, RateLimiter, SingleFlight, coalescing_key, credential_of
+
+logger = logging.getLogger(__name__)
+
+# Connection pool and retry settings, shared by every Atlassian client in the process
+ATLASSIAN_POOL_SIZE = int(os.getenv("ATLASSIAN_POOL_SIZE", "20"))
+ATLASSIAN_CONNECT_TIMEOUT = float(os.getenv("ATLASSIAN_CONNECT_TIMEOUT", "5"))
+ATLASSIAN_READ_TIMEOUT = float(os.getenv("ATLASSIAN_READ_TIMEOUT", "60"))
+ATLASSIAN_MAX_RETRIES = int(os.getenv("ATLASSIAN_MAX_RETRIES", "4"))
+ATLASSIAN_BACKOFF_FACTOR = float(os.getenv("ATLASSIAN_BACKOFF_FACTOR", "0.5"))
+ATLASSIAN_MAX_BACKOFF = float(os.getenv("ATLASSIAN_MAX_BACKOFF", "30"))
+
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Returns the delay requested by a `Retry-After` header (seconds or HTTP date), if any."""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AtlassianTransport:
+    def __init__(
+        self,
+        pool_size: int = ATLASSIAN_POOL_SIZE,
+        connect_timeout: float = ATLASSIAN_CONNECT_TIMEOUT,
+        read_timeout: float = ATLASSIAN_READ_TIMEOUT,
+        max_retries: int = ATLASSIAN_MAX_RETRIES,
+        backoff_factor: float = ATLASSIAN_BACKOFF_FACTOR,
+        max_backoff: float = ATLASSIAN_MAX_BACKOFF,
+        rate_limiter: Optional[RateLimiter] = None,
+        coalesce_gets: bool = ATLASSIAN_COALESCE_GETS
+    ):
+        """
+        Keeps one pooled keep-alive session per Atlassian host, rate limits and retries throttled requests
+        and coalesces identical concurrent GETs.
+
+        Args:
+            pool_size (int): The maximum number of open connections per host.
+            connect_timeout (float): Seconds to wait for a connection to be established.
+            read_timeout (float): Seconds to wait for the server to send a response.
+            max_retries (int): How often a throttled or failed request is retried.
+            backoff_factor (float): Base of the exponential backoff between retries, in seconds.
+            max_backoff (float): Upper bound of a single backoff, in seconds.
+            rate_limiter (RateLimiter, optional): The token buckets every attempt draws from; defaults to
+                the process-wide ATLASSIAN_RATE_LIMITER.
+            coalesce_gets (bool): Whether identical concurrent GETs share one request.
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter or ATLASSIAN_RATE_LIMITER
+        self.coalesce_gets = coalesce_gets
+        self._single_flight = SingleFlight()
+        self._sessions: Dict[Tuple[str, str], requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        """Returns the pooled session of the host `url` points to, creating it on first use."""
+        parts = urlsplit(url)
+        host = (parts.scheme, parts.netloc)
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                # Retries are handled in `request` so that Retry-After is honored for every method
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True, max_retries=0)
+                session.mount(f"{parts.scheme}://", adapter)
+                session.headers.update({"Connection": "keep-alive"})
+                self._sessions[host] = session
+                logger.debug(f"Opened connection pool for {parts.netloc} (size {self.pool_size}).")
+            return session
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, delay)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request over the pooled session of the target host.
+
+        Every attempt first takes a token from the rate limiter bucket of the host and credential.
+        Responses with a status in RETRY_STATUS_CODES are retried with exponential backoff,
+        waiting at least as long as the server's `Retry-After` asks for; a 429 also pauses the
+        bucket, so other requests to the host hold back too. Connection errors are only retried
+        for idempotent methods. The last response is returned as is, so callers keep using
+        `raise_for_status`.
+
+        An identical GET already in flight is waited for instead of sent again, and its response
+        is shared, so callers must not consume it as a stream.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The full URL to send the request to.
+            **kwargs: Passed on to `requests.Session.request` (params, json, headers, auth, ...).
+
+        Returns:
+            requests.Response: The final response.
+        """
+        method = method.upper()
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        credential = credential_of(kwargs.get("auth"), kwargs.get("headers"))
+        key = coalescing_key(method, url, credential, kwargs) if self.coalesce_gets else None
+        if key is None:
+            return self._send(method, url, host, credential, **kwargs)
+        return self._single_flight.do(key, lambda: self._send(method, url, host, credential, **kwargs), host=host)
+
+    def _send(self, method: str, url: str, host: str, credential: str, **kwargs) -> requests.Response:
+        session = self.session_for(url)
+
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(host, credential)
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+                if attempt >= self.max_retries or method not in IDEMPOTENT_METHODS:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed ({err}), retrying in {delay:.2f}s.")
+                UPSTREAM_RETRIES.inc(host=host, reason="connection")
+            else:
+                retryable = response.status_code == 429 or (
+                    response.status_code in RETRY_STATUS_CODES and method in IDEMPOTENT_METHODS
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                retry_after = retry_after_seconds(response)
+                delay = max(retry_after or 0.0, self._backoff(attempt))
+                if response.status_code == 429:
+                    self.rate_limiter.pause(host, credential, retry_after or delay)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s.")
+                UPSTREAM_RETRIES.inc(host=host, reason=str(response.status_code))
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_default_transport: Optional[AtlassianTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_transport() -> AtlassianTransport:
+    """Returns the process-wide transport shared by all Atlassian clients."""
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = AtlassianTransport()
+    return _default_transport
@@ -0,0 +1,242 @@
+"""
+Ingestion of Jira webhooks.
+
+Deliveries are validated and deduplicated, then coalesced per issue: the changes an issue receives
+within the debounce window are merged into one IssueChange. Flushed changes are put on an internal
+queue as batches and handed to every subscribed consumer, e.g. the sync engine.
+"""
+import os
+import hmac
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+JIRA_WEBHOOK_SECRET = os.getenv("JIRA_WEBHOOK_SECRET")
+# Without a secret, deliveries are rejected unless unsigned ones are explicitly allowed, e.g. on a private network
+JIRA_WEBHOOK_ALLOW_UNSIGNED = os.getenv("JIRA_WEBHOOK_ALLOW_UNSIGNED", "false").lower() == "true"
+WEBHOOK_DEBOUNCE_SECONDS = float(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", "5"))
+# An issue that keeps changing is still flushed after this long
+WEBHOOK_MAX_DELAY_SECONDS = float(os.getenv("WEBHOOK_MAX_DELAY_SECONDS", "30"))
+WEBHOOK_DEDUP_SECONDS = float(os.getenv("WEBHOOK_DEDUP_SECONDS", "3600"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+SUPPORTED_EVENTS = frozenset({"jira:issue_updated", "comment_created"})
+# Changelog fields that move an issue between epics
+EPIC_LINK_FIELDS = frozenset({"Epic Link", "Parent", "parent", "IssueParentAssociation"})
+
+
+@dataclass
+class IssueChange:
+    issue_key: str
+    # The site the event comes from, taken from the issue's `self` URL
+    base_url: str
+    events: Set[str] = field(default_factory=set)
+    changed_fields: Set[str] = field(default_factory=set)
+    # The epics the issue belongs or belonged to, or its own key if it is an epic
+    epic_keys: Set[str] = field(default_factory=set)
+    epic_membership_changed: bool = False
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+
+    def merge(self, other: "IssueChange"):
+        self.events |= other.events
+        self.changed_fields |= other.changed_fields
+        self.epic_keys |= other.epic_keys
+        self.epic_membership_changed = self.epic_membership_changed or other.epic_membership_changed
+        self.last_seen = other.last_seen
+
+
+def verify_signature(
+    body: bytes,
+    signature: Optional[str],
+    secret: Optional[str],
+    allow_unsigned: bool = JIRA_WEBHOOK_ALLOW_UNSIGNED
+) -> bool:
+    """
+    Checks the `X-Hub-Signature` header (`sha256=<hex HMAC of the body>`) Jira sends for webhooks registered with a secret.
+
+    Without a secret, every delivery is rejected, or accepted if `allow_unsigned` is set.
+    """
+    if not secret:
+        return allow_unsigned
+    if not signature or "=" not in signature:
+        return False
+    method, _, digest = signature.partition("=")
+    if method != "sha256":
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+def delivery_id(payload: Dict[str, Any], identifier: Optional[str] = None) -> str:
+    """Returns the identity of a delivery: Jira's X-Atlassian-Webhook-Identifier, which retries keep, or a hash of the event."""
+    if identifier:
+        return identifier
+    comment_id = (payload.get("comment") or {}).get("id", "")
+    fingerprint = f"{payload.get('webhookEvent')}|{(payload.get('issue') or {}).get('key')}|{payload.get('timestamp')}|{comment_id}"
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def parse_event(payload: Dict[str, Any], now: Optional[float] = None) -> Optional[IssueChange]:
+    """Returns the IssueChange described by a webhook payload, or None if it is not a supported issue event."""
+    event = payload.get("webhookEvent")
+    issue = payload.get("issue") or {}
+    if event not in SUPPORTED_EVENTS or not issue.get("key"):
+        return None
+    now = now if now is not None else time.time()
+    self_url = issue.get("self", "")
+    change = IssueChange(
+        issue_key=issue["key"],
+        base_url=self_url.split("/rest/", 1)[0],
+        events={event},
+        first_seen=now,
+        last_seen=now,
+    )
+
+    fields = issue.get("fields") or {}
+    if ((fields.get("issuetype") or {}).get("name") or "").lower() == "epic":
+        change.epic_keys.add(issue["key"])
+    parent = fields.get("parent") or {}
+    if parent.get("key"):
+        change.epic_keys.add(parent["key"])
+
+    for item in (payload.get("changelog") or {}).get("items", []):
+        change.changed_fields.add(item.get("field", ""))
+        if item.get("field") in EPIC_LINK_FIELDS:
+            change.epic_membership_changed = True
+            change.epic_keys.update(key for key in (item.get("fromString"), item.get("toString")) if key)
+    return change
+
+
+class WebhookIngestor:
+    def __init__(
+        self,
+        debounce_seconds: float = WEBHOOK_DEBOUNCE_SECONDS,
+        max_delay_seconds: float = WEBHOOK_MAX_DELAY_SECONDS,
+        dedup_seconds: float = WEBHOOK_DEDUP_SECONDS,
+        queue_size: int = WEBHOOK_QUEUE_SIZE
+    ):
+        """
+        Coalesces webhook deliveries per issue and dispatches them to the subscribed consumers.
+
+        Args:
+            debounce_seconds (float): An issue is flushed once it received no event for this long.
+            max_delay_seconds (float): An issue is flushed at the latest this long after its first pending event.
+            dedup_seconds (float): How long delivery identifiers are remembered to drop redeliveries.
+            queue_size (int): The maximum number of flushed batches waiting for the consumers.
+        """
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.dedup_seconds = dedup_seconds
+        self.queue: "queue.Queue[Optional[List[IssueChange]]]" = queue.Queue(maxsize=queue_size)
+        self._consumers: List[Callable[[List[IssueChange]], None]] = []
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._pending: Dict[str, IssueChange] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.stats = {"received": 0, "duplicates": 0, "ignored": 0, "coalesced": 0, "dispatched": 0, "dropped": 0}
+
+    def subscribe(self, consumer: Callable[[List[IssueChange]], None]):
+        """Registers a consumer, called from the dispatcher thread with each batch of flushed changes."""
+        self._consumers.append(consumer)
+
+    def accept(self, payload: Dict[str, Any], identifier: Optional[str] = None) -> str:
+        """
+        Takes in a validated delivery.
+
+        Returns:
+            str: "queued", "coalesced" (merged into a pending change of the same issue), "duplicate" or "ignored".
+        """
+        now = time.time()
+        change = parse_event(payload, now)
+        with self._lock:
+            self.stats["received"] += 1
+            key = delivery_id(payload, identifier)
+            while self._seen and next(iter(self._seen.values())) < now - self.dedup_seconds:
+                self._seen.popitem(last=False)
+            if key in self._seen:
+                self.stats["duplicates"] += 1
+                return "duplicate"
+            self._seen[key] = now
+
+            if change is None:
+                self.stats["ignored"] += 1
+                return "ignored"
+            pending = self._pending.get(change.issue_key)
+            if pending is not None:
+                pending.merge(change)
+                self.stats["coalesced"] += 1
+                return "coalesced"
+            self._pending[change.issue_key] = change
+            return "queued"
+
+    def flush(self, now: Optional[float] = None, force: bool = False):
+        """Puts the changes whose debounce window has passed on the queue as one batch."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            ready = [
+                change for change in self._pending.values()
+                if force
+                or now - change.last_seen >= self.debounce_seconds
+                or now - change.first_seen >= self.max_delay_seconds
+            ]
+            for change in ready:
+                del self._pending[change.issue_key]
+        if not ready:
+            return
+        try:
+            self.queue.put_nowait(ready)
+        except queue.Full:
+            # The watermark polling of the consumers still picks these changes up
+            with self._lock:
+                self.stats["dropped"] += len(ready)
+            logger.warning(f"Webhook queue is full, dropped {len(ready)} issue changes.")
+
+    def _flush_loop(self):
+        while not self._stop.wait(min(1.0, self.debounce_seconds / 2 or 1.0)):
+            self.flush()
+        self.flush(force=True)
+        self.queue.put(None)
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            for consumer in self._consumers:
+                try:
+                    consumer(batch)
+                except Exception as err:
+                    logger.exception(f"Webhook consumer {getattr(consumer, '__name__', consumer)} failed: {err}")
+            with self._lock:
+                self.stats["dispatched"] += len(batch)
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._flush_loop, name="webhook-flush", daemon=True),
+            threading.Thread(target=self._dispatch_loop, name="webhook-dispatch", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Flushes the pending changes and waits for the consumers to process them."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending), "queued_batches": self.queue.qsize()}
@@ -14,11 +14,13 @@
     // Jira issues state
     const [jiraProjectKey, setJiraProjectKey] = useState("");
     const [issues, setIssues] = useState([]);
+    const [issuesCursor, setIssuesCursor] = useState(null);
     const [newIssueSummary, setNewIssueSummary] = useState("");
     const [newIssueDescription, setNewIssueDescription] = useState("");
 
     // Jira projects state
     const [projects, setProjects] = useState([]);
+    const [projectsCursor, setProjectsCursor] = useState(null);
 
     // Backend URL
     const BASE_URL = "http://127.0.0.1:8000";
@@ -47,17 +49,19 @@
       }
     };
 
-    // Fetch Jira Issues
-    const fetchJiraIssues = async () => {
+    // Fetch Jira Issues; pass the cursor of the next page to append it to the list
+    const fetchJiraIssues = async (cursor = null) => {
       if (!jiraProjectKey) {
         alert("Please enter a Jira project key first.");
         return;
       }
       try {
         const response = await axios.get(`${BASE_URL}/jira/issues`, {
-          params: { project_key: jiraProjectKey },
+          params: { project_key: jiraProjectKey, fields: "summary,status", cursor: cursor || undefined },
         });
-        setIssues(response.data.issues || []);
+        const page = response.data.issues || [];
+        setIssues((previous) => (cursor ? [...previous, ...page] : page));
+        setIssuesCursor(response.data.next_cursor || null);
       } catch (error) {
         console.error("Error fetching Jira issues:", error);
       }
@@ -84,11 +88,15 @@
       }
     };
 
-    // Fetch Jira Projects
-    const fetchJiraProjects = async () => {
+    // Fetch Jira Projects; pass the cursor of the next page to append it to the list
+    const fetchJiraProjects = async (cursor = null) => {
       try {
-        const response = await axios.get(`${BASE_URL}/jira/projects`);
-        setProjects(response.data || []);
+        const response = await axios.get(`${BASE_URL}/jira/projects`, {
+          params: { cursor: cursor || undefined },
+        });
+        const page = response.data.projects || [];
+        setProjects((previous) => (cursor ? [...previous, ...page] : page));
+        setProjectsCursor(response.data.next_cursor || null);
       } catch (error) {
         console.error("Error fetching Jira projects:", error);
       }
@@ -144,7 +152,7 @@
           <div className="mb-8 w-full max-w-md">
             <h2 className="text-xl font-bold mb-4">Jira Projects</h2>
             <button
-              onClick={fetchJiraProjects}
+              onClick={() => fetchJiraProjects()}
               className="bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600 transition"
             >
               Fetch Jira Projects
@@ -158,6 +166,14 @@
                 ))}
               </ul>
             )}
+            {projectsCursor && (
+              <button
+                onClick={() => fetchJiraProjects(projectsCursor)}
+                className="mt-4 text-blue-500 hover:underline"
+              >
+                Load more projects
+              </button>
+            )}
           </div>
 
           <hr className="w-full border-t border-gray-300 my-8" />
@@ -173,7 +189,7 @@
               className="border border-gray-300 dark:border-gray-600 px-4 py-2 rounded bg-white dark:bg-gray-800 text-gray-900 dark:text-gray-100 placeholder-gray-500 dark:placeholder-gray-400 w-full mb-4"
             />
             <button
-              onClick={fetchJiraIssues}
+              onClick={() => fetchJiraIssues()}
               className="bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600 transition"
             >
               Fetch Jira Issues
@@ -188,6 +204,14 @@
                 ))}
               </ul>
             )}
+            {issuesCursor && (
+              <button
+                onClick={() => fetchJiraIssues(issuesCursor)}
+                className="mt-4 text-blue-500 hover:underline"
+              >
+                Load more issues
+              </button>
+            )}
 
             <div className="mt-8">
               <h3 className="text-lg font-semibold">Create New Jira Issue</h3>